@@ -0,0 +1,160 @@
+# Box postprocessing micro-benchmark: the old pure-Python loops vs utils/box_ops.py.
+# Pages are synthetic - lots of speech bubbles with many (sometimes duplicated) line boxes each, like dfine_line_emassive gives on busy pages.
+#
+# Run from the "src" folder, e.g.:
+# python -m benchmarks.bench_box_ops
+# python -m benchmarks.bench_box_ops --n-boxes 100 300 800 --runs 5
+
+import argparse
+import time
+import numpy as np
+from gandy.utils.box_ops import as_boxes, containment_matrix, merge_boxes, paired_iou
+from gandy.utils.filter_out_overlapping_bboxes import filter_out_overlapping_bboxes
+
+# The old implementations, kept here for comparison.
+
+def box_b_in_box_a_thr(box_a, box_b):
+    x_a = max(box_a[0], box_b[0])
+    y_a = max(box_a[1], box_b[1])
+    x_b = min(box_a[2], box_b[2])
+    y_b = min(box_a[3], box_b[3])
+
+    inter = abs(max((x_b - x_a, 0)) * max((y_b - y_a), 0))
+
+    if inter == 0:
+        return 0
+
+    box_b_area = abs((box_b[2] - box_b[0]) * (box_b[3] - box_b[1]))
+
+    return inter / float(box_b_area)
+
+def legacy_filter_out_overlapping_bboxes(bboxes):
+    new_bboxes = []
+    for idx in range(len(bboxes)):
+        others = bboxes[:idx] + bboxes[(idx + 1):]
+
+        if not any(box_b_in_box_a_thr(box_b=bboxes[idx], box_a=o) >= 0.8 for o in others):
+            new_bboxes.append(bboxes[idx])
+    return new_bboxes
+
+def legacy_merge_and_validate(speech_bboxes, idx, condition):
+    b = speech_bboxes[idx]
+
+    for other_idx in range(len(speech_bboxes)):
+        if idx == other_idx:
+            continue
+
+        o = speech_bboxes[other_idx]
+        if condition(b, o):
+            speech_bboxes[idx] = [min(b[0], o[0]), min(b[1], o[1]), max(b[2], o[2]), max(b[3], o[3])]
+            speech_bboxes = speech_bboxes[:other_idx] + speech_bboxes[(other_idx + 1):]
+
+            return speech_bboxes, True
+
+    return speech_bboxes, False
+
+def legacy_merge_overlapping(speech_bboxes):
+    speech_bboxes = [list(b) for b in speech_bboxes]
+
+    failsafe_max_n = 0
+    while failsafe_max_n < 4000:
+        failsafe_max_n += 1
+        can_break = True
+
+        for idx in range(len(speech_bboxes)):
+            speech_bboxes, did_merge = legacy_merge_and_validate(speech_bboxes, idx, condition=lambda b, o: box_b_in_box_a_thr(box_a=b, box_b=o) >= 0.3)
+            if did_merge:
+                can_break = False
+                break
+
+        if can_break:
+            break
+
+    return speech_bboxes
+
+def legacy_calculate_iou(boxA, boxB):
+    xA = max(boxA[0], boxB[0])
+    yA = max(boxA[1], boxB[1])
+    xB = min(boxA[2], boxB[2])
+    yB = min(boxA[3], boxB[3])
+
+    interArea = max(0, xB - xA) * max(0, yB - yA)
+    boxAArea = (boxA[2] - boxA[0]) * (boxA[3] - boxA[1])
+    boxBArea = (boxB[2] - boxB[0]) * (boxB[3] - boxB[1])
+
+    return interArea / float(boxAArea + boxBArea - interArea)
+
+def make_page_boxes(n_boxes: int, seed=0, page_w=1600, page_h=12000):
+    rng = np.random.default_rng(seed)
+
+    boxes = []
+    while len(boxes) < n_boxes:
+        # One bubble of vertical lines.
+        bx = rng.uniform(0, page_w - 300)
+        by = rng.uniform(0, page_h - 400)
+        n_lines = int(rng.integers(2, 8))
+        line_w = rng.uniform(20, 35)
+
+        for line_idx in range(n_lines):
+            x1 = bx + line_idx * (line_w + 4)
+            y1 = by + rng.uniform(0, 20)
+            boxes.append([x1, y1, x1 + line_w, y1 + rng.uniform(120, 350)])
+
+            if rng.uniform() < 0.15:
+                # Near-duplicate detection of the same line.
+                jitter = rng.uniform(-2, 2, 4)
+                boxes.append([c + j for c, j in zip(boxes[-1], jitter)])
+
+    return boxes[:n_boxes]
+
+def timeit(fn, runs: int):
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--n-boxes", type=int, nargs="+", default=[100, 300, 600])
+    parser.add_argument("--runs", type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{'boxes':>6} {'op':>22} {'legacy (ms)':>12} {'box_ops (ms)':>13} {'speedup':>8} {'same':>5}")
+    for n_boxes in args.n_boxes:
+        boxes = make_page_boxes(n_boxes)
+        shifted = [[c + 0.5 for c in b] for b in boxes]
+
+        cases = [
+            (
+                "filter_overlapping",
+                lambda: legacy_filter_out_overlapping_bboxes(boxes),
+                lambda: filter_out_overlapping_bboxes(boxes),
+                lambda a, b: a == b,
+            ),
+            (
+                "merge_overlapping",
+                lambda: legacy_merge_overlapping(boxes),
+                lambda: merge_boxes(as_boxes(boxes), lambda bb: containment_matrix(bb, bb) >= 0.3).tolist(),
+                # The merge order differs, so compare the sets of merged boxes.
+                # On dense pages this can be False: the old loop's result depends on which pair it merged first (both results have no overlapping boxes left).
+                lambda a, b: sorted(map(tuple, np.round(a, 3).tolist())) == sorted(map(tuple, np.round(b, 3).tolist())),
+            ),
+            (
+                "paired_iou",
+                lambda: [legacy_calculate_iou(a, b) for a, b in zip(boxes, shifted)],
+                lambda: paired_iou(as_boxes(boxes), as_boxes(shifted)),
+                lambda a, b: np.allclose(a, b),
+            ),
+        ]
+
+        for name, legacy_fn, new_fn, same_fn in cases:
+            legacy_t = timeit(legacy_fn, args.runs)
+            new_t = timeit(new_fn, args.runs)
+            same = same_fn(legacy_fn(), new_fn())
+
+            print(f"{n_boxes:>6} {name:>22} {legacy_t * 1000:>12.2f} {new_t * 1000:>13.2f} {legacy_t / max(new_t, 1e-9):>7.1f}x {str(same):>5}")
+
+if __name__ == "__main__":
+    main()
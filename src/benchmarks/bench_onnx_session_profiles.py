@@ -0,0 +1,96 @@
+# Compares ONNX session profiles (see gandy/onnx_models/session_profiles.py) on the example images.
+#
+# Run from the "src" folder (model paths are relative to it), e.g.:
+# python -m benchmarks.bench_onnx_session_profiles
+# python -m benchmarks.bench_onnx_session_profiles --models dfine ttnet --profiles default throughput
+
+import argparse
+import time
+from glob import glob
+from gc import collect
+from PIL import Image
+from gandy.state.dangerous_config import dangerous_config
+from gandy.onnx_models.session_profiles import get_profile_names
+from gandy.onnx_models.pp import PpONNX
+from gandy.text_detection.yolo_image_detection import YOLOTDImageDetectionApp
+from gandy.text_detection.dfine_image_detection import DFineImageDetectionApp, DFineLineImageDetectionApp
+from gandy.image_cleaning.tnet_image_clean import TNetImageClean
+from gandy.image_cleaning.tnet_edge_image_clean import TNetEdgeImageClean
+
+def grid_bboxes(image: Image.Image, n=3):
+    # Stand-in text regions for the cleaning models.
+    w, h = image.width // (n + 1), image.height // (n + 1)
+    return [[(i + 0.5) * w, (j + 0.5) * h, (i + 1.5) * w, (j + 1.5) * h] for i in range(n) for j in range(n)]
+
+# Each = (create the app, run it on one image). Same settings as model_apps.py.
+MODELS = {
+    "yolo": (
+        lambda: YOLOTDImageDetectionApp(model_name="yolo_xl", confidence_threshold=0.4, iou_thr=0.3),
+        lambda app, image: app.process(image),
+    ),
+    "dfine": (
+        lambda: DFineImageDetectionApp(model_name="dfine_l", confidence_threshold=0.4, iou_thr=0.3, image_size=1024),
+        lambda app, image: app.process(image),
+    ),
+    "pp": (
+        lambda: DFineLineImageDetectionApp(model_name="pp_line", confidence_threshold=0.15, iou_thr=0.25, image_size=1024, onnx_cls=PpONNX),
+        lambda app, image: app.process(image),
+    ),
+    "ttnet": (
+        lambda: TNetImageClean(),
+        lambda app, image: app.process(image, grid_bboxes(image)),
+    ),
+    "edge_connect": (
+        lambda: TNetEdgeImageClean(),
+        lambda app, image: app.process(image, grid_bboxes(image)),
+    ),
+}
+
+def bench(model_key: str, profile_name: str, images, runs: int):
+    dangerous_config.onnx_session_profile = profile_name
+
+    create_app, run_app = MODELS[model_key]
+    app = create_app()
+
+    start = time.perf_counter()
+    app.load_model()
+    load_time = time.perf_counter() - start
+
+    try:
+        run_app(app, images[0]) # Warmup.
+
+        timings = []
+        for _ in range(runs):
+            for image in images:
+                start = time.perf_counter()
+                run_app(app, image)
+                timings.append(time.perf_counter() - start)
+    finally:
+        app.unload_model()
+        collect()
+
+    return load_time, timings
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--images", default="../examples/*.jpg")
+    parser.add_argument("--max-images", type=int, default=6)
+    parser.add_argument("--models", nargs="+", choices=list(MODELS.keys()), default=list(MODELS.keys()))
+    parser.add_argument("--profiles", nargs="+", default=get_profile_names())
+    parser.add_argument("--runs", type=int, default=3)
+    args = parser.parse_args()
+
+    images = [Image.open(p).convert("RGB") for p in sorted(glob(args.images))[:args.max_images]]
+    if len(images) == 0:
+        raise ValueError(f"No images found for {args.images}")
+
+    print(f"{'model':>13} {'profile':>12} {'load (s)':>9} {'mean (ms)':>10} {'best (ms)':>10}")
+    for model_key in args.models:
+        for profile_name in args.profiles:
+            load_time, timings = bench(model_key, profile_name, images, args.runs)
+
+            mean_t = sum(timings) / len(timings)
+            print(f"{model_key:>13} {profile_name:>12} {load_time:>9.2f} {mean_t * 1000:>10.1f} {min(timings) * 1000:>10.1f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,207 @@
+# PP line detection postprocessing (probability map -> line boxes): the old per-contour loop vs the vectorized PpONNX.map_to_boxes.
+# By default the probability maps come from the PP model run on the example images. With --synthetic (or without the model), busy fake maps are used instead.
+#
+# Run from the "src" folder, e.g.:
+# python -m benchmarks.bench_pp_postprocess
+# python -m benchmarks.bench_pp_postprocess --synthetic --n-lines 100 400 800
+
+import argparse
+import time
+from glob import glob
+import cv2
+import numpy as np
+from PIL import Image
+from gandy.onnx_models.pp import PpONNX, group_and_merge_bboxes, resize_with_aspect_ratio
+
+# The old implementations, kept here for comparison.
+
+def legacy_map_to_boxes(pred_map, thresh=0.3, box_thresh=0.6, unclip_ratio=1.5):
+    dest_h, dest_w = pred_map.shape[1:3]
+    pred = pred_map[0]
+
+    bitmap = (pred > thresh).astype(np.uint8)
+
+    contours, _ = cv2.findContours((bitmap * 255), cv2.RETR_LIST, cv2.CHAIN_APPROX_SIMPLE)
+
+    boxes = []
+    for contour in contours:
+        rect = cv2.minAreaRect(contour)
+        points = cv2.boxPoints(rect)
+
+        points = sorted(list(points), key=lambda x: x[0])
+        if points[1][1] > points[0][1]:
+            index_1, index_4 = 0, 1
+        else:
+            index_1, index_4 = 1, 0
+        if points[3][1] > points[2][1]:
+            index_2, index_3 = 2, 3
+        else:
+            index_2, index_3 = 3, 2
+
+        box = np.array([points[index_1], points[index_2], points[index_3], points[index_4]])
+
+        if min(rect[1]) < 3:
+            continue
+
+        xmin = np.clip(np.floor(box[:, 0].min()).astype(int), 0, dest_w - 1)
+        xmax = np.clip(np.ceil(box[:, 0].max()).astype(int), 0, dest_w - 1)
+        ymin = np.clip(np.floor(box[:, 1].min()).astype(int), 0, dest_h - 1)
+        ymax = np.clip(np.ceil(box[:, 1].max()).astype(int), 0, dest_h - 1)
+
+        mask = np.zeros((ymax - ymin + 1, xmax - xmin + 1), dtype=np.uint8)
+        shifted_box = box.copy()
+        shifted_box[:, 0] -= xmin
+        shifted_box[:, 1] -= ymin
+        cv2.fillPoly(mask, [shifted_box.astype(np.int32)], 1)
+
+        score = cv2.mean(pred[ymin:ymax + 1, xmin:xmax + 1], mask)[0]
+
+        if score < box_thresh:
+            continue
+
+        area = cv2.contourArea(box)
+        perimeter = cv2.arcLength(box, True)
+        if perimeter == 0: continue
+        distance = area * unclip_ratio / perimeter
+
+        new_w, new_h = rect[1][0] + distance * 2, rect[1][1] + distance * 2
+        expanded_rect = (rect[0], (new_w, new_h), rect[2])
+        expanded_box = cv2.boxPoints(expanded_rect)
+
+        x1, y1 = np.min(expanded_box, axis=0)
+        x2, y2 = np.max(expanded_box, axis=0)
+
+        boxes.append([x1, y1, x2, y2])
+
+    return boxes
+
+def legacy_group_and_merge_bboxes(boxes, overlap_threshold=0.5):
+    def merge(group):
+        return (min(b[0] for b in group), min(b[1] for b in group), max(b[2] for b in group), max(b[3] for b in group))
+
+    def overlap_ratio(b1_start, b1_end, b2_start, b2_end):
+        box_len = b1_end - b1_start
+        if box_len <= 0: return 0.0
+        return max(0, min(b1_end, b2_end) - max(b1_start, b2_start)) / box_len
+
+    if not boxes:
+        return []
+
+    avg_aspect_ratio = sum((b[2]-b[0])/(b[3]-b[1]) for b in boxes) / len(boxes)
+    is_horizontal = avg_aspect_ratio >= 1.0
+
+    group_idx = (1, 3) if is_horizontal else (0, 2)
+    sort_idx = 0 if is_horizontal else 1
+
+    boxes.sort(key=lambda b: (b[group_idx[0]], b[sort_idx]))
+
+    lines = []
+    current_group = []
+    curr_min, curr_max = -1, -1
+
+    for box in boxes:
+        b_min, b_max = box[group_idx[0]], box[group_idx[1]]
+        overlap = overlap_ratio(b_min, b_max, curr_min, curr_max)
+
+        if current_group and overlap >= overlap_threshold:
+            current_group.append(box)
+            curr_min = min(curr_min, b_min)
+            curr_max = max(curr_max, b_max)
+        else:
+            if current_group:
+                lines.append(merge(current_group))
+            current_group = [box]
+            curr_min, curr_max = b_min, b_max
+
+    if current_group:
+        lines.append(merge(current_group))
+
+    return lines
+
+def legacy_postprocess(pred_map):
+    return legacy_group_and_merge_bboxes(legacy_map_to_boxes(pred_map), overlap_threshold=0.35)
+
+def new_postprocess(model: PpONNX, pred_map):
+    return group_and_merge_bboxes(model.map_to_boxes(pred_map), overlap_threshold=0.35)
+
+def make_synthetic_map(n_lines: int, seed=0, size=960):
+    # Speech bubbles of vertical text lines (a few slightly rotated), blurred like a real probability map.
+    rng = np.random.default_rng(seed)
+    canvas = np.zeros((size, size), dtype=np.float32)
+
+    line_w, gap = 8, 6
+    n_cols = size // (line_w + gap)
+    n_rows = max(1, -(-n_lines // n_cols))
+    row_h = size // n_rows
+
+    for idx in range(n_lines):
+        col, row = idx % n_cols, idx // n_cols
+
+        x1 = col * (line_w + gap) + gap
+        y1 = row * row_h + rng.uniform(2, row_h * 0.2)
+        h = rng.uniform(row_h * 0.3, row_h * 0.75)
+        angle = 0.0 if rng.uniform() < 0.85 else rng.uniform(-4, 4)
+
+        points = cv2.boxPoints(((x1 + line_w / 2, y1 + h / 2), (line_w, h), angle)).astype(np.int32)
+        cv2.fillPoly(canvas, [points], float(rng.uniform(0.6, 1.0)))
+
+    canvas = cv2.GaussianBlur(canvas, (3, 3), 0)
+    canvas += rng.uniform(0, 0.2, canvas.shape).astype(np.float32)
+
+    return np.clip(canvas, 0, 1)[None, ...]
+
+def model_maps(model: PpONNX, image_paths):
+    maps = []
+    for p in image_paths:
+        resized, _, _, _ = resize_with_aspect_ratio(Image.open(p).convert("RGB"), 960)
+        im_data = model.np_transform(resized)[None, ...]
+
+        output = model.ort_sess.run(output_names=None, input_feed={"x": im_data,})
+        maps.append((p, output[0][0, ...]))
+    return maps
+
+def same_boxes(a, b, tol=1e-3):
+    a, b = np.asarray(a, dtype=np.float64).reshape(-1, 4), np.asarray(b, dtype=np.float64).reshape(-1, 4)
+    return a.shape == b.shape and np.allclose(a, b, atol=tol)
+
+def timeit(fn, runs: int):
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--model", default="models/pp_line.onnx")
+    parser.add_argument("--images", default="../examples/*.jpg")
+    parser.add_argument("--synthetic", action="store_true")
+    parser.add_argument("--n-lines", type=int, nargs="+", default=[100, 300, 600])
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    if args.synthetic:
+        # map_to_boxes doesn't touch the session.
+        model = PpONNX.__new__(PpONNX)
+        model.box_thresh, model.thresh, model.unclip = 0.6, 0.3, 1.5
+
+        maps = [(f"synthetic ({n} lines)", make_synthetic_map(n)) for n in args.n_lines]
+    else:
+        model = PpONNX(args.model, use_cuda=False)
+        maps = model_maps(model, sorted(glob(args.images)))
+
+    print(f"{'page':>40} {'boxes':>6} {'legacy (ms)':>12} {'new (ms)':>9} {'speedup':>8} {'same':>5}")
+    for name, pred_map in maps:
+        # Compared before the merging too - merging could hide differences.
+        legacy_out = legacy_postprocess(pred_map)
+        new_out = new_postprocess(model, pred_map)
+        same = same_boxes(legacy_map_to_boxes(pred_map), model.map_to_boxes(pred_map)) and same_boxes(legacy_out, new_out)
+
+        legacy_t = timeit(lambda: legacy_postprocess(pred_map), args.runs)
+        new_t = timeit(lambda: new_postprocess(model, pred_map), args.runs)
+
+        print(f"{name[-40:]:>40} {len(new_out):>6} {legacy_t * 1000:>12.2f} {new_t * 1000:>9.2f} {legacy_t / max(new_t, 1e-9):>7.1f}x {str(same):>5}")
+
+if __name__ == "__main__":
+    main()
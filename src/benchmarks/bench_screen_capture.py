@@ -0,0 +1,103 @@
+# Per-tick capture cost of the task3 background watchers: the old per-box path vs the shared capture (gandy/utils/screen_capture.py).
+# Uses the synthetic frame source, so it runs anywhere. Its grabs copy the grabbed area, so (like mss) a bigger grab costs more.
+# "corners" puts small boxes far apart - those are grabbed separately rather than as one near full screen grab.
+#
+# Run from the "src" folder, e.g.:
+# python -m benchmarks.bench_screen_capture
+# python -m benchmarks.bench_screen_capture --n-boxes 1 2 4 8 --box-size 900 250
+# python -m benchmarks.bench_screen_capture --layout corners --box-size 300 80
+
+import argparse
+import time
+import cv2
+import numpy as np
+from gandy.utils.screen_capture import SyntheticFrameSource, CaptureSubscription, CaptureHub, covering_region, capture_tick
+
+def draw_noise(n_grabs, canvas):
+    # Something changes every tick, like a typewriter effect.
+    y = (n_grabs * 7) % (canvas.shape[0] - 20)
+    canvas[y:y + 20, 100:400, :3] = (n_grabs * 37) % 255
+
+def make_regions(n_boxes, box_w, box_h, layout="spread"):
+    if layout == "corners":
+        # Boxes in the corners of a 1080p screen (and then along the edges).
+        spots = [(0, 0), (1920 - box_w, 1080 - box_h), (1920 - box_w, 0), (0, 1080 - box_h)]
+        return [
+            { "left": spots[idx % 4][0], "top": (spots[idx % 4][1] + (idx // 4) * (box_h + 10)) % (1080 - box_h), "width": box_w, "height": box_h, }
+            for idx in range(n_boxes)
+        ]
+
+    # Boxes spread over a 1080p screen.
+    return [
+        { "left": 40 + (idx % 2) * 960, "top": 40 + (idx // 2) * (box_h + 10) % (1080 - box_h - 40), "width": box_w, "height": box_h, }
+        for idx in range(n_boxes)
+    ]
+
+def legacy_tick(source, regions):
+    # What each watcher did on its own: grab, convert & blur (all freshly allocated).
+    for region in regions:
+        img = source.grab(region)
+        gray = cv2.cvtColor(img, cv2.COLOR_BGRA2GRAY)
+        cv2.GaussianBlur(gray, (3, 3), 0)
+
+def covering_tick(source, subs):
+    # One grab covering every box, whatever the layout - what the shared capture did before grouping.
+    region = covering_region([s.region for s in subs])
+    bgra = source.grab(region)
+
+    for s in subs:
+        x1 = s.region["left"] - region["left"]
+        y1 = s.region["top"] - region["top"]
+        s._update(bgra[y1:(y1 + s.region["height"]), x1:(x1 + s.region["width"])])
+
+def timeit(fn, ticks: int):
+    start = time.perf_counter()
+    for _ in range(ticks):
+        fn()
+    return (time.perf_counter() - start) / ticks
+
+def check_hub(regions):
+    # Sanity check of the threaded path: every subscription gets frames from the one capture thread.
+    source = SyntheticFrameSource(draw_fn=draw_noise)
+    hub = CaptureHub(source_factory=lambda: source, interval=0.01)
+
+    subs = [hub.subscribe([r["left"], r["top"], r["width"], r["height"]]) for r in regions]
+    frames = [s.read_small(after_seq=3)[0] for s in subs]
+    stats = hub.get_stats()
+
+    for s in subs:
+        hub.unsubscribe(s)
+
+    return len(stats) == 1 and stats[0]["n_subscriptions"] == len(regions) and all(f.size > 0 for f in frames) and len(hub.get_stats()) == 0
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--n-boxes", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--box-size", type=int, nargs=2, default=[900, 250])
+    parser.add_argument("--layout", choices=["spread", "corners"], default="spread")
+    parser.add_argument("--ticks", type=int, default=50)
+    args = parser.parse_args()
+
+    print(f"{'boxes':>6} {'legacy (ms)':>12} {'covering (ms)':>14} {'shared (ms)':>12} {'grabs':>6} {'speedup':>8} {'hub ok':>7}")
+    for n_boxes in args.n_boxes:
+        regions = make_regions(n_boxes, *args.box_size, layout=args.layout)
+
+        legacy_source = SyntheticFrameSource(draw_fn=draw_noise)
+        legacy_t = timeit(lambda: legacy_tick(legacy_source, regions), args.ticks)
+
+        covering_source = SyntheticFrameSource(draw_fn=draw_noise)
+        covering_subs = [CaptureSubscription(r) for r in regions]
+        covering_t = timeit(lambda: covering_tick(covering_source, covering_subs), args.ticks)
+
+        shared_source = SyntheticFrameSource(draw_fn=draw_noise)
+        subs = [CaptureSubscription(r) for r in regions]
+        shared_t = timeit(lambda: capture_tick(shared_source, subs), args.ticks)
+        n_grabs = capture_tick(shared_source, subs)
+
+        print(
+            f"{n_boxes:>6} {legacy_t * 1000:>12.2f} {covering_t * 1000:>14.2f} {shared_t * 1000:>12.2f} {n_grabs:>6} "
+            f"{legacy_t / max(shared_t, 1e-9):>7.1f}x {str(check_hub(regions)):>7}"
+        )
+
+if __name__ == "__main__":
+    main()
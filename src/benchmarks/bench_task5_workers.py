@@ -0,0 +1,103 @@
+# Task5 STAGE 1 & 2 (detect, OCR & neighbor pass): the sequential path vs chunked_frames.py with N worker processes, on a generated video.
+# Reports sampled frames per second for each worker count, and whether the texts match the sequential path.
+#
+# Run from the "src" folder (model paths are relative to it), e.g.:
+# python -m benchmarks.bench_task5_workers
+# python -m benchmarks.bench_task5_workers --workers 1 2 4 --duration 240 --chunk-secs 30
+
+import argparse
+import os
+import tempfile
+import time
+import cv2
+import numpy as np
+from gandy.model_apps import translate_pipeline
+from gandy.state.config_state import config_state
+from gandy.tasks.task5.adaptive_sampling import read_frames
+from gandy.tasks.task5.stages.read_text_in_frames import read_text_in_frames
+from gandy.tasks.task5.stages.set_neighboring_similar_texts import set_neighboring_similar_texts
+from gandy.tasks.task5.chunked_frames import read_text_in_chunks
+
+LINES = [
+    "こんにちは",
+    "今日はいい天気ですね",
+    "どこへ行くの？",
+    "駅まで歩いていこう",
+    "",
+    "ありがとうございました",
+]
+
+def make_video(out_path: str, duration: int, fps: int, width=640, height=360, secs_per_line=3, seed=0):
+    # Moving noise in the background, and a subtitle-like text box that changes every few seconds (with some gaps with no text).
+    # cv2.putText can't draw Japanese, so the "text" is drawn as rows of blocks - close enough for detection timings.
+    rng = np.random.default_rng(seed)
+    writer = cv2.VideoWriter(out_path, cv2.VideoWriter_fourcc(*"mp4v"), fps, (width, height))
+
+    background = rng.integers(0, 255, (height * 2, width * 2, 3), dtype=np.uint8)
+    background = cv2.GaussianBlur(background, (31, 31), 0)
+
+    for frame_idx in range(duration * fps):
+        t = frame_idx / fps
+        ox, oy = int(t * 7) % width, int(t * 3) % height
+        frame = background[oy:oy + height, ox:ox + width].copy()
+
+        line = LINES[int(t // secs_per_line) % len(LINES)]
+        if len(line) > 0:
+            cv2.rectangle(frame, (40, height - 90), (width - 40, height - 30), (20, 20, 20), -1)
+            for char_idx, char in enumerate(line):
+                x = 60 + char_idx * 28
+                rows = 2 + (ord(char) % 4)
+                for r in range(rows):
+                    cv2.rectangle(frame, (x, height - 80 + r * 10), (x + 20, height - 74 + r * 10), (255, 255, 255), -1)
+
+        writer.write(frame)
+
+    writer.release()
+
+def run_sequential(video_path: str, every_secs: float, fps: float, total_frames: float):
+    frames = read_frames(video_path, every_secs)
+    texts, _ = read_text_in_frames(translate_pipeline, frames, every_secs, fps, total_frames, lambda p: None)
+    set_neighboring_similar_texts(translate_pipeline, texts, every_secs, fps, total_frames, lambda p: None)
+    return texts
+
+def run_chunked(video_path: str, every_secs: float, fps: float, total_frames: float, duration: int, n_workers: int, chunk_secs: float):
+    texts = []
+    for _, final_texts, _ in read_text_in_chunks(
+        translate_pipeline, video_path, every_secs, fps, total_frames, duration, lambda p: None, n_workers=n_workers, chunk_secs=chunk_secs,
+    ):
+        texts.extend(final_texts)
+    return texts
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--duration", type=int, default=120)
+    parser.add_argument("--fps", type=int, default=24)
+    parser.add_argument("--every-secs", type=float, default=1.0)
+    parser.add_argument("--chunk-secs", type=float, default=30)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    args = parser.parse_args()
+
+    config_state.use_translation_server = True # Skips the MT embeddings half of STAGE 2 - it'd load the MT model.
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        video_path = os.path.join(tmp_dir, "synthetic.mp4")
+        make_video(video_path, args.duration, args.fps)
+        total_frames = args.fps * args.duration
+
+        start = time.perf_counter()
+        expected = run_sequential(video_path, args.every_secs, args.fps, total_frames)
+        seq_t = time.perf_counter() - start
+
+        print(f"{'workers':>8} {'frames':>7} {'time (s)':>9} {'frames/s':>9} {'same':>5}")
+        print(f"{'seq':>8} {len(expected):>7} {seq_t:>9.2f} {len(expected) / seq_t:>9.2f} {'-':>5}")
+
+        for n_workers in args.workers:
+            # Includes spawning the workers and loading their models.
+            start = time.perf_counter()
+            texts = run_chunked(video_path, args.every_secs, args.fps, total_frames, args.duration, n_workers, args.chunk_secs)
+            t = time.perf_counter() - start
+
+            print(f"{n_workers:>8} {len(texts):>7} {t:>9.2f} {len(texts) / t:>9.2f} {str(texts == expected):>5}")
+
+if __name__ == "__main__":
+    main()
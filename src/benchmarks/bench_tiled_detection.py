@@ -0,0 +1,88 @@
+# Tiled text detection latency: one model call per tile vs batched tiles, for different tile counts.
+#
+# Run from the "src" folder (model paths are relative to it), e.g.:
+# python -m benchmarks.bench_tiled_detection --model dfine_l
+# python -m benchmarks.bench_tiled_detection --model yolo_xl --kind yolo --image some_webtoon_page.png --batch-sizes 1 4 8
+
+import argparse
+import time
+import numpy as np
+from PIL import Image
+from gandy.state.config_state import config_state
+from gandy.text_detection.yolo_image_detection import YOLOTDImageDetectionApp
+from gandy.text_detection.dfine_image_detection import DFineImageDetectionApp
+from gandy.utils.image_chunking import detect_image_chunks
+
+def make_page(width: int, height: int):
+    # Noise with some dark "text" blocks - the boxes don't matter, only the timings.
+    rng = np.random.default_rng(0)
+    page = rng.integers(200, 255, (height, width, 3), dtype=np.uint8)
+
+    for _ in range(height // 200):
+        x = rng.integers(0, width - 120)
+        y = rng.integers(0, height - 60)
+        page[y:y + 60, x:x + 120] = rng.integers(0, 60, (60, 120, 3), dtype=np.uint8)
+
+    return Image.fromarray(page)
+
+def load_app(args):
+    if args.kind == "dfine":
+        app = DFineImageDetectionApp(model_name=args.model, confidence_threshold=0.5, iou_thr=0.3, image_size=1024)
+    else:
+        app = YOLOTDImageDetectionApp(model_name=args.model, image_size=args.image_size)
+
+    app.load_model()
+    return app
+
+def bench(app, page: Image.Image, tile_height: int, batch_size: int, runs: int):
+    config_state.detection_max_batch_size = batch_size
+
+    detect_in_chunk = lambda tile: app.process(tile)
+    detect_in_chunks = (lambda tiles: app.process_batch(tiles)) if batch_size > 1 else None
+
+    n_tiles = 0
+    def count_tiles(tile):
+        nonlocal n_tiles
+        n_tiles += 1
+        return []
+    detect_image_chunks(page, 100, tile_height, detect_in_chunk=count_tiles)
+
+    detect_image_chunks(page, 100, tile_height, detect_in_chunk=detect_in_chunk, detect_in_chunks=detect_in_chunks) # Warmup.
+
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        detect_image_chunks(page, 100, tile_height, detect_in_chunk=detect_in_chunk, detect_in_chunks=detect_in_chunks)
+        timings.append(time.perf_counter() - start)
+
+    return n_tiles, timings
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--model", default="dfine_l", help="Model name in models/yolo (without .onnx).")
+    parser.add_argument("--kind", choices=["dfine", "yolo"], default="dfine")
+    parser.add_argument("--image-size", type=int, default=640, help="Input size for YOLO models.")
+    parser.add_argument("--image", default=None, help="Page to tile. Defaults to a synthetic tall webtoon-like page.")
+    parser.add_argument("--page-width", type=int, default=800)
+    parser.add_argument("--page-height", type=int, default=12000)
+    parser.add_argument("--tile-heights", type=int, nargs="+", default=[50, 25, 12, 6], help="Tile height in percent of the page height.")
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 4, 8])
+    parser.add_argument("--runs", type=int, default=3)
+    args = parser.parse_args()
+
+    page = Image.open(args.image).convert("RGB") if args.image is not None else make_page(args.page_width, args.page_height)
+    app = load_app(args)
+
+    if not app.can_batch():
+        print(f"NOTE: {args.model} has a fixed batch size - batch sizes > 1 will fall back to one call per tile.")
+
+    print(f"{'tile %':>7} {'tiles':>6} {'batch':>6} {'mean page (s)':>14} {'best page (s)':>14} {'per tile (ms)':>14}")
+    for tile_height in args.tile_heights:
+        for batch_size in args.batch_sizes:
+            n_tiles, timings = bench(app, page, tile_height, batch_size, args.runs)
+
+            mean_t = sum(timings) / len(timings)
+            print(f"{tile_height:>7} {n_tiles:>6} {batch_size:>6} {mean_t:>14.3f} {min(timings):>14.3f} {(mean_t / max(1, n_tiles)) * 1000:>14.1f}")
+
+if __name__ == "__main__":
+    main()
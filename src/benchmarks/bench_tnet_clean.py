@@ -0,0 +1,84 @@
+# TNetImageClean: the old per-bubble TTNet calls + full page cv2.inpaint vs batched TTNet (full_pipe_batch) + ROI inpainting (roi_inpaint.py).
+#
+# Run from the "src" folder (model paths are relative to it), e.g.:
+# python -m benchmarks.bench_tnet_clean
+# python -m benchmarks.bench_tnet_clean --n-bubbles 4 16 --batch-sizes 1 8
+
+import argparse
+import time
+from glob import glob
+import cv2
+import numpy as np
+from PIL import Image
+from gandy.state.config_state import config_state
+from gandy.image_cleaning.tnet_image_clean import TNetImageClean
+
+def bubble_bboxes(image: Image.Image, n: int, seed=0):
+    # Stand-in speech bubbles of varying sizes.
+    rng = np.random.default_rng(seed)
+
+    bboxes = []
+    for _ in range(n):
+        w, h = rng.uniform(0.05, 0.2) * image.width, rng.uniform(0.05, 0.2) * image.height
+        x1, y1 = rng.uniform(0, image.width - w), rng.uniform(0, image.height - h)
+        bboxes.append([x1, y1, x1 + w, y1 + h])
+    return bboxes
+
+def legacy_process(app: TNetImageClean, image: Image.Image, bboxes):
+    full_mask_image = np.zeros((image.height, image.width, 1), dtype=np.uint8)
+
+    for bbox in bboxes:
+        x1, y1, x2, y2 = [int(np.floor(c)) for c in bbox]
+
+        cropped_image = app.transform(image=np.array(image.crop([x1, y1, x2, y2])))["image"]
+        detected_mask = app.tnet_model.full_pipe(cropped_image)[0] * 255
+
+        full_mask_image[y1:y2, x1:x2] = detected_mask[:full_mask_image.shape[0] - y1, :full_mask_image.shape[1] - x1]
+
+    return Image.fromarray(cv2.inpaint(np.array(image), full_mask_image, inpaintRadius=4, flags=cv2.INPAINT_TELEA))
+
+def timeit(fn, runs: int):
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--images", default="../examples/*.jpg")
+    parser.add_argument("--max-images", type=int, default=3)
+    parser.add_argument("--n-bubbles", type=int, nargs="+", default=[4, 12, 24])
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 8])
+    parser.add_argument("--runs", type=int, default=3)
+    args = parser.parse_args()
+
+    images = [Image.open(p).convert("RGB") for p in sorted(glob(args.images))[:args.max_images]]
+    if len(images) == 0:
+        raise ValueError(f"No images found for {args.images}")
+
+    app = TNetImageClean()
+    app.load_model()
+
+    print(f"{'bubbles':>8} {'batch':>6} {'legacy (ms)':>12} {'new (ms)':>9} {'speedup':>8} {'same':>5}")
+    for n_bubbles in args.n_bubbles:
+        pages = [(image, bubble_bboxes(image, n_bubbles, seed=idx)) for idx, image in enumerate(images)]
+
+        for batch_size in args.batch_sizes:
+            config_state.clean_max_batch_size = batch_size
+
+            same = all(
+                np.array_equal(np.array(legacy_process(app, image, bboxes)), np.array(app.process(image, bboxes)))
+                for image, bboxes in pages
+            )
+
+            legacy_t = timeit(lambda: [legacy_process(app, image, bboxes) for image, bboxes in pages], args.runs) / len(pages)
+            new_t = timeit(lambda: [app.process(image, bboxes) for image, bboxes in pages], args.runs) / len(pages)
+
+            print(f"{n_bubbles:>8} {batch_size:>6} {legacy_t * 1000:>12.1f} {new_t * 1000:>9.1f} {legacy_t / max(new_t, 1e-9):>7.1f}x {str(same):>5}")
+
+    app.unload_model()
+
+if __name__ == "__main__":
+    main()
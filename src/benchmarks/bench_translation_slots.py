@@ -0,0 +1,86 @@
+# Page-level translation latency for different numbers of llama-server slots.
+#
+# Run from the "src" folder (model paths are relative to it), e.g.:
+# python -m benchmarks.bench_translation_slots --model models/custom_translators/my_model.gguf
+# python -m benchmarks.bench_translation_slots --model models/custom_translators/my_model.gguf --gpu-layers 99 --server models/llamacpp_gpu/llama-server.exe
+
+import argparse
+import os
+import time
+from gandy.translation.llama_server_wrapper import LlamaCppExecutableOpenAIClient
+from gandy.utils.find_free_port import find_tcp_port
+
+# A "page" worth of short bubbles.
+SAMPLE_TEXTS = [
+    "おはよう！今日はいい天気だね。",
+    "えっ、本当に？",
+    "待って！まだ話は終わってない！",
+    "あの人は誰なの？",
+    "知らないよ。でも、なんか怪しいよね。",
+    "とにかく急ごう。時間がない。",
+    "ちょっと休憩しない？",
+    "だめだ。ここで止まったら負けだ。",
+    "ありがとう、助かったよ。",
+    "どういたしまして。",
+    "明日はどうするの？",
+    "まだ決めてない。",
+    "じゃあ、一緒に行こうよ！",
+    "うん、いいね。",
+    "それにしても、お腹すいたなあ。",
+    "ラーメンでも食べに行く？",
+]
+
+def make_messages(text: str):
+    return [{ "role": "user", "content": f"Translate the Japanese text to English.\nJapanese: {text}" }]
+
+def translate_page(llm: LlamaCppExecutableOpenAIClient, texts):
+    # Same dispatching as get_target_texts_from_str: every text at once - the server runs up to one per slot and queues the rest.
+    return llm.call_llm_with_batch([make_messages(t) for t in texts], return_source_on_error=True)
+
+def bench(args, n_parallel: int):
+    llm = LlamaCppExecutableOpenAIClient(
+        model_path=args.model,
+        num_gpu_layers=args.gpu_layers,
+        can_cuda=args.gpu_layers > 0,
+        llama_cpp_server_path=args.server,
+        n_context=args.n_context,
+        port=find_tcp_port(),
+        n_parallel=n_parallel,
+    )
+    llm.start_server()
+
+    try:
+        texts = (SAMPLE_TEXTS * ((args.page_size // len(SAMPLE_TEXTS)) + 1))[:args.page_size]
+
+        translate_page(llm, texts[:n_parallel]) # Warmup.
+
+        timings = []
+        for _ in range(args.runs):
+            start = time.perf_counter()
+            translate_page(llm, texts)
+            timings.append(time.perf_counter() - start)
+    finally:
+        llm.stop_server()
+
+    return timings
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--model", required=True)
+    parser.add_argument("--server", default=os.path.join("models", "llamacpp_cpu", "llama-server.exe"))
+    parser.add_argument("--gpu-layers", type=int, default=0)
+    parser.add_argument("--n-context", type=int, default=750)
+    parser.add_argument("--page-size", type=int, default=16)
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--slots", type=int, nargs="+", default=[1, 2, 4, 8])
+    args = parser.parse_args()
+
+    print(f"{'slots':>6} {'mean page (s)':>14} {'best page (s)':>14} {'per text (ms)':>14}")
+    for n_parallel in args.slots:
+        timings = bench(args, n_parallel)
+
+        mean_t = sum(timings) / len(timings)
+        print(f"{n_parallel:>6} {mean_t:>14.3f} {min(timings):>14.3f} {(mean_t / args.page_size) * 1000:>14.1f}")
+
+if __name__ == "__main__":
+    main()
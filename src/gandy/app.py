@@ -22,11 +22,10 @@ from gandy.utils.fancy_logger import logger
 from time import sleep
 import json
 from gandy.utils.reroute_remote_backend import RemoteRouter
-from gandy.state.dangerous_config import DangerousConfig
+from gandy.state.dangerous_config import dangerous_config
 from gandy.state.debug_state import debug_state
 from gandy.socket_process import SocketProcess, SocketWrapper, socketio
 
-dangerous_config = DangerousConfig()
 logger.do_print = dangerous_config.do_print or dangerous_config.debug
 
 if logger.do_print:
@@ -10,6 +10,9 @@ import json
 import os
 from uuid import uuid4
 from gandy.utils.translation_shortener import SHORTENER
+from gandy.text_recognition.ocr_cache import ocr_cache
+from gandy.onnx_models.session_pool import session_pool
+from gandy.utils.screen_capture import capture_hub
 from gandy.voice.asr_gguf import ASR
 from gandy.voice.ten_vad.speech_segmenter import VAD
 import shutil
@@ -137,18 +140,36 @@ def change_multiple_models_route():
             force_td_cpu=data["forceTdCpu"],
             force_tl_cpu=data["forceTlCpu"],
             memory_efficient_tasks=data["memoryEfficientTasks"],
+            task5_workers=int(data.get("task5Workers", 1)),
+            task5_chunk_secs=float(data.get("task5ChunkSecs", 60)),
+            task5_adaptive_sampling=data.get("task5AdaptiveSampling", False),
+            task5_min_interval=float(data.get("task5MinInterval", 0.25)),
+            pipeline_task1=data.get("pipelineTask1", False),
+            task1_pipeline_queue_size=int(data.get("task1PipelineQueueSize", 2)),
             use_translation_server=data["useTranslationServer"],
+            translation_parallel_slots=int(data.get("translationParallelSlots", 1)),
+            prefix_aware_scheduling=data.get("prefixAwareScheduling", False),
             force_ocr_cpu=data["forceOcrCpu"],
             use_cuda=data["enableCuda"],
             n_context=c_amount,
             no_repeat_ngram_size=int(data["noRepeatNgramSize"]),
             stroke_size=float(data["strokeSize"]),
             bottom_text_only=data["bottomTextOnly"],
+            detection_max_batch_size=int(data.get("detectionMaxBatchSize", 4)),
+            clean_max_batch_size=int(data.get("cleanMaxBatchSize", 8)),
             ignore_thin_text=data["ignoreThinText"],
             detect_frames=data["detectFrames"],
             batch_ocr=data["batchOcr"],
+            page_level_ocr=data.get("pageLevelOcr", False),
+            ocr_max_batch_size=int(data.get("ocrMaxBatchSize", 16)),
+            ocr_image_encoding=data.get("ocrImageEncoding", "png"),
             cut_ocr_punct=data["cutOcrPunct"],
             cache_mt=data["cacheMt"],
+            cache_ocr=data.get("cacheOcr", True),
+            persist_ocr_cache=data.get("persistOcrCache", False),
+            cache_frames=data.get("cacheFrames", False),
+            frame_cache_tolerance=int(data.get("frameCacheTolerance", 0)),
+            incremental_watch_ocr=data.get("incrementalWatchOcr", True),
             ignore_detect_single_words=data["ignoreDetectSingleWords"],
             sort_text_from_top_left=data["sortTextFromTopLeft"],
             capture_window=data["captureWindow"],
@@ -161,6 +182,14 @@ def change_multiple_models_route():
         ))
 
         config_state.update_terms(terms=data["terms"])
+        translate_pipeline.mt_cache.set_exact_cache_scope(data["translationModelName"], config_state.target_terms)
+        ocr_cache.set_persist(config_state.persist_ocr_cache)
+        if ocr_cache.set_ocr_model(data["textRecognitionModelName"]):
+            ctx.log("OCR model changed - cleared OCR cache")
+
+        # Models or detection/OCR options may have changed - cached frames could be stale.
+        translate_pipeline.frame_cache.clear()
+        translate_pipeline.line_text_cache.clear()
 
         context_state.reset_list()
 
@@ -191,6 +220,30 @@ def change_multiple_models_route():
     return {}, 200
 
 
+@app.route("/cachestats", methods=["GET"])
+def get_cache_stats_route():
+    with logger.begin_event("Retrieve cache stats") as ctx:
+        data = {
+            "mt": translate_pipeline.mt_cache.get_stats(),
+            "ocr": ocr_cache.get_stats(),
+            "onnx_sessions": session_pool.get_stats(),
+            "frames": translate_pipeline.frame_cache.get_stats(),
+            "watched_lines": translate_pipeline.line_text_cache.get_stats(),
+            "screen_capture": capture_hub.get_stats(),
+        }
+
+        translation_app = translate_pipeline.translation_app.get_sel_app()
+        if translation_app.loaded and getattr(translation_app, "llm", None) is not None:
+            data["mt_prompt"] = translation_app.llm.get_prompt_stats()
+
+        ocr_app = translate_pipeline.text_recognition_app.get_sel_app()
+        if hasattr(ocr_app, "get_encode_stats"):
+            data["ocr_encoding"] = ocr_app.get_encode_stats()
+
+        ctx.log("Cache stats", **data)
+
+    return data
+
 @app.route("/allowedmodels", methods=["GET"])
 def get_allowed_models_route():
     with logger.begin_event("Retrieve allowed models") as ctx:
@@ -0,0 +1,150 @@
+import json
+import os
+import threading
+from collections import OrderedDict
+from gandy.utils.fancy_logger import logger
+
+# A plain dict-based LRU for byte-identical repeats (game UI lines, subtitles that stay on screen, SFX...).
+# Much cheaper than embedding the text and searching the FAISS index just to find the exact same string again.
+
+class ExactMatchCache():
+    def __init__(self, file_path: str = None, max_size: int = 5000, save_interval: int = None):
+        """
+        file_path: Where the cache is persisted (JSON). None = memory only.
+        max_size: Max number of entries. The least recently used entry is evicted first.
+        save_interval: Saves (in a background thread) after this many puts. None = only when save() or flush() is called.
+        """
+        self.file_path = file_path
+        self.max_size = max_size
+
+        self.save_interval = save_interval
+        self.puts_since_save = 0
+        self.dirty = False # True if there are changes that haven't been saved yet.
+
+        self.entries = OrderedDict()
+        self.scope = None # Entries are only valid for the scope (e.g: model + terms) they were made with.
+
+        self.hits = 0
+        self.misses = 0
+
+        self.lock = threading.Lock()
+        self.save_lock = threading.Lock()
+
+        self._load()
+
+    def _load(self):
+        if self.file_path is None or not os.path.exists(self.file_path):
+            return
+
+        try:
+            with open(self.file_path, encoding="utf-8") as f:
+                data = json.load(f)
+
+            self.scope = data.get("scope", None)
+            for k, v in data.get("entries", []):
+                self.entries[k] = v
+
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+
+            logger.log(f"Loaded {len(self.entries)} exact match cache entries from {self.file_path}")
+        except Exception:
+            logger.log(f"Failed to load the exact match cache from {self.file_path} - starting with an empty one.")
+            self.entries = OrderedDict()
+            self.scope = None
+
+    def save(self):
+        if self.file_path is None:
+            return
+
+        with self.lock:
+            data = {
+                "scope": self.scope,
+                "entries": list(self.entries.items()),
+            }
+            self.dirty = False
+            self.puts_since_save = 0
+
+        with self.save_lock:
+            os.makedirs(os.path.dirname(self.file_path) or ".", exist_ok=True)
+
+            temp_file_path = self.file_path + ".tmp"
+            with open(temp_file_path, "w", encoding="utf-8") as f:
+                json.dump(data, f, ensure_ascii=False)
+            os.replace(temp_file_path, self.file_path)
+
+    def set_file_path(self, file_path: str = None):
+        """
+        Changes where the cache is persisted (None = memory only). If the cache is still empty, the entries saved there are loaded.
+        """
+        with self.lock:
+            self.file_path = file_path
+            is_empty = len(self.entries) == 0
+
+        if is_empty:
+            self._load()
+        else:
+            self.dirty = True
+
+    def flush(self):
+        # Saves only if anything changed since the last save. Meant for shutdown (atexit) - so the last few puts aren't lost.
+        if self.dirty:
+            self.save()
+
+    def get(self, key: str):
+        with self.lock:
+            if key in self.entries:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return self.entries[key]
+
+            self.misses += 1
+            return None
+
+    def put(self, key: str, value):
+        with self.lock:
+            self.entries[key] = value
+            self.entries.move_to_end(key)
+
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+
+            self.dirty = True
+            self.puts_since_save += 1
+            save_right_now = self.save_interval is not None and self.puts_since_save >= self.save_interval
+            if save_right_now:
+                self.puts_since_save = 0
+
+        if save_right_now and self.file_path is not None:
+            threading.Thread(target=self.save).start()
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.dirty = True
+
+    def set_scope(self, scope):
+        """
+        Clears the cache if the scope changed. Returns True if it was cleared.
+        """
+        with self.lock:
+            if scope == self.scope:
+                return False
+
+            self.scope = scope
+            self.entries.clear()
+            self.dirty = True
+
+        return True
+
+    def get_stats(self):
+        with self.lock:
+            n_lookups = self.hits + self.misses
+
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": (self.hits / n_lookups) if n_lookups > 0 else 0.0,
+                "size": len(self.entries),
+                "max_size": self.max_size,
+            }
@@ -7,13 +7,39 @@ from gandy.utils.fancy_logger import logger
 import numpy as np
 from gandy.translation.llama_server_wrapper import LlamaCppExecutableOpenAIClient
 from gandy.database.faiss_store import FAISSStore
+from gandy.database.exact_match_cache import ExactMatchCache
+import json
+import atexit
 
 class MTCache():
     def __init__(self):
         self.mt_cache = None
 
+        # Sits in front of the vector cache - most hits are byte-identical repeats that don't need an embedding call at all.
+        # It also gets entries from vector cache hits (which never trigger a FAISS save) - so it saves on its own too, and once more on shutdown.
+        self.exact_cache = ExactMatchCache(file_path='models/database/cache_exactmatches.json', max_size=5000, save_interval=50)
+        atexit.register(self.exact_cache.flush)
+
     def load_mt_cache(self):
-        self.mt_cache = FAISSStore(db_path='models/database/cache', model_name='nite', save_interval=50, db_name='_index', data_name='_machinetranslations')
+        self.mt_cache = FAISSStore(
+            db_path='models/database/cache', model_name='nite', save_interval=50, db_name='_index', data_name='_machinetranslations',
+            on_save=self.exact_cache.save,
+        )
+
+    def normalize_input(self, inp: str):
+        # Cut any context. TODO: Sure about this?
+        return inp.split('<TSOS>')[-1].strip()
+
+    def set_exact_cache_scope(self, translation_model_name: str, target_terms: list):
+        scope = json.dumps({ "model": translation_model_name, "target_terms": target_terms }, sort_keys=True, ensure_ascii=False)
+
+        if self.exact_cache.set_scope(scope):
+            logger.log_message('Exact match cache cleared as the translation model or target terms changed')
+
+    def get_stats(self):
+        return {
+            "exact_match": self.exact_cache.get_stats(),
+        }
 
     def embed_text(self, inp: str):
         if self.mt_cache is None:
@@ -22,12 +48,16 @@ class MTCache():
 
     def look_for_translation(self, inp: str):
         with logger.begin_event('Checking vector cache') as ctx:
-            # Cut any context. TODO: Sure about this?
-            inp = inp.split('<TSOS>')[-1].strip()
+            inp = self.normalize_input(inp)
 
             if len(inp) == 0:
                 return [""], None
 
+            exact_translation = self.exact_cache.get(inp)
+            if exact_translation is not None:
+                ctx.log('Translation found in exact match cache')
+                return [exact_translation], None
+
             if self.mt_cache is None:
                 self.load_mt_cache()
 
@@ -35,12 +65,75 @@ class MTCache():
             if len(found_translations) > 0:
                 ctx.log(f'Translation already found in cache', cosine_sim=sim[0])
 
+                self.exact_cache.put(inp, found_translations[0])
                 return [found_translations[0]], embed_inp
             else:
                 ctx.log('Translation is new!')
 
         return None, embed_inp
 
-    def add_translation(self, embed_inp, prediction: str):
+    def look_for_translations(self, inps: list):
+        """
+        Batched version of look_for_translation - one embedding request and one index search for all non-empty inputs.
+
+        Returns a list of (translation candidates or None, embedding) - one for each input.
+        """
+        outputs = [(None, None) for _ in inps]
+
+        with logger.begin_event('Checking vector cache for batch', n_inputs=len(inps)) as ctx:
+            to_search = []
+            to_search_indices = []
+
+            for idx, inp in enumerate(inps):
+                inp = self.normalize_input(inp)
+
+                if len(inp) == 0:
+                    outputs[idx] = ([""], None)
+                    continue
+
+                exact_translation = self.exact_cache.get(inp)
+                if exact_translation is not None:
+                    outputs[idx] = ([exact_translation], None)
+                else:
+                    to_search.append(inp)
+                    to_search_indices.append(idx)
+
+            if len(to_search) == 0:
+                ctx.log('All inputs found in exact match cache (or empty)', **self.exact_cache.get_stats())
+                return outputs
+
+            if self.mt_cache is None:
+                self.load_mt_cache()
+
+            all_found_translations, all_sims, embed_inps = self.mt_cache.retrieve_many(to_search, top_k=1, similarity_threshold=0.975)
+
+            for search_idx, (idx, found_translations, sim) in enumerate(zip(to_search_indices, all_found_translations, all_sims)):
+                embed_inp = embed_inps[search_idx:search_idx + 1] # Keep it 2D, same as look_for_translation.
+
+                if len(found_translations) > 0:
+                    outputs[idx] = ([found_translations[0]], embed_inp)
+                    self.exact_cache.put(to_search[search_idx], found_translations[0])
+                else:
+                    outputs[idx] = (None, embed_inp)
+
+            ctx.log('Done checking cache', n_found=sum(1 for o in outputs if o[0] is not None), n_searched=len(to_search), **self.exact_cache.get_stats())
+
+        return outputs
+
+    def add_translation(self, embed_inp, prediction: str, inp: str = None):
         with logger.begin_event('Adding to vector cache') as ctx:
             self.mt_cache.add_translation_from_embed(embed_inp, prediction)
+
+            if inp is not None:
+                self.exact_cache.put(self.normalize_input(inp), prediction)
+
+    def add_translations(self, embed_inps: list, predictions: list, inps: list = None):
+        if len(predictions) == 0:
+            return
+
+        with logger.begin_event('Adding batch to vector cache', n_predictions=len(predictions)) as ctx:
+            self.mt_cache.add_translations_from_embeds(np.concatenate(embed_inps, axis=0), predictions)
+
+            if inps is not None:
+                for inp, prediction in zip(inps, predictions):
+                    self.exact_cache.put(self.normalize_input(inp), prediction)
@@ -7,6 +7,7 @@ from gandy.utils.fancy_logger import logger
 import numpy as np
 from gandy.translation.llama_server_wrapper import LlamaCppExecutableOpenAIClient
 from gandy.utils.find_free_port import find_tcp_port
+from gandy.database.record_log import RecordLog
 
 # Vibe coded bro.
 
@@ -70,7 +71,7 @@ class FAISSEmbedder:
         return embed
 
 class FAISSStore:
-    def __init__(self, db_path: str, model_name: str, hnsw_m: int = 32, save_interval: int = 50, db_name = '_index', data_name = '_machinetranslations', high_cost = False):
+    def __init__(self, db_path: str, model_name: str, hnsw_m: int = 32, save_interval: int = 50, db_name = '_index', data_name = '_machinetranslations', high_cost = False, on_save = None, index_checkpoint_interval: int = 500):
         """
         Initialize the FAISSStore.
 
@@ -78,18 +79,23 @@ class FAISSStore:
         :param model_name: Name of the multilingual model for embedding.
         :param hnsw_m: Number of neighbors for HNSW graph construction (default: 32).
         :param save_interval: Number of additions after which the database is saved (default: 50). Set to -1 to disable.
+        :param index_checkpoint_interval: Number of additions after which the FAISS index itself is rewritten on an interval save (default: 500). Idle saves always checkpoint it.
+        :param on_save: Optional callback run after every save - for anything else that should be persisted alongside the database.
         """
         self.db_path = db_path + db_name
         self.hnsw_m = hnsw_m
         self.embedder = FAISSEmbedder(model_name, high_cost=high_cost)
         self.index = None
-        self.translations = []  # Store only translated_text
+        self.translations = None  # Store only translated_text - a RecordLog.
         self.translations_file = db_path + data_name
         self.save_interval = save_interval
         self.add_count = 0  # Tracks the number of additions since the last save
+        self.index_checkpoint_interval = index_checkpoint_interval
+        self.adds_since_checkpoint = 0  # Tracks the number of additions since the index was last written
         self.save_lock = threading.Lock()  # Lock for thread-safe saving
         self.save_timer = None  # Timer for periodic saving
         self.timer_lock = threading.Lock()  # Lock for thread-safe timer management
+        self.on_save = on_save
 
         self.can_auto_save = self.save_interval != -1
 
@@ -97,19 +103,32 @@ class FAISSStore:
         self._load_or_initialize_index()
 
     def _load_or_initialize_index(self):
+        # Translations live in an append-only record log. Older versions saved them as one big pickled array - migrate those once.
+        if not os.path.exists(self.translations_file + '.records') and os.path.exists(self.translations_file):
+            RecordLog.migrate_from_npy(self.translations_file, self.translations_file)
+
+        self.translations = RecordLog(self.translations_file)
+
         try:
             self.index = faiss.read_index(self.db_path)
             logger.log(f"Loaded FAISS index from {self.db_path}")
-            if os.path.exists(self.translations_file):
-                self.translations = np.load(self.translations_file, allow_pickle=True).tolist()
-                logger.log(f"Loaded {len(self.translations)} translations from {self.translations_file}")
         except Exception:
             logger.log("Creating a new FAISS HNSW index.")
             dimension = 384  # TODO: Cleaner. # self.embedder.model.config.hidden_size
             self.index = faiss.IndexHNSWFlat(dimension, self.hnsw_m, faiss.METRIC_INNER_PRODUCT)  # HNSW index with cosine similarity
             self.index.hnsw.efConstruction = 200  # High-quality graph construction
             self.index.hnsw.efSearch = 50  # Fast and accurate retrieval
-            self.translations = []
+
+        # Translations are always written before the index is checkpointed, so the index can only be behind. Drop the translations it doesn't know about.
+        if len(self.translations) > self.index.ntotal:
+            logger.log(f"Dropping {len(self.translations) - self.index.ntotal} translations that were saved after the last index checkpoint.")
+            self.translations.truncate(self.index.ntotal)
+        elif len(self.translations) < self.index.ntotal:
+            logger.log("FAISS index has more entries than there are translations - starting over.")
+            self.index.reset()
+            self.translations.truncate(0)
+
+        logger.log(f"Loaded {len(self.translations)} translations from {self.translations_file}")
 
     def _reset_save_timer(self, start = True):
         """
@@ -124,22 +143,32 @@ class FAISSStore:
                 self.save_timer = threading.Timer(30, self._save_async)  # Set a new timer
                 self.save_timer.start()
 
-    def _save_async(self):
+    def _checkpoint_index(self):
+        # ... Can't believe we have to worry about atomicity here.
+        temp_db_path = self.db_path + ".tmpclunky"
+        faiss.write_index(self.index, temp_db_path)
+        os.replace(temp_db_path, self.db_path)
+
+        self.adds_since_checkpoint = 0
+
+    def _save_async(self, checkpoint_index = True):
         """
         Save the FAISS index and translations asynchronously.
+
+        New translations are always appended to the record log (cheap). The index is a full rewrite, so unless checkpoint_index is True it's only
+        written once index_checkpoint_interval additions have piled up.
         """
         with self.save_lock:
-            # ... Can't believe we have to worry about atomicity here.
-            temp_db_path = self.db_path + ".tmpclunky"
-            faiss.write_index(self.index, temp_db_path)
-            os.replace(temp_db_path, self.db_path)
+            n_written = self.translations.flush()
 
-            temp_translations_file = self.translations_file + ".tmp"
-            np.save(temp_translations_file, np.array(self.translations, dtype=object))
+            if checkpoint_index or self.adds_since_checkpoint >= self.index_checkpoint_interval:
+                self._checkpoint_index()
+                logger.log(f"FAISS index checkpointed to {self.db_path} and {n_written} new translations appended to {self.translations_file}.")
+            else:
+                logger.log(f"{n_written} new translations appended to {self.translations_file}.")
 
-            # np.save auto adds .npy extension -_-
-            os.replace(temp_translations_file + ".npy", self.translations_file)
-            logger.log(f"FAISS index and translations saved to {self.db_path} and {self.translations_file}.")
+            if self.on_save is not None:
+                self.on_save()
 
     def _add(self, source_texts: list, translated_texts: list, already_embed = False, do_log = True):
         """
@@ -152,20 +181,40 @@ class FAISSStore:
         embeddings = source_texts if already_embed else self.embedder.embed(source_texts)
         embeddings = embeddings / np.linalg.norm(embeddings, axis=1, keepdims=True)  # Normalize for cosine similarity
 
-        self.index.add(embeddings)
+        # Translations first - a save in between must never checkpoint an index with more entries than there are translations on disk.
         self.translations.extend(translated_texts)
+        self.index.add(embeddings)
 
         if do_log:
             logger.log(f"Added {len(translated_texts)} translations to the index.")
         self.add_count += len(translated_texts)
+        self.adds_since_checkpoint += len(translated_texts)
 
         save_right_now = self.add_count >= self.save_interval and self.can_auto_save
         if save_right_now:
             self.add_count = 0
-            threading.Thread(target=self._save_async).start()  # Save asynchronously
+            threading.Thread(target=self._save_async, kwargs={ "checkpoint_index": False }).start()  # Save asynchronously
 
         self._reset_save_timer(start=(not save_right_now))  # Reset the save timer after each addition
 
+    def _map_search_results(self, queries: list, distances, indices, similarity_threshold, ctx):
+        all_results, all_dists = [], []
+
+        for query, q_distances, q_indices in zip(queries, distances, indices):
+            results, dists = [], []
+
+            for dist, idx in zip(q_distances, q_indices):
+                if idx != -1 and dist >= similarity_threshold:  # Cosine similarity is higher for closer matches
+                    results.append(self.translations[idx])
+                    dists.append(dist)
+                if idx != -1:
+                    ctx.log(f'Found neighbor with similarity score', cosine_similarity=dist, neighbor=self.translations[idx], query=query)
+
+            all_results.append(results)
+            all_dists.append(dists)
+
+        return all_results, all_dists
+
     def retrieve(self, query: str, top_k: int = 5, similarity_threshold = 0.95) -> list:
         """
         Retrieve translations similar to the query.
@@ -180,16 +229,29 @@ class FAISSStore:
             query_embedding = self.embedder.embed([query])
             query_embedding = query_embedding / np.linalg.norm(query_embedding, axis=1, keepdims=True)  # Normalize
             distances, indices = self.index.search(query_embedding, top_k)
-            results, dists = [], []
 
-            for dist, idx in zip(distances[0], indices[0]):
-                if idx != -1 and dist >= similarity_threshold:  # Cosine similarity is higher for closer matches
-                    results.append(self.translations[idx])
-                    dists.append(dist)
-                if idx != -1:
-                    ctx.log(f'Found neighbor with similarity score', cosine_similarity=dist, neighbor=self.translations[idx], query=query)
+            results, dists = self._map_search_results([query], distances, indices, similarity_threshold, ctx)
+
+        return results[0], dists[0], query_embedding
 
-        return results, dists, query_embedding
+    def retrieve_many(self, queries: list, top_k: int = 5, similarity_threshold = 0.95):
+        """
+        Retrieve translations similar to each query - with one embedding request and one index search for all of them.
+
+        :param queries: List of query sentences.
+        :param top_k: Number of top results to return per query.
+        :param similarity_threshold: Top results must pass this threshold to be returned.
+        :return: A list of translated_texts for each query, a list of distances for each query, and the query embeddings ([N, hidden dim]).
+        """
+
+        with logger.begin_event('Retrieving neighbors for batch', n_queries=len(queries)) as ctx:
+            query_embeddings = np.array(self.embedder.embed(queries), dtype=np.float32)
+            query_embeddings = query_embeddings / np.linalg.norm(query_embeddings, axis=1, keepdims=True)  # Normalize
+            distances, indices = self.index.search(query_embeddings, top_k)
+
+            results, dists = self._map_search_results(queries, distances, indices, similarity_threshold, ctx)
+
+        return results, dists, query_embeddings
 
     def add_translation(self, source_text: str, translated_text: str, do_log = True):
         """
@@ -206,6 +268,18 @@ class FAISSStore:
         """
         self._add(source_embed, [translated_text], already_embed=True)
 
+    def add_translations_from_embeds(self, source_embeds, translated_texts: list):
+        """
+        Add many translations to the FAISS index at once.
+
+        :param source_embeds: Array of source embeddings ([N, hidden dim]).
+        :param translated_texts: List of N translated sentences.
+        """
+        if len(translated_texts) == 0:
+            return
+
+        self._add(np.array(source_embeds, dtype=np.float32), translated_texts, already_embed=True)
+
     def embed_text(self, text: str):
         return self.embedder.embed([text])
 
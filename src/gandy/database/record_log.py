@@ -0,0 +1,235 @@
+import json
+import mmap
+import os
+import struct
+import threading
+import numpy as np
+from gandy.utils.fancy_logger import logger
+
+# Append-only storage for the values of a FAISSStore (translations, or (source, target) tuples for RAG).
+#
+# "{path}.records" = each value is stored as a 4 byte little-endian length followed by that many bytes of UTF-8 JSON.
+# "{path}.offsets" = a little-endian uint64 array with the byte offset of each record in the records file.
+#
+# Both files are only ever appended to (or truncated on load if a save was cut off halfway), so saving N new values costs N writes - not a rewrite of everything.
+# On load both files are memory-mapped, so startup doesn't have to decode every value.
+
+_LENGTH_PREFIX = struct.Struct('<I')
+_OFFSET_DTYPE = np.dtype('<u8')
+
+def _encode_value(value):
+    return json.dumps(value, ensure_ascii=False).encode('utf-8')
+
+def _decode_value(data: bytes):
+    value = json.loads(data.decode('utf-8'))
+
+    # JSON has no tuples - RAG values are (source, target) tuples.
+    if isinstance(value, list):
+        return tuple(value)
+    return value
+
+class RecordLog():
+    def __init__(self, file_path: str):
+        self.records_path = file_path + '.records'
+        self.offsets_path = file_path + '.offsets'
+
+        self.lock = threading.Lock()
+
+        self._records_file = None
+        self._records_mmap = None
+        self._offsets_mmap = None
+        self.n_mapped = 0 # Values that were on disk at load time - read from the mmaps.
+
+        self.tail = [] # Values added since the load - kept in memory.
+        self.n_tail_written = 0 # How many of the tail values were already appended to disk.
+
+        self._load()
+
+    def exists(self):
+        return os.path.exists(self.records_path) and os.path.exists(self.offsets_path)
+
+    def _find_valid_count(self):
+        # A save that was cut off can leave offsets without a (full) record behind them - or a record without its offset. Ignore both.
+        records_size = os.path.getsize(self.records_path)
+        offsets = np.fromfile(self.offsets_path, dtype=_OFFSET_DTYPE)
+
+        n_valid = len(offsets)
+        with open(self.records_path, 'rb') as f:
+            while n_valid > 0:
+                offset = int(offsets[n_valid - 1])
+
+                if offset + _LENGTH_PREFIX.size <= records_size:
+                    f.seek(offset)
+                    length = _LENGTH_PREFIX.unpack(f.read(_LENGTH_PREFIX.size))[0]
+
+                    if offset + _LENGTH_PREFIX.size + length <= records_size:
+                        return n_valid, offset + _LENGTH_PREFIX.size + length
+
+                n_valid -= 1
+
+        return 0, 0
+
+    def _truncate_files(self, n_records: int):
+        if n_records > 0:
+            offsets = np.fromfile(self.offsets_path, dtype=_OFFSET_DTYPE, count=n_records)
+            with open(self.records_path, 'rb') as f:
+                f.seek(int(offsets[-1]))
+                length = _LENGTH_PREFIX.unpack(f.read(_LENGTH_PREFIX.size))[0]
+            records_size = int(offsets[-1]) + _LENGTH_PREFIX.size + length
+        else:
+            records_size = 0
+
+        with open(self.records_path, 'r+b') as f:
+            f.truncate(records_size)
+        with open(self.offsets_path, 'r+b') as f:
+            f.truncate(n_records * _OFFSET_DTYPE.itemsize)
+
+    def _map(self):
+        if self.n_mapped == 0:
+            return
+
+        self._records_file = open(self.records_path, 'rb')
+        self._records_mmap = mmap.mmap(self._records_file.fileno(), 0, access=mmap.ACCESS_READ)
+        self._offsets_mmap = np.memmap(self.offsets_path, dtype=_OFFSET_DTYPE, mode='r', shape=(self.n_mapped,))
+
+    def _unmap(self):
+        self._offsets_mmap = None
+
+        if self._records_mmap is not None:
+            self._records_mmap.close()
+            self._records_mmap = None
+        if self._records_file is not None:
+            self._records_file.close()
+            self._records_file = None
+
+    def _load(self):
+        if not self.exists():
+            self.n_mapped = 0
+            return
+
+        n_valid, records_size = self._find_valid_count()
+
+        n_offsets = os.path.getsize(self.offsets_path) // _OFFSET_DTYPE.itemsize
+        if n_valid != n_offsets or records_size != os.path.getsize(self.records_path):
+            logger.log_message("Record log has an incomplete save - dropping it", records_path=self.records_path, n_valid=n_valid, n_offsets=n_offsets)
+            self._truncate_files(n_valid)
+
+        self.n_mapped = n_valid
+        self._map()
+
+    def __len__(self):
+        return self.n_mapped + len(self.tail)
+
+    def __getitem__(self, idx):
+        idx = int(idx)
+        if idx < 0:
+            idx += len(self)
+
+        if idx < self.n_mapped:
+            offset = int(self._offsets_mmap[idx])
+            length = _LENGTH_PREFIX.unpack_from(self._records_mmap, offset)[0]
+            start = offset + _LENGTH_PREFIX.size
+
+            return _decode_value(self._records_mmap[start:start + length])
+
+        return self.tail[idx - self.n_mapped]
+
+    def extend(self, values: list):
+        with self.lock:
+            self.tail.extend(values)
+
+    def append(self, value):
+        self.extend([value])
+
+    def flush(self):
+        """
+        Appends every value that isn't on disk yet. Records are written (and synced) before their offsets, so a cut off save never points to missing data.
+
+        Returns the number of values written.
+        """
+        with self.lock:
+            to_write = self.tail[self.n_tail_written:]
+            if len(to_write) == 0:
+                return 0
+
+            with open(self.records_path, 'ab') as f:
+                offset = f.tell()
+
+                offsets = []
+                for value in to_write:
+                    data = _encode_value(value)
+
+                    offsets.append(offset)
+                    f.write(_LENGTH_PREFIX.pack(len(data)))
+                    f.write(data)
+
+                    offset += _LENGTH_PREFIX.size + len(data)
+
+                f.flush()
+                os.fsync(f.fileno())
+
+            with open(self.offsets_path, 'ab') as f:
+                f.write(np.array(offsets, dtype=_OFFSET_DTYPE).tobytes())
+                f.flush()
+                os.fsync(f.fileno())
+
+            self.n_tail_written = len(self.tail)
+
+        return len(to_write)
+
+    def truncate(self, n_records: int):
+        """
+        Drops every value past the first n_records (on disk and in memory).
+        """
+        with self.lock:
+            if n_records >= len(self):
+                return
+
+            if n_records < self.n_mapped:
+                self._unmap()
+
+                self.tail = []
+                self.n_tail_written = 0
+
+                if self.exists():
+                    self._truncate_files(n_records)
+                self.n_mapped = n_records
+
+                self._map()
+            else:
+                n_keep_tail = n_records - self.n_mapped
+                n_tail_on_disk = min(self.n_tail_written, n_keep_tail)
+
+                self.tail = self.tail[:n_keep_tail]
+                if self.n_tail_written > n_keep_tail:
+                    self._truncate_files(n_records)
+                self.n_tail_written = n_tail_on_disk
+
+    def close(self):
+        with self.lock:
+            self._unmap()
+
+    @staticmethod
+    def migrate_from_npy(npy_path: str, file_path: str):
+        """
+        Converts an old pickled object array (np.save) of values into a record log. The old file is kept (renamed) as a backup.
+        """
+        with logger.begin_event('Migrating translations to record log', npy_path=npy_path) as ctx:
+            values = np.load(npy_path, allow_pickle=True).tolist()
+
+            records_path = file_path + '.records'
+            offsets_path = file_path + '.offsets'
+
+            # Fresh files - in case a previous migration was cut off.
+            for p in [records_path, offsets_path]:
+                if os.path.exists(p):
+                    os.remove(p)
+
+            log = RecordLog(file_path)
+            log.extend(values)
+            log.flush()
+            log.close()
+
+            os.replace(npy_path, npy_path + '.migrated')
+
+            ctx.log('Done migrating', n_values=len(values))
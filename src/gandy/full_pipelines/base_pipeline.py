@@ -25,6 +25,9 @@ from uuid import uuid4
 import os
 import json
 from gandy.database.faiss_mt_cache import MTCache
+from gandy.full_pipelines.frame_cache import FrameCache
+from gandy.full_pipelines.line_text_cache import LineTextCache
+import copy
 from gandy.utils.speech_sort import sort_frames, sort_text_in_sorted_frames, add_frames_for_ghost_text_boxes
 from gandy.utils.sanitize_for_ascii import sanitize_for_ascii
 import regex as re
@@ -103,6 +106,8 @@ class BasePipeline:
         frame_model: BaseImageDetection,
     ):
         self.mt_cache = MTCache()
+        self.frame_cache = FrameCache()
+        self.line_text_cache = LineTextCache()
 
         if text_detection_app is None:
             raise RuntimeError("text_detection_app must be given.")
@@ -192,10 +197,14 @@ class BasePipeline:
         source_texts_to_batch: List[str] = [] # Non-cached source texts will be collected into a batch.
         source_indices_to_batch: List[int] = [] # Which indices to place the outputs from batching into 'all_translation_outputs'.
 
+        if config_state.cache_mt:
+            # One embedding request + one index search for the whole page, rather than one of each per text.
+            cache_lookups = self.mt_cache.look_for_translations(source_texts)
+
         for idx, text in enumerate(source_texts):
             found_in_cache = False # Don't translate + correct spelling if we already found one (potentially) spelling corrected translation in cache.
             if config_state.cache_mt:
-                translation_candidates, cache_embedding = self.mt_cache.look_for_translation(text)
+                translation_candidates, cache_embedding = cache_lookups[idx]
 
                 if translation_candidates is not None:
                     found_in_cache = True
@@ -213,17 +222,30 @@ class BasePipeline:
                 source_texts_to_batch.append(text)
                 source_indices_to_batch.append(idx)
 
-        # Only GPU can batch.
+        # Only GPU can batch (unless the server was started with multiple slots).
         translation_can_cuda = config_state.use_cuda and not config_state.force_translation_cpu
 
+        n_parallel = config_state.translation_parallel_slots
+        # Batched calls don't stream - so on CPU, streaming requests stay one by one.
+        can_dispatch_parallel = n_parallel > 1 and (use_stream is None or translation_can_cuda)
+
         # Actually batch translate now.
-        if len(source_texts_to_batch) > 1 and translation_can_cuda:
-            with logger.begin_event('Batching translations', n_batch=len(source_texts_to_batch)):
+        if len(source_texts_to_batch) > 1 and can_dispatch_parallel and config_state.prefix_aware_scheduling:
+            # The translation app decides which text goes to which slot (and in what order).
+            with logger.begin_event('Dispatching translations with prefix-aware scheduling', n_batch=len(source_texts_to_batch), n_parallel=n_parallel):
+                translation_outputs = self.translation_app.begin_process(
+                    texts=source_texts_to_batch,
+                    use_stream=use_stream,
+                )  # string[]
+        elif len(source_texts_to_batch) > 1 and (can_dispatch_parallel or translation_can_cuda):
+            # Everything is sent at once - the server works on up to n_parallel of them at a time and queues the rest,
+            # so a slot picks up the next text as soon as it's done (rather than waiting for the slowest text in a group of n_parallel).
+            with logger.begin_event('Batching translations', n_batch=len(source_texts_to_batch), n_parallel=n_parallel):
                 translation_outputs = self.translation_app.begin_process(
                     texts=source_texts_to_batch,
                     use_stream=use_stream,
                 )  # string[]
-        elif len(source_texts_to_batch) <= 1 or not translation_can_cuda:
+        else:
             translation_outputs = []
 
             for idx, source_item in enumerate(source_texts_to_batch):
@@ -242,6 +264,10 @@ class BasePipeline:
             all_translation_outputs[idx] = output
             # The cache[idx] is still False, which means after the spelling correction is done the translation will be cached.
 
+        embs_to_cache = []
+        outputs_to_cache = []
+        inputs_to_cache = []
+
         # TODO(?): Batching spelling corrections too.
         for idx, (text, translation_output, found_in_cache, emb) in enumerate(zip(source_texts, all_translation_outputs, was_found_in_cache, cached_embs)):
 
@@ -258,13 +284,18 @@ class BasePipeline:
             target_texts.append(translation_output)
 
             if config_state.cache_mt and not found_in_cache and len(translation_output) > 0:
-                self.mt_cache.add_translation(emb, translation_output)
+                embs_to_cache.append(emb)
+                outputs_to_cache.append(translation_output)
+                inputs_to_cache.append(text)
 
             if progress_cb is not None:
                 # Max progress for this part is 80.
                 # Min is 70.
                 progress_cb(compute_progress(cur_step=(idx + 1), max_steps=len(source_texts), min_value=70, max_value=80))
 
+        if config_state.cache_mt:
+            self.mt_cache.add_translations(embs_to_cache, outputs_to_cache, inputs_to_cache)
+
         return replace_terms_target_side(target_texts, config_state.target_terms)
 
     def get_source_texts_from_bboxes(
@@ -316,12 +347,24 @@ class BasePipeline:
             logger.event_exception(ctx=None)
             return []
 
+    def _detect_in_chunks(self, im_chunks):
+        detection_app = self.text_detection_app.get_sel_app()
+        if not hasattr(detection_app, 'begin_process_batch'):
+            return [self._detect_in_chunk(im_chunk) for im_chunk in im_chunks]
+
+        try:
+            return detection_app.begin_process_batch(im_chunks)
+        except Exception:
+            logger.log('AN ERROR HAS SPAWNED! Falling back to detecting one tile at a time...')
+            logger.event_exception(ctx=None)
+            return [self._detect_in_chunk(im_chunk) for im_chunk in im_chunks]
+
     def get_bboxes_from_image(self, rgb_image: Image, with_frames = True):
         with logger.begin_event("Text detection") as ctx:
             if config_state.tile_width != 100 or config_state.tile_height != 100:
                 ctx.log('Splitting image into tiles', tile_width=config_state.tile_width, tile_height=config_state.tile_height)
 
-                speech_bboxes = detect_image_chunks(rgb_image, config_state.tile_width, config_state.tile_height, detect_in_chunk=self._detect_in_chunk)
+                speech_bboxes = detect_image_chunks(rgb_image, config_state.tile_width, config_state.tile_height, detect_in_chunk=self._detect_in_chunk, detect_in_chunks=self._detect_in_chunks)
             else:
                 speech_bboxes = self._detect_in_chunk(rgb_image)
 
@@ -343,7 +386,7 @@ class BasePipeline:
 
         return speech_bboxes
     
-    def _translate_image_to_image_from_data(self, source_texts, rgb_image, speech_bboxes, progress_cb=None, return_debug_data=False, skip_redrawing=False, cb_on_text_done=None, grouped_line_bboxes=None):
+    def _translate_texts_from_data(self, source_texts, speech_bboxes, progress_cb=None, cb_on_text_done=None):
         target_texts = self.get_target_texts_from_str(
             source_texts=source_texts, use_stream=None, progress_cb=progress_cb,
         )
@@ -367,13 +410,9 @@ class BasePipeline:
         if cb_on_text_done is not None:
             cb_on_text_done(source_texts, target_texts)
 
-        if skip_redrawing:
-            return {
-                "target_texts": target_texts,
-                "source_texts": source_texts,
-                "speech_bboxes": speech_bboxes,
-            }
+        return target_texts, speech_bboxes
 
+    def _redraw_image_from_data(self, source_texts, target_texts, rgb_image, speech_bboxes, progress_cb=None, return_debug_data=False, grouped_line_bboxes=None):
         with logger.begin_event("Image cleaning"):
             if self.image_cleaning_app.get_sel_app_name() == "adaptive_clean_liner": # TODO: shouldn't need a manual hack here.
                 cleaning_output = self.image_cleaning_app.begin_process(rgb_image, speech_bboxes, grouped_line_bboxes)
@@ -426,30 +465,46 @@ class BasePipeline:
             return rgb_image, is_amg, debug_data
         return rgb_image, is_amg
 
-    def image_to_image(
-        self,
-        image: Image,
-        progress_cb=None,
-        return_debug_data=False,
-        return_metadata_to_translate_later=False,
-        skip_redrawing=False,
-        cb_on_text_done=None,
-    ):
-        with logger.begin_event("Image to image") as ctx:
+    def _translate_image_to_image_from_data(self, source_texts, rgb_image, speech_bboxes, progress_cb=None, return_debug_data=False, skip_redrawing=False, cb_on_text_done=None, grouped_line_bboxes=None):
+        target_texts, speech_bboxes = self._translate_texts_from_data(
+            source_texts, speech_bboxes, progress_cb=progress_cb, cb_on_text_done=cb_on_text_done,
+        )
 
-            rgb_image = image.convert("RGB")
+        if skip_redrawing:
+            return {
+                "target_texts": target_texts,
+                "source_texts": source_texts,
+                "speech_bboxes": speech_bboxes,
+            }
 
-            if progress_cb is not None:
-                progress_cb(progress=10)
+        return self._redraw_image_from_data(
+            source_texts=source_texts,
+            target_texts=target_texts,
+            rgb_image=rgb_image,
+            speech_bboxes=speech_bboxes,
+            progress_cb=progress_cb,
+            return_debug_data=return_debug_data,
+            grouped_line_bboxes=grouped_line_bboxes,
+        )
 
-            speech_bboxes = self.get_bboxes_from_image(rgb_image, with_frames=True)
-            if progress_cb is not None:
-                progress_cb(progress=20)
+    def _detect_image_to_image_data(self, image: Image, progress_cb=None):
+        rgb_image = image.convert("RGB")
+
+        if progress_cb is not None:
+            progress_cb(progress=10)
+
+        speech_bboxes = self.get_bboxes_from_image(rgb_image, with_frames=True)
+        if progress_cb is not None:
+            progress_cb(progress=20)
 
-            if debug_state.debug or debug_state.debug_dump_task1:
-                # Dump image and detected BBOX coordinates.
-                dump_task1_debug_data(rgb_image, speech_bboxes)
+        if debug_state.debug or debug_state.debug_dump_task1:
+            # Dump image and detected BBOX coordinates.
+            dump_task1_debug_data(rgb_image, speech_bboxes)
 
+        return rgb_image, speech_bboxes
+
+    def _recognize_image_to_image_data(self, rgb_image: Image, speech_bboxes, progress_cb=None):
+        with logger.begin_event("Recognizing texts for image to image") as ctx:
             # detect_speaker_name here is False as we typically only care for it during detached text box translation tasks.
             # That said, it can still be used in image_to_image tasks if the global setting detect_speaker_name is used (keeping in-line with legacy purposes).
             # (text recognition app checks for detect_speaker_name and config_state.detect_speaker_name)
@@ -486,23 +541,37 @@ class BasePipeline:
 
             source_texts = pack_context(source_texts, config_state.n_context, ignore_single_words_in_context=False)
 
+        return {
+            'source_texts': source_texts,
+            'rgb_image': rgb_image,
+            'speech_bboxes': speech_bboxes,
+            'grouped_line_bboxes': grouped_line_bboxes,
+        }
+
+    def image_to_image(
+        self,
+        image: Image,
+        progress_cb=None,
+        return_debug_data=False,
+        return_metadata_to_translate_later=False,
+        skip_redrawing=False,
+        cb_on_text_done=None,
+    ):
+        # The steps here are split into separate methods so that task1 can also run them as stages of a pipeline (see StagedPipeline).
+        with logger.begin_event("Image to image") as ctx:
+            rgb_image, speech_bboxes = self._detect_image_to_image_data(image, progress_cb=progress_cb)
+
+            data_to_translate = self._recognize_image_to_image_data(rgb_image, speech_bboxes, progress_cb=progress_cb)
+
             if return_metadata_to_translate_later:
-                return {
-                    'source_texts': source_texts,
-                    'rgb_image': rgb_image,
-                    'speech_bboxes': speech_bboxes,
-                    'grouped_line_bboxes': grouped_line_bboxes,
-                }
+                return data_to_translate
             else:
                 return self._translate_image_to_image_from_data(
-                    source_texts=source_texts,
                     progress_cb=progress_cb,
-                    rgb_image=rgb_image,
-                    speech_bboxes=speech_bboxes,
                     return_debug_data=return_debug_data,
                     skip_redrawing=skip_redrawing,
                     cb_on_text_done=cb_on_text_done,
-                    grouped_line_bboxes=grouped_line_bboxes,
+                    **data_to_translate,
                 )
 
     def text_to_text(
@@ -526,34 +595,141 @@ class BasePipeline:
                 return target_texts, source_texts
             return target_texts
 
+    def get_frame_cache_scope(self, with_text_detect, detect_speaker_name, text_line_app_scan_image_if_fails):
+        # A cached frame is only valid for the same models and options. (Config changes clear the cache - see /switchmodels)
+        return (
+            self.text_detection_app.get_sel_app_name() if with_text_detect else None,
+            self.text_line_app.get_sel_app_name(),
+            self.text_recognition_app.get_sel_app_name(),
+            detect_speaker_name,
+            text_line_app_scan_image_if_fails,
+        )
+
     def image_to_untranslated_texts(
         self, image: Image, with_text_detect=False, with_ocr=True, detect_speaker_name=False, text_line_app_scan_image_if_fails=True,
     ):
         with logger.begin_event("Image to untranslated texts") as ctx:
             image = image.convert("RGB")
 
-            # We never want to tile an image here. Tiling is only for task1 (image to image).
-            old_tile_width = config_state.tile_width
-            old_tile_height = config_state.tile_height
-            config_state.tile_width = 100
-            config_state.tile_height = 100
+            frame_entry_id = None
+            if config_state.cache_frames:
+                frame_scope = self.get_frame_cache_scope(with_text_detect, detect_speaker_name, text_line_app_scan_image_if_fails)
+                frame_hash = self.frame_cache.hash_frame(image)
 
-            if with_text_detect:
-                speech_bboxes = self.get_bboxes_from_image(image, with_frames=False)
-            else:
-                speech_bboxes = create_entire_bbox(image)
+                cached = self.frame_cache.get(frame_scope, image, frame_hash, config_state.frame_cache_tolerance)
+                if cached is not None:
+                    frame_entry_id, speech_bboxes, source_texts = cached
+                    ctx.log('Found frame in frame cache', has_texts=source_texts is not None)
+
+                    if not with_ocr:
+                        return image, copy.deepcopy(speech_bboxes)
+                    if source_texts is not None:
+                        return list(source_texts)
 
-            config_state.tile_width = old_tile_width
-            config_state.tile_height = old_tile_height
+                    # Cached without OCR - only the OCR is left to do.
+                    speech_bboxes = copy.deepcopy(speech_bboxes)
+
+            if frame_entry_id is None:
+                # We never want to tile an image here. Tiling is only for task1 (image to image).
+                old_tile_width = config_state.tile_width
+                old_tile_height = config_state.tile_height
+                config_state.tile_width = 100
+                config_state.tile_height = 100
+
+                if with_text_detect:
+                    speech_bboxes = self.get_bboxes_from_image(image, with_frames=False)
+                else:
+                    speech_bboxes = create_entire_bbox(image)
+
+                config_state.tile_width = old_tile_width
+                config_state.tile_height = old_tile_height
 
             if with_ocr:
                 source_texts = self.get_source_texts_from_bboxes(image, speech_bboxes, detect_speaker_name=detect_speaker_name, text_line_app_scan_image_if_fails=text_line_app_scan_image_if_fails)
+
+                if config_state.cache_frames:
+                    if frame_entry_id is None:
+                        self.frame_cache.put(frame_scope, image, frame_hash, copy.deepcopy(speech_bboxes), list(source_texts))
+                    else:
+                        self.frame_cache.set_texts(frame_entry_id, list(source_texts))
+
                 return source_texts
             else:
+                if config_state.cache_frames:
+                    self.frame_cache.put(frame_scope, image, frame_hash, copy.deepcopy(speech_bboxes))
+
                 return image, speech_bboxes
 
+    def can_ocr_incrementally(self, image: Image, dirty_mask, box_id):
+        # dirty_mask comes from the task3 background watcher - it must line up with the captured image.
+        return (
+            config_state.incremental_watch_ocr
+            and dirty_mask is not None
+            and box_id is not None
+            and dirty_mask.shape[:2] == (image.height, image.width)
+        )
+
+    def check_precomputed_lines(self, image: Image, precomputed_lines):
+        # Line boxes from the task3 background watcher (see are_lines_stale) - only usable if they fit the captured image.
+        if precomputed_lines is None or len(precomputed_lines) == 0:
+            return None
+
+        precomputed_lines = np.asarray(precomputed_lines)
+        if precomputed_lines[:, 2].max() > image.width + 1 or precomputed_lines[:, 3].max() > image.height + 1:
+            logger.log_message("Ignoring precomputed lines - they don't fit the image", image_size=image.size)
+            return None
+
+        return precomputed_lines
+
+    def image_to_untranslated_texts_from_lines(
+        self, image: Image, precomputed_lines=None, dirty_mask=None, box_id=None, detect_speaker_name=False, text_line_app_scan_image_if_fails=True,
+    ):
+        """
+        Same as image_to_untranslated_texts without text detection, but:
+        - precomputed_lines: Line boxes already detected on this image - the line app is not run again.
+        - dirty_mask & box_id: Lines that don't touch the changed area reuse their text from the last scan of this box. (see can_ocr_incrementally)
+        """
+        ocr_app = self.text_recognition_app.get_sel_app()
+        if not hasattr(ocr_app, "begin_process_lines"):
+            return self.image_to_untranslated_texts(image, False, detect_speaker_name=detect_speaker_name, text_line_app_scan_image_if_fails=text_line_app_scan_image_if_fails)
+
+        with logger.begin_event("Image to untranslated texts (from lines)") as ctx:
+            image = image.convert("RGB")
+            incremental = self.can_ocr_incrementally(image, dirty_mask, box_id)
+
+            line_bboxes = self.check_precomputed_lines(image, precomputed_lines)
+            if line_bboxes is None:
+                # Same fallback rule as get_source_texts_from_bboxes.
+                scan_image_if_fails = text_line_app_scan_image_if_fails and not self.text_detection_app.get_sel_app_name() == "none"
+
+                with logger.begin_event("Detecting lines"):
+                    line_bboxes = self.text_line_app.get_sel_app().get_images(image, return_image_if_fails=scan_image_if_fails)
+            else:
+                ctx.log("Using precomputed lines", n_lines=len(line_bboxes))
+
+            if len(line_bboxes) == 0:
+                if incremental:
+                    self.line_text_cache.forget(box_id)
+                # Same as image_to_untranslated_texts without text detection - callers expect exactly one (empty) text.
+                return [""]
+
+            if incremental:
+                known_texts = self.line_text_cache.get_known_texts(box_id, line_bboxes, dirty_mask)
+                ctx.log("Reusing unchanged lines", n_lines=len(known_texts), n_reused=sum(1 for t in known_texts if t is not None))
+            else:
+                known_texts = None
+
+            with logger.begin_event("Text recognition"):
+                text, line_texts = ocr_app.begin_process_lines(image, line_bboxes, known_texts, detect_speaker_name=detect_speaker_name)
+
+            if incremental:
+                self.line_text_cache.update(box_id, line_bboxes, line_texts)
+
+            return [text]
+
     def image_to_single_text(
         self, image: Image, with_text_detect=False, context_input=[], use_stream=None, detect_speaker_name=False, text_line_app_scan_image_if_fails=True,
+        dirty_mask=None, box_id=None, precomputed_lines=None,
     ):
         with logger.begin_event("Image to single text") as ctx:
             image = image.convert("RGB")
@@ -561,7 +737,13 @@ class BasePipeline:
             # Each detached text box can specify whether or not it expects a speaker name to be detected.
             # Or the user can enable it for all boxes (globally via config_state).
             # In hindsight, rushing into the code without proper test coverage was the worst mistake I've ever made.
-            source_texts = self.image_to_untranslated_texts(image, with_text_detect, detect_speaker_name=detect_speaker_name, text_line_app_scan_image_if_fails=text_line_app_scan_image_if_fails)
+            if not with_text_detect and (precomputed_lines is not None or self.can_ocr_incrementally(image, dirty_mask, box_id)):
+                source_texts = self.image_to_untranslated_texts_from_lines(
+                    image, precomputed_lines=precomputed_lines, dirty_mask=dirty_mask, box_id=box_id,
+                    detect_speaker_name=detect_speaker_name, text_line_app_scan_image_if_fails=text_line_app_scan_image_if_fails,
+                )
+            else:
+                source_texts = self.image_to_untranslated_texts(image, with_text_detect, detect_speaker_name=detect_speaker_name, text_line_app_scan_image_if_fails=text_line_app_scan_image_if_fails)
 
             if len(source_texts) == 0:
                 return [None, None]
@@ -583,6 +765,7 @@ class BasePipeline:
 
     def image_to_line_texts(
         self, image: Image, use_stream=None, bottom_n_lines=0, join_lines_until_finds="", text_line_app_scan_image_if_fails=True,
+        dirty_mask=None, box_id=None, precomputed_lines=None,
     ):
         all_targets = []
 
@@ -593,15 +776,36 @@ class BasePipeline:
             # NOTE: detect_speaker_name will not work here. It doesn't make sense here anyways.
 
             # Line app .get_images() also handles any custom sorting logic.
-            line_bboxes = self.text_line_app.get_sel_app().get_images(image, return_image_if_fails=True).tolist()
+            line_bboxes = self.check_precomputed_lines(image, precomputed_lines)
+            if line_bboxes is not None:
+                ctx.log("Using precomputed lines", n_lines=len(line_bboxes))
+            else:
+                line_bboxes = self.text_line_app.get_sel_app().get_images(image, return_image_if_fails=True)
+            line_bboxes = line_bboxes.tolist()
 
             line_rows = get_bottom_rows(boxes=line_bboxes, N=bottom_n_lines)
 
+            incremental = self.can_ocr_incrementally(image, dirty_mask, box_id)
+            scanned_bboxes, scanned_texts = [], []
+
             unjoined_source_lines = []
 
             for idx, row in enumerate(line_rows):
-                # TODO: Add batch for full images (not just lines)?
-                line_texts = self.get_source_texts_from_bboxes(image, row, use_text_line_app=False, text_line_app_scan_image_if_fails=text_line_app_scan_image_if_fails)
+                if incremental:
+                    # Only lines touching the changed area are OCR'd again.
+                    line_texts = self.line_text_cache.get_known_texts(box_id, row, dirty_mask)
+                    missing_indices = [i for i, t in enumerate(line_texts) if t is None]
+
+                    if len(missing_indices) > 0:
+                        missing_texts = self.get_source_texts_from_bboxes(image, [row[i] for i in missing_indices], use_text_line_app=False, text_line_app_scan_image_if_fails=text_line_app_scan_image_if_fails)
+                        for i, t in zip(missing_indices, missing_texts):
+                            line_texts[i] = t
+
+                    scanned_bboxes.extend(row)
+                    scanned_texts.extend(line_texts)
+                else:
+                    # TODO: Add batch for full images (not just lines)?
+                    line_texts = self.get_source_texts_from_bboxes(image, row, use_text_line_app=False, text_line_app_scan_image_if_fails=text_line_app_scan_image_if_fails)
                 line_texts = "".join(line_texts)
 
                 source_texts = merge_texts(line_texts, [])
@@ -611,6 +815,9 @@ class BasePipeline:
 
                 unjoined_source_lines.append(source_texts)
 
+            if incremental:
+                self.line_text_cache.update(box_id, scanned_bboxes, scanned_texts)
+
             if join_lines_until_finds != "":
                 # Sometimes certain games split sentences e.g: dialogues across multiple text box lines.
                 joined_source_lines = []
@@ -0,0 +1,106 @@
+import threading
+from collections import OrderedDict
+import cv2
+import numpy as np
+from PIL import Image
+from gandy.utils.hash_index import hamming_distances
+
+# Task3/task4 captures of a static text box (e.g: a visual novel waiting on the next click) are usually the same frame over and over.
+# This remembers the detected boxes and OCR'd texts of recent frames, keyed by a perceptual hash of the frame - so a repeat capture skips detection and OCR.
+#
+# A perceptual hash (rather than an exact one) because captures of the "same" frame are rarely byte identical (cursor blinking, compression noise...).
+# The tolerance is the max number of differing hash bits for two frames to count as the same. 0 = Only near-identical frames.
+
+def dhash(image: Image.Image, hash_size: int = 32):
+    """
+    Difference hash: is each pixel brighter than its right neighbor, on a small grayscale version of the image. Returns hash_size^2 bits, packed.
+
+    32x32 (rather than the usual 8x8) so changing a single character in a text box still changes the hash - sometimes by only 1 bit (see tests/test_frame_cache.py).
+    """
+    gray = np.asarray(image.convert("L"))
+    small = cv2.resize(gray, (hash_size + 1, hash_size), interpolation=cv2.INTER_AREA).astype(np.int16)
+
+    return np.packbits((small[:, 1:] > small[:, :-1]).ravel())
+
+class FrameCache():
+    def __init__(self, max_size: int = 32, hash_size: int = 32):
+        self.max_size = max_size
+        self.hash_size = hash_size
+
+        # Each value = (scope, image size, packed hash, speech bboxes, source texts or None).
+        self.entries = OrderedDict()
+        self.next_id = 0
+
+        self.hits = 0
+        self.misses = 0
+
+        self.lock = threading.Lock()
+
+    def hash_frame(self, image: Image.Image):
+        return dhash(image, self.hash_size)
+
+    def _find(self, scope, image_size, frame_hash: np.ndarray, tolerance: int):
+        candidates = [(entry_id, e) for entry_id, e in self.entries.items() if e[0] == scope and e[1] == image_size]
+        if len(candidates) == 0:
+            return None
+
+        hashes = np.stack([e[2] for _, e in candidates], axis=0)
+        distances = hamming_distances(hashes, frame_hash)
+
+        best = int(np.argmin(distances))
+        if distances[best] > tolerance:
+            return None
+
+        return candidates[best][0]
+
+    def get(self, scope, image: Image.Image, frame_hash: np.ndarray, tolerance: int):
+        """
+        Returns (entry id, speech bboxes, source texts or None) for a matching frame, else None.
+        """
+        with self.lock:
+            entry_id = self._find(scope, image.size, frame_hash, tolerance)
+
+            if entry_id is None:
+                self.misses += 1
+                return None
+
+            self.hits += 1
+            self.entries.move_to_end(entry_id)
+            _, _, _, speech_bboxes, source_texts = self.entries[entry_id]
+
+            return entry_id, speech_bboxes, source_texts
+
+    def put(self, scope, image: Image.Image, frame_hash: np.ndarray, speech_bboxes, source_texts=None):
+        with self.lock:
+            entry_id = self.next_id
+            self.next_id += 1
+
+            self.entries[entry_id] = (scope, image.size, frame_hash, speech_bboxes, source_texts)
+
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+
+            return entry_id
+
+    def set_texts(self, entry_id, source_texts):
+        # For a frame that was cached without OCR (with_ocr=False) and later OCR'd.
+        with self.lock:
+            if entry_id in self.entries:
+                scope, image_size, frame_hash, speech_bboxes, _ = self.entries[entry_id]
+                self.entries[entry_id] = (scope, image_size, frame_hash, speech_bboxes, source_texts)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def get_stats(self):
+        with self.lock:
+            n_lookups = self.hits + self.misses
+
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": (self.hits / n_lookups) if n_lookups > 0 else 0.0,
+                "size": len(self.entries),
+                "max_size": self.max_size,
+            }
@@ -0,0 +1,80 @@
+import threading
+import numpy as np
+from gandy.utils.box_ops import as_boxes, iou_matrix
+
+# The task3 background watcher (bg_activity_watcher.py) knows which pixels of a box changed since its last scan.
+# Typewriter-style dialogue usually only adds or changes a line or two - so rather than re-OCR'ing the whole box, this remembers the text of each line from the last scan.
+# A line is only OCR'd again if it touches the changed area, or if it doesn't (nearly) match a line from before.
+
+class LineTextCache():
+    def __init__(self, iou_thr: float = 0.96):
+        self.iou_thr = iou_thr
+
+        # key (e.g: box ID) -> (line bboxes [N, 4], raw line texts - before postprocessing)
+        self.entries = {}
+
+        self.hits = 0
+        self.misses = 0
+
+        self.lock = threading.Lock()
+
+    def get_known_texts(self, key, line_bboxes, dirty_mask: np.ndarray):
+        """
+        Returns one item per line: The previous text of that line, or None if it must be OCR'd again.
+
+        dirty_mask: Bool [H, W] mask of the changed pixels - same coords as the line bboxes.
+        """
+        line_bboxes = as_boxes(line_bboxes)
+        known_texts = [None for _ in range(line_bboxes.shape[0])]
+
+        with self.lock:
+            entry = self.entries.get(key)
+
+        if entry is None or line_bboxes.shape[0] == 0 or entry[0].shape[0] == 0:
+            with self.lock:
+                self.misses += len(known_texts)
+            return known_texts
+
+        prev_bboxes, prev_texts = entry
+        ious = iou_matrix(line_bboxes, prev_bboxes)
+
+        h, w = dirty_mask.shape[:2]
+        for idx, (x1, y1, x2, y2) in enumerate(np.round(line_bboxes).astype(np.int64)):
+            x1, x2 = np.clip([x1, x2], 0, w)
+            y1, y2 = np.clip([y1, y2], 0, h)
+            if dirty_mask[y1:y2, x1:x2].any():
+                continue
+
+            best = int(np.argmax(ious[idx]))
+            if ious[idx, best] >= self.iou_thr:
+                known_texts[idx] = prev_texts[best]
+
+        with self.lock:
+            n_found = sum(1 for t in known_texts if t is not None)
+            self.hits += n_found
+            self.misses += len(known_texts) - n_found
+
+        return known_texts
+
+    def update(self, key, line_bboxes, line_texts):
+        with self.lock:
+            self.entries[key] = (as_boxes(line_bboxes), list(line_texts))
+
+    def forget(self, key):
+        with self.lock:
+            self.entries.pop(key, None)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def get_stats(self):
+        with self.lock:
+            n_lookups = self.hits + self.misses
+
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": (self.hits / n_lookups) if n_lookups > 0 else 0.0,
+                "size": len(self.entries),
+            }
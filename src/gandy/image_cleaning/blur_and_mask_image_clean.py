@@ -5,6 +5,7 @@ import cv2
 from typing import List
 from gandy.utils.speech_bubble import SpeechBubble
 from gandy.image_cleaning.tnet_image_clean import TNetImageClean
+from gandy.image_cleaning.roi_inpaint import inpaint_roi
 
 
 class BlurMaskImageCleanApp(TNetImageClean):
@@ -16,8 +17,8 @@ class BlurMaskImageCleanApp(TNetImageClean):
             image, bboxes, return_masks_only=True
         )
 
-        inpainted_image = cv2.inpaint(
-            np.array(image), easy_mask, inpaintRadius=1, flags=cv2.INPAINT_TELEA
+        inpainted_image = inpaint_roi(
+            np.array(image), easy_mask, inpaint_radius=1, flags=cv2.INPAINT_TELEA
         )
         inpainted_image = Image.fromarray(inpainted_image)
 
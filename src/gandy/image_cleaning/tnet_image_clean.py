@@ -2,13 +2,13 @@ from PIL import Image
 import numpy as np
 from gandy.onnx_models.ttnet import TTNetONNX
 from gandy.image_cleaning.base_image_clean import BaseImageClean
+from gandy.image_cleaning.tnet_mask_mixin import TNetMaskMixin
+from gandy.image_cleaning.roi_inpaint import inpaint_roi
 from gandy.state.config_state import config_state
-from math import floor
 import cv2
-import albumentations as A
 
 
-class TNetImageClean(BaseImageClean):
+class TNetImageClean(TNetMaskMixin, BaseImageClean):
     def __init__(self):
         super().__init__()
 
@@ -27,76 +27,21 @@ class TNetImageClean(BaseImageClean):
 
     def unload_model(self):
         try:
+            self.tnet_model.unload_session()
             del self.tnet_model
         except:
             pass
         return super().unload_model()
 
-    def get_image_transform(self):
-        transforms = [A.ToGray(always_apply=True)]
-
-        return A.Compose(transforms)
-
-    def detect_mask(self, cropped_image):
-        processed, confidence_scores = self.tnet_model.full_pipe(cropped_image)
-
-        add_to_mask = True
-        return add_to_mask, processed
-
-    def validate_mask(self, detected_mask, cropped_image):
-        return True
-
     def process(self, image: Image.Image, bboxes, return_masks_only=False):
-        full_mask_image = image.copy()
-        full_mask_image = np.array(full_mask_image)
-        full_mask_image[:, :, :] = 0  # Fill background.
-        full_mask_image = full_mask_image[:, :, :1]  # Only get 1 channel.
-
-        added_to_mask = []
-
-        for bbox in bboxes:
-            x1, y1, x2, y2 = bbox
-            x1 = floor(x1)
-            y1 = floor(y1)
-            x2 = floor(x2)
-            y2 = floor(y2)
-
-            cropped_image = image.crop([x1, y1, x2, y2])
-
-            cropped_image = np.array(cropped_image)
-            cropped_image = self.transform(image=cropped_image)["image"]
-
-            add_to_mask, detected_mask = self.detect_mask(
-                cropped_image
-            )  # Expected to be H * W * 1 (where 1 = channel)
-
-            if add_to_mask:
-                detected_mask = detected_mask * 255
-
-                # Add that text mask. Should be in range [0, 255]
-                # NOTE: Sometimes the mask is larger than the image due to bounding box rounding errors. Todo fix. Currently bandaid fix.
-                if x2 > full_mask_image.shape[1]:
-                    detected_mask = detected_mask[
-                        :, 0 : full_mask_image.shape[1] - x1, :
-                    ]
-                if y2 > full_mask_image.shape[0]:
-                    detected_mask = detected_mask[
-                        0 : full_mask_image.shape[0] - y1, :, :
-                    ]
-
-                if self.validate_mask(detected_mask, cropped_image):
-                    full_mask_image[y1:y2, x1:x2] = detected_mask
-                else:
-                    add_to_mask = False
-
-            added_to_mask.append(add_to_mask)
+        full_mask_image, added_to_mask = self.detect_full_mask(image, bboxes)
 
         if not return_masks_only:
-            # Clean!
-            inpainted_image = cv2.inpaint(
+            # Clean! Only around the masked areas - the rest of the page is left as is anyways.
+            inpainted_image = inpaint_roi(
                 np.array(image),
                 full_mask_image,
-                inpaintRadius=4,
+                inpaint_radius=4,
                 flags=cv2.INPAINT_TELEA,
             )
             inpainted_image = Image.fromarray(inpainted_image)
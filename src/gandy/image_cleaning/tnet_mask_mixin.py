@@ -0,0 +1,78 @@
+from PIL import Image
+import numpy as np
+from math import floor
+import albumentations as A
+from gandy.state.config_state import config_state
+
+class TNetMaskMixin():
+    """
+    Detects the text mask of every speech bubble with TTNet (self.tnet_model) and puts them together into one full page mask.
+
+    The bubble crops are run through TTNet in batches (see TTNetONNX.full_pipe_batch) rather than one at a time.
+    """
+    def get_image_transform(self):
+        # Just to detect text masks.
+        transforms = [A.ToGray(always_apply=True)]
+
+        return A.Compose(transforms)
+
+    def detect_masks(self, cropped_images):
+        """
+        Returns one (add_to_mask, detected_mask) per cropped image. detected_mask is expected to be H * W * 1 (where 1 = channel), with values 0 or 1.
+        """
+        outputs = self.tnet_model.full_pipe_batch(cropped_images, max_batch_size=config_state.clean_max_batch_size)
+
+        return [(True, processed) for processed, confidence_scores in outputs]
+
+    def validate_mask(self, detected_mask, cropped_image):
+        return True
+
+    def detect_full_mask(self, image: Image.Image, bboxes):
+        """
+        Returns the full page mask (H * W * 1, values 0 or 255) and a list for each speech bubble - True if it was used for this mask and False otherwise.
+        """
+        full_mask_image = np.zeros((image.height, image.width, 1), dtype=np.uint8)
+
+        coords = []
+        cropped_images = []
+        for bbox in bboxes:
+            x1, y1, x2, y2 = bbox
+            x1 = floor(x1)
+            y1 = floor(y1)
+            x2 = floor(x2)
+            y2 = floor(y2)
+
+            cropped_image = image.crop([x1, y1, x2, y2])
+
+            cropped_image = np.array(cropped_image)
+            cropped_image = self.transform(image=cropped_image)["image"]
+
+            coords.append((x1, y1, x2, y2))
+            cropped_images.append(cropped_image)
+
+        detected = self.detect_masks(cropped_images) if len(cropped_images) > 0 else []
+
+        added_to_mask = []
+        for (x1, y1, x2, y2), cropped_image, (add_to_mask, detected_mask) in zip(coords, cropped_images, detected):
+            if add_to_mask:
+                detected_mask = detected_mask * 255
+
+                # Add that text mask. Should be in range [0, 255]
+                # NOTE: Sometimes the mask is larger than the image due to bounding box rounding errors. Todo fix. Currently bandaid fix.
+                if x2 > full_mask_image.shape[1]:
+                    detected_mask = detected_mask[
+                        :, 0 : full_mask_image.shape[1] - x1, :
+                    ]
+                if y2 > full_mask_image.shape[0]:
+                    detected_mask = detected_mask[
+                        0 : full_mask_image.shape[0] - y1, :, :
+                    ]
+
+                if self.validate_mask(detected_mask, cropped_image):
+                    full_mask_image[y1:y2, x1:x2] = detected_mask
+                else:
+                    add_to_mask = False
+
+            added_to_mask.append(add_to_mask)
+
+        return full_mask_image, added_to_mask
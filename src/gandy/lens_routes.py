@@ -3,7 +3,7 @@ from gandy.app import app, translate_pipeline, remote_router
 from gandy.state.config_state import config_state
 from gandy.state.context_state import context_state
 from gandy.utils.fancy_logger import logger
-from mss import mss
+from gandy.utils.screen_capture import grab_rgb_image, get_monitors
 from PIL import Image
 from io import BytesIO
 from win32api import GetMonitorInfo, MonitorFromPoint
@@ -81,11 +81,8 @@ def scan_screen_task():
     with logger.begin_event("Lens scan screen") as ctx:
         taskbar_height = get_taskbar_height()
 
-        with mss() as sct:
-            monitor = sct.monitors[1]
-            sct_img = sct.grab({ "top": monitor["top"], "left": monitor["left"], "width": monitor["width"], "height": monitor["height"] - taskbar_height, })
-
-            img = Image.frombytes("RGB", sct_img.size, sct_img.bgra, "raw", "BGRX")
+        monitor = get_monitors()[0]
+        img = grab_rgb_image({ "top": monitor["top"], "left": monitor["left"], "width": monitor["width"], "height": monitor["height"] - taskbar_height, })
 
         if remote_router.is_remote():
             image_stream = BytesIO()
@@ -1,9 +1,8 @@
-from onnxruntime import (
-    GraphOptimizationLevel,
-    InferenceSession,
-    SessionOptions,
-)
+import os
+from onnxruntime import InferenceSession
 from gandy.utils.fancy_logger import logger
+from gandy.onnx_models.session_profiles import resolve_session_profile, create_session_options, get_session_key
+from gandy.onnx_models.session_pool import session_pool, free_session, estimate_session_bytes
 
 
 # If creating a model from this, make sure to manually call load_dataloader() (if needed), and load_session.
@@ -24,15 +23,18 @@ class BaseONNXModel:
         if self.use_cuda is None:
             raise RuntimeError("use_cuda must be True or False.")
 
-        options = SessionOptions()
-        options.intra_op_num_threads = 1
-        options.inter_op_num_threads = 1
-        # options.graph_optimization_level = GraphOptimizationLevel.ORT_ENABLE_ALL
+        profile = resolve_session_profile(onnx_path, type(self).__name__)
+        self.session_key = get_session_key(onnx_path, self.use_cuda, profile)
 
-        options.enable_mem_pattern = False
-        options.enable_profiling = False
-        options.enable_cpu_mem_arena = False
-        options.enable_mem_reuse = False
+        pooled = session_pool.take(self.session_key)
+        if pooled is not None:
+            logger.log_message("Reusing pooled ONNX session", onnx_path=onnx_path)
+            self.ort_sess, self.session_bytes = pooled
+            return self.ort_sess
+
+        logger.log_message("Creating ONNX session", onnx_path=onnx_path, profile=profile)
+
+        model_path, options = create_session_options(profile, onnx_path, self.use_cuda)
         cuda_provider_options = {"arena_extend_strategy": "kSameAsRequested", "do_copy_in_default_stream": False, "cudnn_conv_use_max_workspace": "0"}
 
         options.log_severity_level = 3
@@ -45,21 +47,50 @@ class BaseONNXModel:
             logger.info("CUDA disabled. Will only use CPU.")
             provider = ["CPUExecutionProvider"]
 
-        self.ort_sess = InferenceSession(onnx_path, options, provider)
+        try:
+            self.ort_sess = InferenceSession(model_path, options, provider)
+        except Exception:
+            if model_path == onnx_path:
+                raise
+
+            # The cached optimized model is broken (e.g: the app was closed while it was being written). Remake it.
+            logger.info(f"Failed to load the optimized model {model_path} - loading the original model instead.")
+            os.remove(model_path)
+
+            model_path, options = create_session_options(profile, onnx_path, self.use_cuda)
+            options.log_severity_level = 3
+            self.ort_sess = InferenceSession(model_path, options, provider)
         # ? self.ort_sess.disable_fallback()
 
+        self.session_bytes = estimate_session_bytes(model_path)
+
         return self.ort_sess
 
     def load_session(self, onnx_path):
         self.ort_sess = self.create_session(onnx_path)
 
-    def unload_session(self):
+    def supports_batching(self):
+        """
+        True if the first input of the session has a dynamic batch axis - some older exports have a fixed batch size of 1.
+        """
         try:
-            # See: https://github.com/microsoft/onnxruntime/issues/17142
-            self.ort_sess.set_providers([])
+            batch_dim = self.ort_sess.get_inputs()[0].shape[0]
+        except Exception:
+            return False
+
+        return not isinstance(batch_dim, int)
 
-            del self.ort_sess
+    def unload_session(self):
+        try:
+            ort_sess = self.ort_sess
             self.ort_sess = None
+
+            # Kept warm in the session pool if it's enabled (and the session fits), else freed.
+            session_key = getattr(self, "session_key", None)
+            if ort_sess is not None and (session_key is None or not session_pool.put(session_key, ort_sess, self.session_bytes)):
+                free_session(ort_sess)
+
+            del ort_sess
         except:
             pass
 
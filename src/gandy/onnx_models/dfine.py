@@ -2,6 +2,7 @@ from gandy.onnx_models.base_onnx_model import BaseONNXModel
 
 from PIL import Image
 import numpy as np
+from typing import List
 
 # A lot of code borrowed from: https://github.com/Peterande/D-FINE/blob/master/tools/inference/onnx_inf.py
 # Can I just say how GRATEFUL I am to have a working functional ONNX example? Ultralytics was so... "vague" OML.
@@ -32,41 +33,70 @@ class DFineONNX(BaseONNXModel):
         # From HWC to CHW
         return np.transpose(norm, (2, 0, 1))
 
-    def forward(self, x: Image.Image):
-        resized_im_pil, ratio, pad_w, pad_h = resize_with_aspect_ratio(x, 1024)
-        orig_size = np.array([[resized_im_pil.size[1], resized_im_pil.size[0]]])
+    def letterbox_batch(self, images: List[Image.Image], size=1024):
+        """
+        Resizes and pads every image straight into one preallocated [B, 3, size, size] array.
+
+        Same output as resize_with_aspect_ratio + np_transform per image, without the intermediate padded images.
+        """
+        batch = np.zeros((len(images), 3, size, size), dtype=np.float32)
+        ratios = np.empty((len(images), 1), dtype=np.float32)
+        pads = np.empty((len(images), 2), dtype=np.float32) # pad_w, pad_h
+
+        for i, image in enumerate(images):
+            ratio = min(size / image.width, size / image.height)
+            new_width = int(image.width * ratio)
+            new_height = int(image.height * ratio)
+            pad_w = (size - new_width) // 2
+            pad_h = (size - new_height) // 2
+
+            resized = np.asarray(image.resize((new_width, new_height), Image.BICUBIC), dtype=np.uint8)
+            batch[i, :, pad_h:pad_h + new_height, pad_w:pad_w + new_width] = resized.transpose(2, 0, 1)
+
+            ratios[i] = ratio
+            pads[i] = (pad_w, pad_h)
+
+        batch /= 255.0 # Scale to [0, 1] just like torchvision's ToTensor.
+
+        return batch, ratios, pads
 
-        im_data = self.np_transform(resized_im_pil)
-        im_data = im_data[None, ...] # Unsqueeze to get a batch size of 1.
+    def forward_batch(self, images: List[Image.Image]):
+        """
+        Runs every image through the model in one session call.
+
+        Returns a list with one [1, 5, N] array per image (same as forward()).
+        """
+        size = 1024
+        im_data, ratios, pads = self.letterbox_batch(images, size)
+        orig_sizes = np.full((len(images), 2), size, dtype=np.int64)
 
         output = self.ort_sess.run(
             output_names=None,
-            input_feed={"images": im_data, "orig_target_sizes": orig_size.astype(np.int64)}
+            input_feed={"images": im_data, "orig_target_sizes": orig_sizes}
         )
 
+        labels, boxes, scores = output # boxes = [B, N, 4], scores = [B, N]
+
+        # Unpad.
+        boxes = boxes.astype(np.float32, copy=True)
+        boxes[..., [0, 2]] -= pads[:, None, 0:1]
+        boxes[..., [1, 3]] -= pads[:, None, 1:2]
+        boxes /= ratios[:, None, :]
+
+        # Clip - rarely DETR goes under/over.
+        widths = np.array([im.width for im in images], dtype=np.float32)[:, None]
+        heights = np.array([im.height for im in images], dtype=np.float32)[:, None]
+        boxes[..., 0] = np.maximum(boxes[..., 0], 0)
+        boxes[..., 1] = np.maximum(boxes[..., 1], 0)
+        boxes[..., 2] = np.minimum(boxes[..., 2], widths)
+        boxes[..., 3] = np.minimum(boxes[..., 3], heights)
+
         # bboxes_data mapped to be like YOLOONNX - [1, 5, 8400] where the 2nd axis (5 elements) represents the coordinates and the confidence score.
-        labels, boxes, scores = output
-        bboxes = []
-
-        # [0] refers to the first image in the batch - the only image.
-        for lbl, bb, scr in zip(labels[0], boxes[0], scores[0]):
-            bb = [
-                # Unpad.
-                (bb[0] - pad_w) / ratio,
-                (bb[1] - pad_h) / ratio,
-                (bb[2] - pad_w) / ratio,
-                (bb[3] - pad_h) / ratio,
-                # Add confidence.
-                scr,
-            ]
-
-            # Clip - rarely DETR goes under/over.
-            bb[0] = max(0, bb[0])
-            bb[1] = max(0, bb[1])
-            bb[2] = min(x.width, bb[2])
-            bb[3] = min(x.height, bb[3])
-
-            bboxes.append(bb)
+        bboxes = np.concatenate([boxes, scores[..., None].astype(np.float32)], axis=-1) # [B, N, 5]
+        bboxes = np.transpose(bboxes, (0, 2, 1)) # [B, 5, N]
+
+        return [bboxes[i:i + 1] for i in range(len(images))]
 
+    def forward(self, x: Image.Image):
         # [1("bsz"), 5(coords + score), N(number of boxes)]
-        return np.stack(bboxes, axis=1)[np.newaxis, ...]
+        return self.forward_batch([x])[0]
@@ -3,30 +3,17 @@ import cv2
 from PIL import Image
 import numpy as np
 
-def merge_boxes(boxes):
-    """Calculates the bounding box that encompasses all boxes in the list."""
-    if not boxes:
-        return None
-    x_min = min(b[0] for b in boxes)
-    y_min = min(b[1] for b in boxes)
-    x_max = max(b[2] for b in boxes)
-    y_max = max(b[3] for b in boxes)
-    return (x_min, y_min, x_max, y_max)
-
-def calculate_overlap_ratio(b1_start, b1_end, b2_start, b2_end):
-    """Generic 1D overlap ratio (intersection / box_length)."""
-    box_len = b1_end - b1_start
-    if box_len <= 0: return 0.0
-    
-    intersection = min(b1_end, b2_end) - max(b1_start, b2_start)
-    return max(0, intersection) / box_len
-
 # TODO: We may not want this in the future... This is currently needed due to LineMixin messing up the reading order sometimes.
 def group_and_merge_bboxes(boxes, overlap_threshold=0.5):
-    if not boxes:
-        return []
+    """
+    Merges boxes on the same line (boxes overlapping the running line span by >= overlap_threshold) into one box. Returns [M, 4].
+    """
+    boxes = np.asarray(boxes, dtype=np.float64).reshape(-1, 4)
+    if boxes.shape[0] == 0:
+        return boxes
 
-    avg_aspect_ratio = sum((b[2]-b[0])/(b[3]-b[1]) for b in boxes) / len(boxes)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        avg_aspect_ratio = ((boxes[:, 2] - boxes[:, 0]) / (boxes[:, 3] - boxes[:, 1])).mean()
     is_horizontal = avg_aspect_ratio >= 1.0
 
     # Horizontal: Group by Y (idx 1,3), Sort by X (idx 0)
@@ -35,32 +22,83 @@ def group_and_merge_bboxes(boxes, overlap_threshold=0.5):
     sort_idx = 0 if is_horizontal else 1
 
     # TODO: Maybe unnecessary.
-    boxes.sort(key=lambda b: (b[group_idx[0]], b[sort_idx]))
+    boxes = boxes[np.lexsort((boxes[:, sort_idx], boxes[:, group_idx[0]]))]
 
-    lines = []
-    current_group = []
-    curr_min, curr_max = -1, -1
+    # Each box joins the current line if it overlaps the line's span (so far) enough - that running span makes this one a plain loop.
+    group_starts = [0]
+    spans = boxes[:, group_idx].tolist()
+    curr_min, curr_max = spans[0]
 
-    for box in boxes:
-        b_min, b_max = box[group_idx[0]], box[group_idx[1]]
-        
-        overlap = calculate_overlap_ratio(b_min, b_max, curr_min, curr_max)
+    for idx in range(1, len(spans)):
+        b_min, b_max = spans[idx]
+        box_len = b_max - b_min
 
-        if current_group and overlap >= overlap_threshold:
-            current_group.append(box)
+        overlap = (max(0, min(b_max, curr_max) - max(b_min, curr_min)) / box_len) if box_len > 0 else 0.0
 
+        if overlap >= overlap_threshold:
             curr_min = min(curr_min, b_min)
             curr_max = max(curr_max, b_max)
         else:
-            if current_group:
-                lines.append(merge_boxes(current_group))
-            current_group = [box]
+            group_starts.append(idx)
             curr_min, curr_max = b_min, b_max
 
-    if current_group:
-        lines.append(merge_boxes(current_group))
+    return np.stack([
+        np.minimum.reduceat(boxes[:, 0], group_starts),
+        np.minimum.reduceat(boxes[:, 1], group_starts),
+        np.maximum.reduceat(boxes[:, 2], group_starts),
+        np.maximum.reduceat(boxes[:, 3], group_starts),
+    ], axis=1)
+
+def box_scores(pred: np.ndarray, boxes: np.ndarray):
+    """
+    Mean probability inside each (rotated) box [N, 4, 2] - same as filling a mask per box and taking cv2.mean over it.
+
+    Boxes that fill their whole bounding window (axis aligned ones - most text lines) are scored from an integral image instead. Only the rest get a mask.
+    """
+    dest_h, dest_w = pred.shape
+
+    x1 = np.clip(np.floor(boxes[:, :, 0].min(axis=1)).astype(np.int64), 0, dest_w - 1)
+    x2 = np.clip(np.ceil(boxes[:, :, 0].max(axis=1)).astype(np.int64), 0, dest_w - 1)
+    y1 = np.clip(np.floor(boxes[:, :, 1].min(axis=1)).astype(np.int64), 0, dest_h - 1)
+    y2 = np.clip(np.ceil(boxes[:, :, 1].max(axis=1)).astype(np.int64), 0, dest_h - 1)
+
+    win_w = x2 - x1 + 1
+    win_h = y2 - y1 + 1
+
+    # The polygon as it would be drawn into the window mask (rounded like a float32 box).
+    polys = (boxes - np.stack([x1, y1], axis=1)[:, None, :]).astype(np.float32).astype(np.int32)
+
+    on_x_edge = polys[:, :, 0] == (win_w - 1)[:, None]
+    on_y_edge = polys[:, :, 1] == (win_h - 1)[:, None]
+    on_corners = ((polys[:, :, 0] == 0) | on_x_edge) & ((polys[:, :, 1] == 0) | on_y_edge)
+    corner_codes = np.sort(on_x_edge * 2 + on_y_edge, axis=1)
+
+    fills_window = on_corners.all(axis=1) & (corner_codes == np.arange(4)[None, :]).all(axis=1) & (win_w > 1) & (win_h > 1)
+
+    scores = np.zeros(boxes.shape[0], dtype=np.float64)
+
+    integral = cv2.integral(pred, sdepth=cv2.CV_64F)
+    sums = integral[y2 + 1, x2 + 1] - integral[y1, x2 + 1] - integral[y2 + 1, x1] + integral[y1, x1]
+    scores[fills_window] = (sums / (win_w * win_h))[fills_window]
+
+    for idx in np.flatnonzero(~fills_window):
+        mask = np.zeros((win_h[idx], win_w[idx]), dtype=np.uint8)
+        cv2.fillPoly(mask, [polys[idx]], 1)
+
+        scores[idx] = cv2.mean(pred[y1[idx]:y2[idx] + 1, x1[idx]:x2[idx] + 1], mask)[0]
+
+    return scores
 
-    return lines
+def polygon_areas_and_perimeters(boxes: np.ndarray):
+    # Same as cv2.contourArea & cv2.arcLength (closed), for [N, 4, 2] float32 boxes.
+    prev = np.roll(boxes, 1, axis=1)
+
+    areas = np.abs((prev[:, :, 0].astype(np.float64) * boxes[:, :, 1] - prev[:, :, 1].astype(np.float64) * boxes[:, :, 0]).sum(axis=1)) * 0.5
+
+    d = boxes - prev
+    perimeters = np.sqrt(d[:, :, 0] * d[:, :, 0] + d[:, :, 1] * d[:, :, 1]).astype(np.float64).sum(axis=1)
+
+    return areas, perimeters
 
 # This is copied from D-Fine, but is probably not equivalent to whatever preprocessing they use.
 def resize_with_aspect_ratio(image, size, interpolation=Image.BICUBIC):
@@ -88,7 +126,11 @@ class PpONNX(BaseONNXModel):
 
     # Partially vibe-verified.
     def map_to_boxes(self, pred_map, thresh=0.3, box_thresh=0.6, unclip_ratio=1.5):
-        dest_h, dest_w = pred_map.shape[1:3]
+        """
+        Probability map [1, H, W] -> boxes [N, 4] (x1, y1, x2, y2) in map coords.
+
+        Dense pages give hundreds of contours - only the two OpenCV box calls are done per contour, the rest for all of them at once.
+        """
         pred = pred_map[0]
 
         thresh = self.thresh
@@ -99,63 +141,34 @@ class PpONNX(BaseONNXModel):
 
         contours, _ = cv2.findContours((bitmap * 255), cv2.RETR_LIST, cv2.CHAIN_APPROX_SIMPLE)
 
-        boxes = []
-        for contour in contours:
-            # Get the oriented bounding "box" from the segmentation map.
-            rect = cv2.minAreaRect(contour)
-            points = cv2.boxPoints(rect)
-
-            points = sorted(list(points), key=lambda x: x[0])
-            if points[1][1] > points[0][1]:
-                index_1, index_4 = 0, 1
-            else:
-                index_1, index_4 = 1, 0
-            if points[3][1] > points[2][1]:
-                index_2, index_3 = 2, 3
-            else:
-                index_2, index_3 = 3, 2
-
-            box = np.array([points[index_1], points[index_2], points[index_3], points[index_4]])
-
-            # Just a heuristic.
-            if min(rect[1]) < 3:
-                continue
-
-            # We calculate the mean score of the pixels INSIDE the box
-            xmin = np.clip(np.floor(box[:, 0].min()).astype(int), 0, dest_w - 1)
-            xmax = np.clip(np.ceil(box[:, 0].max()).astype(int), 0, dest_w - 1)
-            ymin = np.clip(np.floor(box[:, 1].min()).astype(int), 0, dest_h - 1)
-            ymax = np.clip(np.ceil(box[:, 1].max()).astype(int), 0, dest_h - 1)
-
-            mask = np.zeros((ymax - ymin + 1, xmax - xmin + 1), dtype=np.uint8)
-            shifted_box = box.copy()
-            shifted_box[:, 0] -= xmin
-            shifted_box[:, 1] -= ymin
-            cv2.fillPoly(mask, [shifted_box.astype(np.int32)], 1)
-
-            # The crucial part: mean of probability map in that region
-            score = cv2.mean(pred[ymin:ymax + 1, xmin:xmax + 1], mask)[0]
-
-            if score < box_thresh:
-                continue
-
-            # Vatti Unclip (Expansion)
-            # Distance = (Area * unclip_ratio) / Perimeter
-            area = cv2.contourArea(box)
-            perimeter = cv2.arcLength(box, True)
-            if perimeter == 0: continue
-            distance = area * unclip_ratio / perimeter
-
-            new_w, new_h = rect[1][0] + distance * 2, rect[1][1] + distance * 2
-            expanded_rect = (rect[0], (new_w, new_h), rect[2])
-            expanded_box = cv2.boxPoints(expanded_rect)
-
-            x1, y1 = np.min(expanded_box, axis=0)
-            x2, y2 = np.max(expanded_box, axis=0)
-
-            boxes.append([x1, y1, x2, y2])
+        # Get the oriented bounding "box" from the segmentation map.
+        rects = [cv2.minAreaRect(contour) for contour in contours]
 
-        return boxes
+        # Just a heuristic.
+        rects = [r for r in rects if min(r[1]) >= 3]
+        if len(rects) == 0:
+            return np.empty((0, 4), dtype=np.float32)
+
+        boxes = np.stack([cv2.boxPoints(r) for r in rects], axis=0) # [N, 4, 2]
+
+        # We calculate the mean score of the pixels INSIDE the box
+        scores = box_scores(pred, boxes)
+
+        # Vatti Unclip (Expansion)
+        # Distance = (Area * unclip_ratio) / Perimeter
+        areas, perimeters = polygon_areas_and_perimeters(boxes)
+        keep = np.flatnonzero((scores >= box_thresh) & (perimeters != 0))
+        if keep.shape[0] == 0:
+            return np.empty((0, 4), dtype=np.float32)
+
+        distances = areas[keep] * unclip_ratio / perimeters[keep]
+
+        expanded_boxes = np.stack([
+            cv2.boxPoints((rects[idx][0], (rects[idx][1][0] + d * 2, rects[idx][1][1] + d * 2), rects[idx][2]))
+            for idx, d in zip(keep.tolist(), distances.tolist())
+        ], axis=0)
+
+        return np.concatenate([expanded_boxes.min(axis=1), expanded_boxes.max(axis=1)], axis=1)
 
     def np_transform(self, image: Image.Image):
         arr = np.array(image, dtype=np.uint8)
@@ -192,28 +205,19 @@ class PpONNX(BaseONNXModel):
             input_feed={"x": im_data,}
         )
 
-        mapped_boxes = self.map_to_boxes(output[0][0, ...]) # First [0] to get first output (only output). Only 1 image in batch so we take that.
-
-        bboxes = []
-        for bb in mapped_boxes:
-            bb = [
-                # Unpad.
-                (bb[0] - pad_w) / ratio,
-                (bb[1] - pad_h) / ratio,
-                (bb[2] - pad_w) / ratio,
-                (bb[3] - pad_h) / ratio,
-            ]
+        bboxes = self.map_to_boxes(output[0][0, ...]) # First [0] to get first output (only output). Only 1 image in batch so we take that.
 
-            # Clip - rarely DETR goes under/over.
-            bb[0] = max(0, bb[0])
-            bb[1] = max(0, bb[1])
-            bb[2] = min(x.width, bb[2])
-            bb[3] = min(x.height, bb[3])
+        # Unpad.
+        bboxes[:, [0, 2]] = (bboxes[:, [0, 2]] - pad_w) / ratio
+        bboxes[:, [1, 3]] = (bboxes[:, [1, 3]] - pad_h) / ratio
 
-            bboxes.append(bb)
+        # Clip - rarely DETR goes under/over.
+        bboxes[:, :2] = np.maximum(bboxes[:, :2], 0)
+        bboxes[:, 2] = np.minimum(bboxes[:, 2], x.width)
+        bboxes[:, 3] = np.minimum(bboxes[:, 3], x.height)
 
         bboxes = group_and_merge_bboxes(bboxes, overlap_threshold=0.35)
-        bboxes = [[*b, 1.0] for b in bboxes] # Add dummy confidence score.
+        bboxes = [[*b, 1.0] for b in bboxes.tolist()] # Add dummy confidence score.
 
         if len(bboxes) == 0:
             """
@@ -0,0 +1,110 @@
+import os
+import threading
+from collections import OrderedDict
+from gandy.state.dangerous_config import dangerous_config
+from gandy.utils.fancy_logger import logger
+
+# Switching models (/switchmodels, /changecleaning...) unloads every other app - so flipping back and forth used to recreate the same ONNX sessions over and over.
+# With "onnxSessionPoolMb" set in dangerousConfig.json, unloaded sessions are kept here (idle) instead, up to that memory budget.
+# The least recently released session is dropped first. A session is only ever used by one model: loading takes it out of the pool.
+
+def free_session(ort_sess):
+    try:
+        # See: https://github.com/microsoft/onnxruntime/issues/17142
+        ort_sess.set_providers([])
+    except:
+        pass
+
+def estimate_session_bytes(model_path: str):
+    # The weights make up most of a session's memory - close enough for a budget.
+    try:
+        return os.path.getsize(model_path)
+    except OSError:
+        return 0
+
+class SessionPool():
+    def __init__(self, budget_bytes: int = 0):
+        """
+        budget_bytes: Max (estimated) memory of the idle sessions kept. 0 = Disabled.
+        """
+        self.budget_bytes = budget_bytes
+
+        self.sessions = OrderedDict() # session key -> (session, n_bytes)
+        self.used_bytes = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self.lock = threading.Lock()
+
+    def take(self, key):
+        """
+        Returns (session, n_bytes) if an idle session for the key was pooled, else None.
+        """
+        if self.budget_bytes <= 0:
+            return None
+
+        with self.lock:
+            if key not in self.sessions:
+                self.misses += 1
+                return None
+
+            self.hits += 1
+            ort_sess, n_bytes = self.sessions.pop(key)
+            self.used_bytes -= n_bytes
+
+            return ort_sess, n_bytes
+
+    def put(self, key, ort_sess, n_bytes: int):
+        """
+        Keeps an idle session. Returns False if it was not kept - then the caller should free it as usual.
+        """
+        if self.budget_bytes <= 0 or n_bytes > self.budget_bytes:
+            return False
+
+        evicted = []
+        with self.lock:
+            if key in self.sessions:
+                return False # One idle session per key is enough.
+
+            self.sessions[key] = (ort_sess, n_bytes)
+            self.used_bytes += n_bytes
+
+            while self.used_bytes > self.budget_bytes:
+                evicted_key, (evicted_sess, evicted_bytes) = self.sessions.popitem(last=False)
+                self.used_bytes -= evicted_bytes
+                self.evictions += 1
+
+                evicted.append((evicted_key, evicted_sess, evicted_bytes))
+
+        for evicted_key, evicted_sess, evicted_bytes in evicted:
+            logger.log_message("Evicting idle ONNX session", onnx_path=evicted_key[0], n_bytes=evicted_bytes)
+            free_session(evicted_sess)
+
+        return True
+
+    def clear(self):
+        with self.lock:
+            sessions = list(self.sessions.values())
+            self.sessions.clear()
+            self.used_bytes = 0
+
+        for ort_sess, _ in sessions:
+            free_session(ort_sess)
+
+    def get_stats(self):
+        with self.lock:
+            return {
+                "budget_bytes": self.budget_bytes,
+                "used_bytes": self.used_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "sessions": [
+                    { "onnx_path": key[0], "use_cuda": key[1], "n_bytes": n_bytes, }
+                    for key, (_, n_bytes) in self.sessions.items()
+                ],
+            }
+
+session_pool = SessionPool(budget_bytes=int(dangerous_config.onnx_session_pool_mb * 1024 * 1024))
@@ -0,0 +1,157 @@
+import os
+import json
+import hashlib
+import onnxruntime
+from onnxruntime import ExecutionMode, GraphOptimizationLevel, SessionOptions
+from gandy.state.dangerous_config import dangerous_config
+
+# ONNX Runtime session options are picked per deployment in dangerousConfig.json:
+#
+# "onnxSessionProfile": "balanced" -> Profile used for every ONNX model.
+# "onnxSessionProfileOverrides": { "dfine_l": "throughput", "ttnet": { "intra_op_num_threads": 2 } } -> Per model (ONNX file name or class name).
+# "onnxSessionProfiles": { "my_profile": { "intra_op_num_threads": 3, ... } } -> Custom named profiles, built on top of "default".
+#
+# "default" is what we always used: one thread, no arena/mem pattern/mem reuse. Lowest memory usage - but slow on CPU.
+
+GRAPH_OPTIMIZATION_LEVELS = {
+    "disable": GraphOptimizationLevel.ORT_DISABLE_ALL,
+    "basic": GraphOptimizationLevel.ORT_ENABLE_BASIC,
+    "extended": GraphOptimizationLevel.ORT_ENABLE_EXTENDED,
+    "all": GraphOptimizationLevel.ORT_ENABLE_ALL,
+}
+
+EXECUTION_MODES = {
+    "sequential": ExecutionMode.ORT_SEQUENTIAL,
+    "parallel": ExecutionMode.ORT_PARALLEL,
+}
+
+def _n_cores():
+    return os.cpu_count() or 1
+
+SESSION_PROFILES = {
+    "default": {
+        "intra_op_num_threads": 1,
+        "inter_op_num_threads": 1,
+        "graph_optimization_level": None, # None = Leave ONNX Runtime's default.
+        "execution_mode": "sequential",
+        "enable_cpu_mem_arena": False,
+        "enable_mem_pattern": False,
+        "enable_mem_reuse": False,
+        # Save the graph-optimized model the first time, and load that on later loads (skipping the optimization).
+        "cache_optimized_model": False,
+        "optimized_model_dir": None, # Where the optimized models are saved. None = Next to each model.
+    },
+    # A few threads + the usual memory optimizations. Uses more RAM but is a good deal faster on CPU.
+    "balanced": {
+        "intra_op_num_threads": max(1, min(4, _n_cores() // 2)),
+        "inter_op_num_threads": 1,
+        "graph_optimization_level": "all",
+        "enable_cpu_mem_arena": True,
+        "enable_mem_pattern": True,
+        "enable_mem_reuse": True,
+        "cache_optimized_model": True,
+    },
+    # Every core for a single model. Best when only one model runs at a time.
+    "throughput": {
+        "intra_op_num_threads": 0, # 0 = ONNX Runtime picks (one per physical core).
+        "inter_op_num_threads": 1,
+        "graph_optimization_level": "all",
+        "enable_cpu_mem_arena": True,
+        "enable_mem_pattern": True,
+        "enable_mem_reuse": True,
+        "cache_optimized_model": True,
+    },
+}
+
+def get_profile_names():
+    return list(SESSION_PROFILES.keys()) + [n for n in dangerous_config.onnx_session_profiles.keys() if n not in SESSION_PROFILES]
+
+def _get_named_profile(profile_name: str):
+    custom_profiles = dangerous_config.onnx_session_profiles
+
+    if profile_name in custom_profiles:
+        return custom_profiles[profile_name]
+    if profile_name in SESSION_PROFILES:
+        return SESSION_PROFILES[profile_name]
+
+    raise ValueError(f"Unknown ONNX session profile: {profile_name} (known: {get_profile_names()})")
+
+def resolve_session_profile(onnx_path: str, class_name: str = None):
+    """
+    Returns the session profile (dict) to use for the given model: The deployment's profile, with any per-model overrides on top.
+    """
+    profile = dict(SESSION_PROFILES["default"])
+    profile.update(_get_named_profile(dangerous_config.onnx_session_profile))
+
+    model_name = os.path.splitext(os.path.basename(onnx_path))[0]
+    overrides = dangerous_config.onnx_session_profile_overrides
+
+    for key in [class_name, model_name]:
+        override = overrides.get(key, None) if key is not None else None
+
+        if isinstance(override, str):
+            profile.update(_get_named_profile(override))
+        elif isinstance(override, dict):
+            profile.update(override)
+
+    return profile
+
+def get_session_key(onnx_path: str, use_cuda: bool, profile):
+    # Two models can only share a session if all three match.
+    return (os.path.abspath(onnx_path), bool(use_cuda), json.dumps(profile, sort_keys=True))
+
+def get_optimized_model_path(onnx_path: str, use_cuda: bool, profile):
+    """
+    Where the optimized graph for this model is cached.
+
+    Optimized graphs can be specific to the execution provider (and ORT version), so those are part of the name - along with the source model's size and mtime, so a replaced model doesn't load a stale graph.
+    """
+    stat = os.stat(onnx_path)
+    tag_data = json.dumps({
+        "level": profile["graph_optimization_level"],
+        "cuda": bool(use_cuda),
+        "ort": onnxruntime.__version__,
+        "size": stat.st_size,
+        "mtime": int(stat.st_mtime),
+    }, sort_keys=True)
+    tag = hashlib.sha1(tag_data.encode("utf-8")).hexdigest()[:12]
+
+    model_dir = profile["optimized_model_dir"] or os.path.dirname(onnx_path)
+    model_name = os.path.splitext(os.path.basename(onnx_path))[0]
+
+    return os.path.join(model_dir, f"{model_name}.{tag}.opt.onnx")
+
+def create_session_options(profile, onnx_path: str, use_cuda: bool):
+    """
+    Returns the path of the model to load (the cached optimized model if there is one) and the session options.
+    """
+    options = SessionOptions()
+    options.intra_op_num_threads = int(profile["intra_op_num_threads"])
+    options.inter_op_num_threads = int(profile["inter_op_num_threads"])
+
+    if profile["graph_optimization_level"] is not None:
+        options.graph_optimization_level = GRAPH_OPTIMIZATION_LEVELS[profile["graph_optimization_level"]]
+    options.execution_mode = EXECUTION_MODES[profile["execution_mode"]]
+
+    options.enable_cpu_mem_arena = bool(profile["enable_cpu_mem_arena"])
+    options.enable_mem_pattern = bool(profile["enable_mem_pattern"])
+    options.enable_mem_reuse = bool(profile["enable_mem_reuse"])
+    options.enable_profiling = False
+
+    model_path = onnx_path
+
+    if profile["cache_optimized_model"]:
+        optimized_path = get_optimized_model_path(onnx_path, use_cuda, profile)
+        optimized_dir = os.path.dirname(optimized_path) or "."
+
+        if os.path.exists(optimized_path):
+            # Already optimized - no need to do it again.
+            model_path = optimized_path
+            options.graph_optimization_level = GraphOptimizationLevel.ORT_DISABLE_ALL
+        else:
+            os.makedirs(optimized_dir, exist_ok=True)
+
+            if os.access(optimized_dir, os.W_OK):
+                options.optimized_model_filepath = optimized_path
+
+    return model_path, options
@@ -26,9 +26,25 @@ class ConfigState:
 
         self.use_cuda = False
 
+        # Number of llama-server slots for the translation model. Above 1, uncached texts are sent up to this many at a time (on CPU too).
+        self.translation_parallel_slots = 1
+        # Send context-chained texts to the same slot in order (with prompt caching), rather than N at a time in any order.
+        self.prefix_aware_scheduling = False
+
         self.use_translation_server = False
         self.memory_efficient_tasks = False
 
+        # Task5 only: above 1, the video is read in chunks by this many worker processes (see chunked_frames.py). Each worker loads its own detection & OCR models.
+        self.task5_workers = 1
+        self.task5_chunk_secs = 60 # Length of each chunk of video given to a worker.
+        # Task5 only: decode a frame every task5_min_interval secs, but only read text from it if the text-ish parts changed (or "every secs" passed). See adaptive_sampling.py.
+        self.task5_adaptive_sampling = False
+        self.task5_min_interval = 0.25
+
+        # Task1 only: run detection, OCR, translation, redrawing and encoding as overlapping stages across images.
+        self.pipeline_task1 = False
+        self.task1_pipeline_queue_size = 2 # Max images waiting between each stage.
+
         # self.terms = []
         self.source_terms = []
         self.target_terms = []
@@ -39,8 +55,14 @@ class ConfigState:
 
         self.tile_width = 100
         self.tile_height = 100
+        self.detection_max_batch_size = 4 # Max number of tiles passed to the text detection model in one call.
+        self.clean_max_batch_size = 8 # Max number of speech bubbles passed to the text mask model (TTNet) in one call.
 
         self.batch_ocr = False
+        # With batch_ocr: OCR the line crops of every text region on a page together, rather than up to 4 per region.
+        self.page_level_ocr = False
+        self.ocr_max_batch_size = 16
+        self.ocr_image_encoding = "png" # How line crops are sent to the OCR server: "png" | "png_fast" | "bmp" (see fast_image_encoding.py)
         self.cut_ocr_punct = False
         self.ignore_detect_single_words = False
         self.sanitize_ascii = False
@@ -51,6 +73,12 @@ class ConfigState:
 
         self.cache_mt = True
 
+        self.cache_ocr = True # Reuse OCR results for pixel-identical line crops.
+        self.persist_ocr_cache = False # Save the OCR cache to disk (models/database/cache_ocr.json).
+        self.cache_frames = False # Reuse the boxes & texts of a recently seen task3/task4 capture (see frame_cache.py).
+        self.frame_cache_tolerance = 0 # Max differing perceptual hash bits (out of 1024) for two captures to count as the same. A one character change can be just 1 bit.
+        self.incremental_watch_ocr = True # Background watched boxes (task3) only re-OCR the lines that changed (see line_text_cache.py).
+
         self.capture_window = ""
 
         self.output_language = ""
@@ -2,11 +2,30 @@ import os
 import json
 import traceback
 from gandy.utils.try_print import try_print
+from gandy.utils.fancy_logger import logger
+
+DANGEROUS_CONFIG_PATH = os.path.expanduser("~/Documents/Mango/dangerousConfig.json")
 
 class DangerousConfig():
     def __init__(self):
+        self._set_defaults()
+        self._load()
+
+    def _set_defaults(self):
+        # Actual config file created in ElectronJS see 'readDangerousConfig()'
+        self.socketio_address = '127.0.0.1'
+        self.enable_web_ui = False
+        self.debug = False
+        self.do_print = False
+        self.compress_jpeg = False
+        self.onnx_session_profile = 'default'
+        self.onnx_session_profile_overrides = {}
+        self.onnx_session_profiles = {}
+        self.onnx_session_pool_mb = 0
+
+    def _load(self):
         try:
-            with open(os.path.expanduser("~/Documents/Mango/dangerousConfig.json"), 'r') as f:
+            with open(DANGEROUS_CONFIG_PATH, 'r') as f:
                 dangerous_config = json.load(f)
 
                 self.socketio_address = dangerous_config['remoteAddress']
@@ -14,13 +33,20 @@ class DangerousConfig():
                 self.debug = dangerous_config['debug']
                 self.do_print = dangerous_config.get('doPrint', False)
                 self.compress_jpeg = dangerous_config.get('compressJpeg', False)
+                # See onnx_models/session_profiles.py
+                self.onnx_session_profile = dangerous_config.get('onnxSessionProfile', 'default')
+                self.onnx_session_profile_overrides = dangerous_config.get('onnxSessionProfileOverrides', {})
+                self.onnx_session_profiles = dangerous_config.get('onnxSessionProfiles', {})
+                self.onnx_session_pool_mb = dangerous_config.get('onnxSessionPoolMb', 0) # See onnx_models/session_pool.py
+        except FileNotFoundError:
+            # Normal when running the backend by itself (no ElectronJS app) - nothing to complain about.
+            logger.log(f"No dangerous config at {DANGEROUS_CONFIG_PATH} - using the defaults.")
+            self._set_defaults()
         except Exception as e: # Can happen due to race conditions.
             print('Failed to read dangerous config:')
             try_print(traceback.format_exc())
 
-            # Actual config file created in ElectronJS see 'readDangerousConfig()'
-            self.socketio_address = '127.0.0.1'
-            self.enable_web_ui = False
-            self.debug = False
-            self.do_print = False
-            self.compress_jpeg = False
\ No newline at end of file
+            self._set_defaults()
+
+
+dangerous_config = DangerousConfig()
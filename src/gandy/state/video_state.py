@@ -1,93 +1,46 @@
-from typing import List
+from collections import OrderedDict
+from gandy.utils.hash_index import HashIndex
 
 # The state here is not actually used globally - it's recreated on every task5 call.
 
-class CacheOption:
-    def __init__(self, name: str, max: int, is_column=False) -> None:
-        self.name = name
-        self.max = max
-        self.is_column = is_column
+class ImageCache:
+    def __init__(self, max_images: int, max_cropped_images: int) -> None:
+        # Values are (source text, seconds).
+        self.images = HashIndex(max_size=max_images)
+        # Values are (source text, seconds, thumbnail) - region hash matches are confirmed with the thumbnail (see region_thumbnail.py).
+        self.cropped_images = HashIndex(max_size=max_cropped_images)
 
 
-class BasicCache:
-    def __init__(self, options: List[CacheOption]) -> None:
-        self.options_info = {}
-
-        self.data = {}
-        for o in options:
-            self.options_info[o.name] = o
-
-            if o.is_column:
-                # Python dicts remember key order insertion as of 3.7+
-                self.data[o.name] = {}
-            else:
-                self.data[o.name] = []
-
-    def index(self, key: str, index: int):
-        if self.options_info[key].is_column:
-            raise RuntimeError("Requires row data.")
-        return self.data[key][index]
-
-    def index_of_value(self, key: str, value):
-        if self.options_info[key].is_column:
-            raise RuntimeError("Requires row data.")
-        try:
-            return self.data[key].index(value)
-        except:
-            return None
-
-    def get(self, key: str, value):
-        if not self.options_info[key].is_column:
-            raise RuntimeError("Requires column data")
-        return self.data[key][value]
-
-    def push(self, key: str, value):
-        max_count = self.options_info[key].max
+def make_image_cache():
+    # Searching the cache is cheap (see hash_index.py), so it can remember repeated scenes from far back in the video too - not just the last few frames.
+    # Frame hashes are 8KB each (256x256 bits), region hashes only 8 bytes (+ a 4KB thumbnail).
+    return ImageCache(max_images=2048, max_cropped_images=8192)
 
-        if self.options_info[key].is_column:
-            count = len(self.data[key].keys())
 
-            if count >= max_count:
-                self.data[key].pop(next(iter(self.data[key])))
-            self.data[key][value] = ""  # TODO: Use better data format, like set.
-        else:
-            count = len(self.data[key])
+class TranslationCache:
+    def __init__(self, max_items: int) -> None:
+        # Source text -> (target text, seconds). Oldest source texts are dropped first.
+        self.max_items = max_items
+        self.entries = OrderedDict()
 
-            if count >= max_count:
-                self.data[key] = self.data[key][1:]
-            self.data[key].append(value)
+    def __contains__(self, source_text: str):
+        return source_text in self.entries
 
-    def iterate(self, key: str):
-        if self.options_info[key].is_column:
-            raise RuntimeError("Requires row data.")
-        return [i for i in self.data[key]]
+    def __len__(self):
+        return len(self.entries)
 
-    def enumerate(self, key: str):
-        if self.options_info[key].is_column:
-            raise RuntimeError("Requires row data.")
-        return enumerate(self.data[key])
+    def get(self, source_text: str):
+        # Returns (target text, seconds) or None.
+        return self.entries.get(source_text)
 
+    def put(self, source_text: str, target_text: str, seconds):
+        self.entries[source_text] = (target_text, seconds)
+        self.entries.move_to_end(source_text)
 
-def make_image_cache():
-    max_items = 3 # Since images are taken frame-by-frame, second-by-second, let's assume only nearby frames should be similar.
-
-    return BasicCache(
-        [
-            CacheOption(name="source_texts", max=max_items),
-            CacheOption(name="images", max=max_items),
-            CacheOption(name="cropped_images", max=max_items),
-            CacheOption(name="seconds", max=max_items),
-        ]
-    )
+        while len(self.entries) > self.max_items:
+            self.entries.popitem(last=False)
 
 
 def make_translation_cache():
-    max_items = 100
-
-    return BasicCache(
-        [
-            CacheOption(name="source_texts", max=max_items),
-            CacheOption(name="target_texts", max=max_items),
-            CacheOption(name="seconds", max=max_items),
-        ]
-    )
+    # Lookups are a dict lookup, so this can be large.
+    return TranslationCache(max_items=10000)
@@ -10,6 +10,7 @@ from gandy.state.debug_state import debug_state
 from gandy.state.config_state import config_state
 from gandy.tasks.task1.stitch_images_together import stack_horizontally, stack_vertically
 from gandy.tasks.task1.smart_vertical_merging import smart_vertical_merging
+from gandy.utils.staged_pipeline import StagedPipeline, OrderedEventRelay
 from gc import collect
 
 # Task1 - translate images into images.
@@ -39,37 +40,141 @@ def on_progress(progress: int, socketio):
     socketio.patched_emit(f"progress_task1", progress)
     socketio.sleep()
 
+def _encode_image_data(new_image, img_name: str, is_amg):
+    img_name_no_ext = os.path.splitext(img_name)[0]
+
+    with logger.begin_event('Base64 encode image'):
+        if is_amg:
+            new_image_base64 = encode_image(new_image["image"])
+            annotations = new_image["annotations"]
+
+            new_img_name = f"{img_name_no_ext}.amg"
+        else:
+            new_image_base64 = encode_image(new_image)
+            annotations = []
+
+            new_img_name = f"{img_name_no_ext}.png"
+
+    return new_image_base64, new_img_name, annotations
+
+def _emit_image_data(new_image_base64, new_img_name, annotations, images_data, task_id, img_idx):
+    socketio.patched_emit(
+        "item_task1",
+        {
+            "image": new_image_base64,
+            "imageName": new_img_name,
+            "annotations": annotations,
+            "taskId": task_id,
+            "remainingImages": len(images_data) - (1 + img_idx)
+        },
+    )
+    socketio.sleep()
+
 def _send_image(new_image, img_name: str, is_amg, images_data, task_id, img_idx, on_image_done):
     img_name_no_ext = os.path.splitext(img_name)[0]
 
     if on_image_done is None:
-        with logger.begin_event('Base64 encode image'):
-            if is_amg:
-                new_image_base64 = encode_image(new_image["image"])
-                annotations = new_image["annotations"]
+        new_image_base64, new_img_name, annotations = _encode_image_data(new_image, img_name, is_amg)
 
-                new_img_name = f"{img_name_no_ext}.amg"
-            else:
-                new_image_base64 = encode_image(new_image)
-                annotations = []
-
-                new_img_name = f"{img_name_no_ext}.png"
-
-        socketio.patched_emit(
-            "item_task1",
-            {
-                "image": new_image_base64,
-                "imageName": new_img_name,
-                "annotations": annotations,
-                "taskId": task_id,
-                "remainingImages": len(images_data) - (1 + img_idx)
-            },
-        )
-        socketio.sleep()
+        _emit_image_data(new_image_base64, new_img_name, annotations, images_data, task_id, img_idx)
     else:
         if not is_amg: # AMG not supported for on_image_done.
             on_image_done(new_image, img_idx, img_name_no_ext)
 
+def _translate_images_staged(images_data, task_id, on_image_done, emit_on_text_done):
+    """
+    Same outcome as translating each image one by one, but each step runs in its own thread:
+
+    detect -> OCR -> translate -> clean & redraw -> encode
+
+    So page N+1 can be detected and OCR'd while page N is being translated and redrawn.
+    Progress and text events are relayed in the same order the sequential loop would have emitted them.
+    """
+    relay = OrderedEventRelay()
+
+    def _progress_cb_for(img_idx):
+        return lambda progress: relay.emit(img_idx, on_progress, progress, socketio)
+
+    def _detect(item):
+        img_idx, (img, img_name) = item
+
+        # The client really only uses progress for task1 anyways. The other progress_tasks aren't used... yet.
+        relay.emit(img_idx, on_progress, 5, socketio)
+        logger.log_message("Task1 processing image", img_name=img_name)
+
+        rgb_image, speech_bboxes = translate_pipeline._detect_image_to_image_data(img, progress_cb=_progress_cb_for(img_idx))
+        return img_idx, img_name, rgb_image, speech_bboxes
+
+    def _recognize(item):
+        img_idx, img_name, rgb_image, speech_bboxes = item
+
+        data = translate_pipeline._recognize_image_to_image_data(rgb_image, speech_bboxes, progress_cb=_progress_cb_for(img_idx))
+        return img_idx, img_name, data
+
+    def _translate(item):
+        img_idx, img_name, data = item
+
+        target_texts, speech_bboxes = translate_pipeline._translate_texts_from_data(
+            data["source_texts"],
+            data["speech_bboxes"],
+            progress_cb=_progress_cb_for(img_idx),
+            cb_on_text_done=lambda sous, tars: relay.emit(img_idx, emit_on_text_done, sous, tars),
+        )
+        return img_idx, img_name, data, target_texts, speech_bboxes
+
+    def _redraw(item):
+        img_idx, img_name, data, target_texts, speech_bboxes = item
+
+        # Only the redraw step reads this (for its debug dumps) - setting it any earlier would name the dumps after a later image that's still being detected.
+        if debug_state.debug or debug_state.debug_redraw:
+            debug_state.metadata['cur_img_name'] = img_name
+
+        new_image, is_amg = translate_pipeline._redraw_image_from_data(
+            source_texts=data["source_texts"],
+            target_texts=target_texts,
+            rgb_image=data["rgb_image"],
+            speech_bboxes=speech_bboxes,
+            progress_cb=_progress_cb_for(img_idx),
+            grouped_line_bboxes=data["grouped_line_bboxes"],
+        )
+        return img_idx, img_name, new_image, is_amg
+
+    def _encode(item):
+        img_idx, img_name, new_image, is_amg = item
+
+        if on_image_done is not None:
+            return img_idx, img_name, new_image, is_amg, None
+
+        return img_idx, img_name, new_image, is_amg, _encode_image_data(new_image, img_name, is_amg)
+
+    staged = StagedPipeline(
+        stages=[
+            ("detect", _detect),
+            ("ocr", _recognize),
+            ("translate", _translate),
+            ("redraw", _redraw),
+            ("encode", _encode),
+        ],
+        max_queue_size=config_state.task1_pipeline_queue_size,
+    )
+
+    # Outputs come out in the same order as images_data.
+    for img_idx, img_name, new_image, is_amg, encoded in staged.run(enumerate(images_data)):
+        if encoded is None:
+            _send_image(
+                new_image=new_image,
+                img_name=img_name,
+                is_amg=is_amg,
+                images_data=images_data,
+                task_id=task_id,
+                img_idx=img_idx,
+                on_image_done=on_image_done,
+            )
+        else:
+            _emit_image_data(*encoded, images_data=images_data, task_id=task_id, img_idx=img_idx)
+
+        relay.finish(img_idx)
+
 def translate_task1_background_job(
     images,
     task_id: str,
@@ -187,45 +292,50 @@ def translate_task1_background_job(
             def _emit_on_text_done(sous, tars):
                 socketio.patched_emit("textitem_task1", { "texts": tars, "sourceTexts": sous, })
 
-            for img_idx, (img, img_name) in enumerate(images_data):
-                if debug_state.debug or debug_state.debug_redraw:
-                    debug_state.metadata['cur_img_name'] = img_name
+            # Memory efficient tasks can't be pipelined - the whole point there is to never have the OCR and MT models loaded at the same time.
+            if config_state.pipeline_task1 and not config_state.memory_efficient_tasks:
+                ctx.log('Translating images with the staged pipeline.', queue_size=config_state.task1_pipeline_queue_size)
+                _translate_images_staged(images_data, task_id, on_image_done, _emit_on_text_done)
+            else:
+                for img_idx, (img, img_name) in enumerate(images_data):
+                    if debug_state.debug or debug_state.debug_redraw:
+                        debug_state.metadata['cur_img_name'] = img_name
 
-                if not config_state.memory_efficient_tasks or img_idx == 0:
-                    # The client really only uses progress for task1 anyways. The other progress_tasks aren't used... yet.
-                    socketio.patched_emit("progress_task1", 5)
-                    socketio.sleep()
+                    if not config_state.memory_efficient_tasks or img_idx == 0:
+                        # The client really only uses progress for task1 anyways. The other progress_tasks aren't used... yet.
+                        socketio.patched_emit("progress_task1", 5)
+                        socketio.sleep()
 
-                ctx.log(f"Task1 processing image", img_name=img_name)
+                    ctx.log(f"Task1 processing image", img_name=img_name)
 
-                if config_state.memory_efficient_tasks:
-                    # TODO: I'm pretty sure "cb_on_text_done" will fail for memory_efficient_tasks (nothing emitted).
-                    # But that's low priority - most users shouldn't be using mem efficient tasks anyways anymore - models are much slimmer.
-                    with logger.begin_event('Process image'):
-                        data_to_translate = translate_pipeline.image_to_image(
-                            img, progress_cb=None, return_metadata_to_translate_later=True, cb_on_text_done=None,
-                        )
+                    if config_state.memory_efficient_tasks:
+                        # TODO: I'm pretty sure "cb_on_text_done" will fail for memory_efficient_tasks (nothing emitted).
+                        # But that's low priority - most users shouldn't be using mem efficient tasks anyways anymore - models are much slimmer.
+                        with logger.begin_event('Process image'):
+                            data_to_translate = translate_pipeline.image_to_image(
+                                img, progress_cb=None, return_metadata_to_translate_later=True, cb_on_text_done=None,
+                            )
 
-                        memory_efficient_data_to_translate_later.append(data_to_translate)
+                            memory_efficient_data_to_translate_later.append(data_to_translate)
 
-                    progress_cb(((((1 + img_idx) / len(images_data)) * 100) // 2) + 5)
-                else:
-                    with logger.begin_event('Process image'):
-                        new_image, is_amg = translate_pipeline.image_to_image(
-                            img, progress_cb=progress_cb, cb_on_text_done=_emit_on_text_done,
+                        progress_cb(((((1 + img_idx) / len(images_data)) * 100) // 2) + 5)
+                    else:
+                        with logger.begin_event('Process image'):
+                            new_image, is_amg = translate_pipeline.image_to_image(
+                                img, progress_cb=progress_cb, cb_on_text_done=_emit_on_text_done,
+                            )
+
+                        # Send img (b64) to client.
+                        _send_image(
+                            new_image=new_image,
+                            img_name=img_name,
+                            is_amg=is_amg,
+                            images_data=images_data,
+                            task_id=task_id,
+                            img_idx=img_idx,
+                            on_image_done=on_image_done,
                         )
 
-                    # Send img (b64) to client.
-                    _send_image(
-                        new_image=new_image,
-                        img_name=img_name,
-                        is_amg=is_amg,
-                        images_data=images_data,
-                        task_id=task_id,
-                        img_idx=img_idx,
-                        on_image_done=on_image_done,
-                    )
-
             if len(memory_efficient_data_to_translate_later) > 0:
                 # This means config_state.memory_efficient_tasks is ON.
                 # In this mode, all images are scanned and OCR'D, then those models are unloaded, the MT model is loaded, and all the images are translated.
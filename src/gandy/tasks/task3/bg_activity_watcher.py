@@ -1,13 +1,14 @@
-import mss
 import numpy as np
 import cv2
 import threading
 import time
 from PIL import Image
+from gandy.utils.screen_capture import capture_hub as default_capture_hub
 
 class BackgroundActivityWatcher:
-    def __init__(self, monitor_coords, ocr_callback, text_lines_stale_callback, sensitivity=0.005):
+    def __init__(self, monitor_coords, ocr_callback, text_lines_stale_callback, sensitivity=0.005, capture_hub=None):
         self.coords = monitor_coords
+        self.capture_hub = capture_hub if capture_hub is not None else default_capture_hub
         self.ocr_callback = ocr_callback
         self.text_lines_stale_callback = text_lines_stale_callback
         self.sensitivity = sensitivity  # % of pixels that must change (0.005 = 0.5%)
@@ -16,6 +17,8 @@ class BackgroundActivityWatcher:
         self._thread = None
         self._last_baseline = None
         self._last_ocr_text = None
+        self._subscription = None
+        self._frame_seq = 0
 
         self.SCAN_RATE = 0.15  # How often to check for ANY change
         self.CHANGE_THRESHOLD = 12  # Pixel brightness diff to count as "changed"
@@ -23,14 +26,10 @@ class BackgroundActivityWatcher:
         self.STABILITY_INTERVAL = 0.25  # Time between stability checks
         self.COOLDOWN = 0.2  # Don't trigger OCR for this long after success
 
-    def _get_frame(self, sct):
-        monitor = {"top": self.coords[1], "left": self.coords[0], "width": self.coords[2], "height": self.coords[3]}
-
-        img = np.array(sct.grab(monitor))
-        gray = cv2.cvtColor(img, cv2.COLOR_BGRA2GRAY)
-
-        # TODO: maybe (5, 5) ?
-        return cv2.GaussianBlur(gray, (3, 3), 0)
+    def _get_frame(self, out=None):
+        # Downsampled & blurred gray frame from the shared capture thread - copied into out if given. Always newer than the last one read.
+        frame, self._frame_seq = self._subscription.read_small(out=out, after_seq=self._frame_seq)
+        return frame
 
     def _compute_change_pct(self, frame1, frame2):
         diff = cv2.absdiff(frame1, frame2)
@@ -38,14 +37,34 @@ class BackgroundActivityWatcher:
 
         return changed_pixels / diff.size
 
+    def _compute_dirty_mask(self, frame1, frame2):
+        # Which pixels changed - so only the text lines touching them need to be OCR'd again.
+        changed = (cv2.absdiff(frame1, frame2) > self.CHANGE_THRESHOLD).astype(np.uint8)
+
+        # Grown a bit: the blur and the threshold can miss the faint edges of a changed glyph.
+        changed = cv2.dilate(changed, np.ones((5, 5), np.uint8))
+
+        # The frames are downsampled - the mask must line up with the full size capture.
+        return cv2.resize(changed, (self.coords[2], self.coords[3]), interpolation=cv2.INTER_NEAREST) > 0
+
     def _watch_loop(self):
         time.sleep(10.0) # Wait some time for the user to set things up as needed.
 
-        with mss.mss() as sct:
-            self._last_baseline = self._get_frame(sct)
+        if self._stop_event.is_set():
+            return
+
+        self._subscription = self.capture_hub.subscribe(self.coords)
+        self._frame_seq = 0
+
+        try:
+            self._last_baseline = self._get_frame()
+
+            # The frames are read into these (and the baseline) - swapped around rather than reallocated.
+            current_frame = np.empty_like(self._last_baseline)
+            check_frame = np.empty_like(self._last_baseline)
 
             while not self._stop_event.is_set():
-                current_frame = self._get_frame(sct)
+                self._get_frame(current_frame)
                 change_pct = self._compute_change_pct(self._last_baseline, current_frame)
 
                 if change_pct > self.sensitivity:
@@ -53,11 +72,12 @@ class BackgroundActivityWatcher:
                     stable_count = 0
                     aggressive_count = 0
                     tracking_frame = current_frame
+                    lines_fresh = False # Did the last check run line detection? Then OCR can reuse those lines.
                     
                     while ((stable_count < self.STABILITY_COUNT and aggressive_count < self.STABILITY_COUNT) and not self._stop_event.is_set()):
                         time.sleep(self.STABILITY_INTERVAL)
                         
-                        check_frame = self._get_frame(sct)
+                        self._get_frame(check_frame)
                         stability_change = self._compute_change_pct(tracking_frame, check_frame)
 
                         # print(f"checking({stability_change})({change_pct})")
@@ -68,25 +88,32 @@ class BackgroundActivityWatcher:
                             stable_count = 0  # Reset - still changing
 
                         # >= 0.0025 may be a bad choice - I did it for optimization reasons (line det is laggy).
-                        if stability_change >= 0.0025 and stability_change < 0.35 and self.text_lines_stale_callback(Image.fromarray(tracking_frame).convert("RGB")):
+                        # Line detection gets the full size frame, not the downsampled one.
+                        lines_fresh = stability_change >= 0.0025 and stability_change < 0.35
+                        if lines_fresh and self.text_lines_stale_callback(Image.fromarray(self._subscription.read_gray()).convert("RGB")):
                             aggressive_count += 1
                         else:
                             aggressive_count = 0
                         
-                        tracking_frame = check_frame
+                        tracking_frame, check_frame = check_frame, tracking_frame
                     
                     # Stability achieved
                     if stable_count == self.STABILITY_COUNT or aggressive_count == self.STABILITY_COUNT:
                         # print("REASON:")
                         # print(stable_count == self.STABILITY_COUNT)
                         # print(aggressive_count == self.STABILITY_COUNT)
-                        self.ocr_callback()
+                        self.ocr_callback(self._compute_dirty_mask(self._last_baseline, tracking_frame), lines_fresh)
                         
                         # Update baseline, cooldown
-                        self._last_baseline = tracking_frame
+                        self._last_baseline, tracking_frame = tracking_frame, self._last_baseline
                         time.sleep(self.COOLDOWN)
+
+                    current_frame = tracking_frame # Whichever buffer is free now.
                 
                 time.sleep(self.SCAN_RATE)
+        finally:
+            self.capture_hub.unsubscribe(self._subscription)
+            self._subscription = None
 
     def start(self):
         self._stop_event.clear()
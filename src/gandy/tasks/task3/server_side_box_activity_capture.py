@@ -4,6 +4,7 @@ from gandy.tasks.task3.bg_activity_watcher import BackgroundActivityWatcher
 from gandy.tasks.task3.task3_routes import process_task3_faster
 from gandy.utils.fancy_logger import logger
 import numpy as np
+from gandy.utils.box_ops import as_boxes, paired_iou
 
 # key = box id string
 # value = watcher instance
@@ -17,27 +18,6 @@ def forget_box(box_id: str):
 
 cached_lines = {}
 
-# Vibe-coded this util because bored :3
-def calculate_iou(boxA, boxB):
-    # Determine the coordinates of the intersection rectangle
-    xA = max(boxA[0], boxB[0])
-    yA = max(boxA[1], boxB[1])
-    xB = min(boxA[2], boxB[2])
-    yB = min(boxA[3], boxB[3])
-
-    # Compute the area of intersection
-    interWidth = max(0, xB - xA)
-    interHeight = max(0, yB - yA)
-    interArea = interWidth * interHeight
-
-    # Compute the area of both bounding boxes
-    boxAArea = (boxA[2] - boxA[0]) * (boxA[3] - boxA[1])
-    boxBArea = (boxB[2] - boxB[0]) * (boxB[3] - boxB[1])
-
-    # Compute IoU
-    iou = interArea / float(boxAArea + boxBArea - interArea)
-    return iou
-
 def are_lines_stale(img, box_id):
     """
     Are the text lines on this image the same as the ones detected on the image before? This is to avoid redundant OCR work.
@@ -59,21 +39,15 @@ def are_lines_stale(img, box_id):
         # print(f"No boxes found!")
         return False
 
-    for idx in range(len(line_bboxes)):
-        iou = calculate_iou(line_bboxes[idx], prev_box_lines[idx])
-
-        if iou < 0.96:
-            # print(f"IOU too low. Boxes are different!")
-            # print(iou)
-            return False
-        
-        # print("IOU close. One pair of boxes are equivalent!")
-        # print(iou)
+    # Every box must (nearly) match the box at the same index from before.
+    ious = paired_iou(as_boxes(line_bboxes), as_boxes(prev_box_lines))
+    return bool(np.all(ious >= 0.96))
 
-    return True
+def process_image(thread_id, box_state, dirty_mask=None, lines_fresh=False):
+    # If the watcher's last check ran line detection (are_lines_stale), those lines are for the image about to be captured - no need to detect them again.
+    precomputed_lines = cached_lines.get(box_state["this_box_id"]) if lines_fresh else None
 
-def process_image(thread_id, box_state):
-    process_task3_faster(box_state)
+    process_task3_faster(box_state, dirty_mask=dirty_mask, precomputed_lines=precomputed_lines)
 
 
 @app.route("/task3watchboxbg", methods=["POST"])
@@ -84,12 +58,15 @@ def begin_watching_box_bg():
         ctx.log("For box ID", box_id=box_id)
 
         forget_box(box_id)
+        cached_lines.pop(box_id, None)
+        # Line texts from an older watcher can't be trusted - the dirty masks of this one start from a new baseline.
+        translate_pipeline.line_text_cache.forget(data["boxState"]["box_id"])
 
         # Note the coords are fixed on instantiation; thus we need to forget box if its moved in the frontend... we don't want stale data.
         coords = [int(x[0]) for x in [data['boxState']['x1'], data['boxState']['y1'], data['boxState']['width'], data['boxState']['height']]]
         watcher = BackgroundActivityWatcher(
             monitor_coords=coords,
-            ocr_callback=lambda: process_image("stub", data['boxState']),
+            ocr_callback=lambda dirty_mask, lines_fresh: process_image("stub", data['boxState'], dirty_mask, lines_fresh),
             text_lines_stale_callback=lambda img: are_lines_stale(img, box_id),
         )
 
@@ -104,5 +81,6 @@ def stop_watching_box_bg():
 
     box_id = data["boxState"]["this_box_id"]
     forget_box(box_id)
+    translate_pipeline.line_text_cache.forget(data["boxState"].get("box_id"))
 
     return {"processing": True}, 200
\ No newline at end of file
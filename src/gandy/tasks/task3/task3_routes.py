@@ -8,7 +8,7 @@ from gandy.utils.get_sep_regex import get_last_sentence
 from gandy.utils.socket_stream import SocketStreamer
 from gandy.tasks.task3.task3_box_context_state_utils import push_to_state, get_context
 from gandy.tasks.task3.screenshot_window_only import capture_window_image_from_box
-from mss import mss
+from gandy.utils.screen_capture import grab_rgb_image
 from uuid import uuid4
 import os
 import base64
@@ -51,6 +51,8 @@ def translate_task3_background_job(
     join_lines_until_finds="",
     detect_speaker_name=False,
     text_line_app_scan_image_if_fails=True,
+    dirty_mask=None,
+    precomputed_lines=None,
 ):
     with logger.begin_event("Task3", translate_lines_individually=translate_lines_individually, join_lines_until_finds=join_lines_until_finds) as ctx:
         try:
@@ -90,6 +92,9 @@ def translate_task3_background_job(
                         bottom_n_lines=translate_lines_individually,
                         join_lines_until_finds=join_lines_until_finds,
                         text_line_app_scan_image_if_fails=text_line_app_scan_image_if_fails,
+                        dirty_mask=dirty_mask,
+                        box_id=box_id,
+                        precomputed_lines=precomputed_lines,
                     )
                 else:
                     new_texts, source_text = translate_pipeline.image_to_single_text(
@@ -99,6 +104,9 @@ def translate_task3_background_job(
                         use_stream=use_stream,
                         detect_speaker_name=do_detect_speaker_name,
                         text_line_app_scan_image_if_fails=text_line_app_scan_image_if_fails,
+                        dirty_mask=dirty_mask,
+                        box_id=box_id,
+                        precomputed_lines=precomputed_lines,
                     )
 
                 if new_texts is not None: # image_to_single_text sometimes returns None when no text found (with_text_detect=False)
@@ -119,6 +127,11 @@ def translate_task3_background_job(
         except Exception:
             logger.event_exception(ctx)
 
+            # The watcher already moved its baseline past this frame - so the next dirty mask won't cover what changed here.
+            # Drop the cached lines so the next run OCRs every line again.
+            if box_id is not None:
+                translate_pipeline.line_text_cache.forget(box_id)
+
             socketio.patched_emit("done_translating_task3", {})
 
 @app.route('/remote/translate_task3_background_job', methods=['POST'])
@@ -205,7 +218,12 @@ def process_task3_route():
 
     return {"processing": True}, 202
 
-def process_task3_faster(data):
+def process_task3_faster(data, dirty_mask=None, precomputed_lines=None):
+    """
+    From the background watcher:
+    dirty_mask: Bool mask of the pixels that changed since this box was last scanned. Lets unchanged lines skip OCR.
+    precomputed_lines: Line boxes already detected on this box's current contents. Skips line detection.
+    """
     coords = [int(x[0]) for x in [data['x1'], data['y1'], data['width'], data['height']]]
 
     images = []
@@ -219,13 +237,8 @@ def process_task3_faster(data):
             images = [capture_window_image_from_box(config_state.capture_window, xyxy, do_scale=False)]
     else:
         with logger.begin_event("Capturing window from coordinates."):
-            # From: https://python-mss.readthedocs.io/examples.html#pil
-            with mss() as sct:
-                monitor = {"top": coords[1], "left": coords[0], "width": coords[2], "height": coords[3]}
-                sct_img = sct.grab(monitor)
-
-                img = Image.frombytes("RGB", sct_img.size, sct_img.bgra, "raw", "BGRX")
-                images = [img]
+            monitor = {"top": coords[1], "left": coords[0], "width": coords[2], "height": coords[3]}
+            images = [grab_rgb_image(monitor)]
 
     socketio.patched_emit(
         'task3_image_grabbed',
@@ -279,7 +292,9 @@ def process_task3_faster(data):
             data['translate_lines_individually'],
             data.get('join_lines_until_finds', ''),
             data.get('detect_speaker_name', 'off') == 'on',
-            data.get('text_line_app_scan_image_if_fails', 'on') == 'on'
+            data.get('text_line_app_scan_image_if_fails', 'on') == 'on',
+            dirty_mask,
+            precomputed_lines,
         )
 
 @app.route("/processtask3new", methods=["POST"])
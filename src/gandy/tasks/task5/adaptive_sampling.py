@@ -0,0 +1,71 @@
+import cv2
+import numpy as np
+from typing import Iterable
+from gandy.tasks.task5.generate_images import VideoFrame, generate_images
+from gandy.state.config_state import config_state
+
+# Adaptive frame sampling for task5: rather than reading a frame every N secs, frames are decoded more often (every config_state.task5_min_interval secs)
+# but only kept if the text-ish parts of the frame changed since the last kept frame - or if max_interval secs have passed anyways.
+# Static scenes are read far less, and text changing mid-interval is caught sooner (so the subtitles are better timed too).
+
+SMALL_WIDTH = 320
+# Fraction of the (downscaled) frame's pixels that must be "changed edges" for the frame to be kept.
+CHANGE_THRESHOLD = 0.002
+
+def edge_map(image) -> np.ndarray:
+    # Text is mostly sharp edges - a downscaled edge map ignores most smooth changes (lighting, blurry backgrounds...) while still seeing text changes.
+    gray = cv2.cvtColor(np.asarray(image), cv2.COLOR_RGB2GRAY)
+    h, w = gray.shape
+
+    small_h = max(1, round(h * SMALL_WIDTH / w))
+    small = cv2.resize(gray, (SMALL_WIDTH, small_h), interpolation=cv2.INTER_AREA)
+
+    return cv2.Canny(small, 100, 200) > 0
+
+def edges_changed(a: np.ndarray, b: np.ndarray):
+    # Edges that moved by a pixel or so (compression noise, subpixel motion) don't count.
+    kernel = np.ones((3, 3), dtype=np.uint8)
+    a_near = cv2.dilate(a.astype(np.uint8), kernel) > 0
+    b_near = cv2.dilate(b.astype(np.uint8), kernel) > 0
+
+    changed = (a & ~b_near) | (b & ~a_near)
+    return changed.mean()
+
+def sample_adaptively(frames: Iterable[VideoFrame], max_interval: float, threshold=CHANGE_THRESHOLD):
+    """
+    Yields the frames whose edges changed enough since the last yielded frame, or that are at least max_interval secs after it. The first frame is always yielded.
+
+    frames should already be sampled at the min interval (see generate_images).
+    """
+    last_edges = None
+    last_seconds = None
+
+    for frame in frames:
+        edges = edge_map(frame.image)
+
+        if (
+            last_edges is None
+            or (frame.seconds - last_seconds) >= max_interval - 1e-6
+            or edges_changed(last_edges, edges) >= threshold
+        ):
+            last_edges = edges
+            last_seconds = frame.seconds
+
+            yield frame
+
+def get_decode_interval(every_secs: float):
+    # How often frames are decoded - every_secs is the max interval with adaptive sampling.
+    if config_state.task5_adaptive_sampling:
+        return min(config_state.task5_min_interval, every_secs)
+    return every_secs
+
+def read_frames(video_file_path: str, every_secs: float, start_index=0, n_frames=None):
+    """
+    The frames task5 reads text from. start_index and n_frames are in decoded frames (see get_decode_interval).
+    """
+    frames = generate_images(video_file_path, get_decode_interval(every_secs), start_index=start_index, n_frames=n_frames)
+
+    if config_state.task5_adaptive_sampling:
+        frames = sample_adaptively(frames, max_interval=every_secs)
+
+    return frames
@@ -0,0 +1,162 @@
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import List, Optional, Tuple
+from gandy.full_pipelines.advanced_pipeline import AdvancedPipeline
+from gandy.tasks.task5.adaptive_sampling import read_frames, get_decode_interval
+from gandy.tasks.task5.stages.read_text_in_frames import read_text_in_frames
+from gandy.tasks.task5.stages.set_neighboring_similar_texts import set_neighboring_similar_texts
+from gandy.state.config_state import config_state
+from gandy.utils.fancy_logger import logger
+
+"""
+Task5 STAGE 1 (detect & OCR) split over worker processes.
+
+The video is split into time chunks. Each worker process decodes its own chunks (FFMpeg seeks to the start of the chunk) and runs
+read_text_in_frames on them with its own models - the ONNX models are CPU bound, so processes rather than threads.
+
+STAGE 2 (set_neighboring_similar_texts) is a reverse loop where a frame can take the text of the next frame, which may in turn have taken the text of the one after it, etc...
+So in theory a frame's final text depends on every frame after it. In practice, frames with no text break the chain:
+an empty frame is never replaced, and nothing before it can be replaced by anything after it.
+So STAGE 2 is run (in the main process) on every run of frames up to the last empty frame received so far - those texts are final and are yielded right away,
+even if later chunks are still being read. The output is the same as running STAGE 2 over the whole video at once.
+"""
+
+# Set in each worker process by _init_worker.
+_worker_pipeline: AdvancedPipeline = None
+
+SWITCH_APP_ATTRS = ["text_detection_app", "text_recognition_app", "text_line_app"]
+
+def _init_worker(app_names, config_values):
+    global _worker_pipeline
+
+    # Only imported here - the main process passes its own pipeline around instead.
+    from gandy.model_apps import translate_pipeline
+
+    config_state.__dict__.update(config_values)
+
+    # Workers only run CPU models - N processes each building their own CUDA sessions would need N times the VRAM.
+    config_state.use_cuda = False
+    config_state.force_td_cpu = True
+    config_state.force_tl_cpu = True
+    config_state.force_ocr_cpu = True
+    config_state.num_gpu_layers_ocr = 0
+
+    # The main process owns the OCR cache file - nothing locks it across processes.
+    config_state.persist_ocr_cache = False
+
+    for attr, app_name in app_names.items():
+        getattr(translate_pipeline, attr).select_app(app_name, unload_others=False)
+
+    _worker_pipeline = translate_pipeline
+
+def can_read_in_chunks(app_container: AdvancedPipeline):
+    """
+    Worker processes are only worth it for the CPU (ONNX) OCR apps. A GGUF OCR app runs its own llama-server - every worker would start another one and load the model again.
+    """
+    # Only imported here - it's already loaded in the main process anyways.
+    from gandy.text_recognition.custom_gguf_ocr import CustomGgufOcrApp
+
+    return not isinstance(app_container.text_recognition_app.get_sel_app(), CustomGgufOcrApp)
+
+def _read_chunk(video_file_path: str, every_secs: float, fps: float, total_frames: float, start_index: int, n_frames: Optional[int]):
+    frames = read_frames(video_file_path, every_secs, start_index=start_index, n_frames=n_frames)
+
+    # Progress is reported by the main process once a chunk is done.
+    return read_text_in_frames(_worker_pipeline, frames, every_secs, fps, total_frames, lambda p: None, normalize=False)
+
+def make_chunks(n_frames_total: int, frames_per_chunk: int) -> List[Tuple[int, Optional[int]]]:
+    """
+    Returns (start_index, n_frames) for each chunk. The last chunk goes until the end of the video (n_frames = None) in case the frame count estimate is off.
+    """
+    frames_per_chunk = max(1, frames_per_chunk)
+    starts = list(range(0, max(1, n_frames_total), frames_per_chunk))
+
+    return [(s, frames_per_chunk) for s in starts[:-1]] + [(starts[-1], None)]
+
+def find_last_empty(texts: List[str], start: int):
+    for idx in range(len(texts) - 1, start - 1, -1):
+        if len(texts[idx]) == 0:
+            return idx
+    return None
+
+def read_text_in_chunks(
+    app_container: AdvancedPipeline,
+    video_file_path: str,
+    every_secs: float,
+    fps: float,
+    total_frames: float,
+    video_duration_seconds: float,
+    progress_callback,
+    n_workers: int,
+    chunk_secs: float,
+):
+    """
+    STAGE 1 & 2 with worker processes. Yields (start_index, texts, seconds) for consecutive runs of frames, in order, as soon as their texts are final.
+    seconds is the timestamp of each frame.
+
+    progress_callback is called with the fraction of the video read so far.
+    """
+    # Chunks are split by decoded frames - with adaptive sampling, a chunk yields fewer frames than that.
+    decode_interval = get_decode_interval(every_secs)
+    n_frames_total = int(video_duration_seconds // decode_interval) + 1
+    chunks = make_chunks(n_frames_total, round(chunk_secs / decode_interval))
+
+    app_names = {attr: getattr(app_container, attr).get_sel_app_name() for attr in SWITCH_APP_ATTRS}
+
+    # Spawn (rather than fork) everywhere - forking a process with running threads (SocketIO, llama-server event loop...) is asking for trouble.
+    executor = ProcessPoolExecutor(
+        max_workers=n_workers,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=_init_worker,
+        initargs=(app_names, dict(config_state.__dict__)),
+    )
+
+    with logger.begin_event("Reading text in video chunks", n_chunks=len(chunks), n_workers=n_workers, app_names=app_names) as ctx:
+        try:
+            futures = {
+                executor.submit(_read_chunk, video_file_path, every_secs, fps, total_frames, start_index, n_frames): chunk_idx
+                for chunk_idx, (start_index, n_frames) in enumerate(chunks)
+            }
+
+            done_chunks = {}
+            texts: List[str] = [] # Every frame read so far, in order - up to the first chunk that isn't done yet.
+            seconds: List[float] = []
+            next_chunk = 0
+            n_final = 0 # Frames in texts[:n_final] have been yielded.
+            n_chunks_read = 0
+
+            for future in as_completed(futures):
+                chunk_idx = futures[future]
+                chunk_texts, chunk_seconds = future.result()
+                chunk_texts = [app_container.normalize(t) for t in chunk_texts]
+
+                done_chunks[chunk_idx] = (chunk_texts, chunk_seconds)
+                n_chunks_read += 1
+                ctx.log("Read chunk", chunk_idx=chunk_idx, start_index=chunks[chunk_idx][0], n_frames=len(chunk_texts))
+
+                progress_callback(n_chunks_read / len(chunks))
+
+                while next_chunk in done_chunks:
+                    chunk_texts, chunk_seconds = done_chunks.pop(next_chunk)
+                    texts.extend(chunk_texts)
+                    seconds.extend(chunk_seconds)
+                    next_chunk += 1
+
+                if next_chunk == len(chunks):
+                    end = len(texts)
+                else:
+                    last_empty = find_last_empty(texts, n_final)
+                    end = n_final if last_empty is None else last_empty + 1
+
+                if end > n_final:
+                    final_texts = texts[n_final:end]
+
+                    # This mutates in-place. Progress is reported above.
+                    set_neighboring_similar_texts(app_container, final_texts, every_secs, fps, total_frames, lambda p: None)
+                    texts[n_final:end] = final_texts
+
+                    yield n_final, final_texts, seconds[n_final:end]
+                    n_final = end
+        finally:
+            # Stopped early (or failed)? Don't bother reading the remaining chunks.
+            executor.shutdown(wait=True, cancel_futures=True)
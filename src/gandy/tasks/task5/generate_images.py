@@ -1,23 +1,82 @@
 import ffmpeg
-import os
-from glob import glob
-from uuid import uuid4
+import numpy as np
+from PIL import Image
+from dataclasses import dataclass
+from gandy.utils.try_print import try_print
 
-def generate_images(video_file_path: str, out_dir: str, every_secs: float, with_id = False):
-    # Get frames and return path for every valid frame.
-    stream = ffmpeg.input(video_file_path)
+@dataclass
+class VideoFrame:
+    index: int
+    seconds: float # Timestamp of this frame in the video.
+    image: Image.Image
+
+def get_frame_size(video_file_path: str):
+    try:
+        probed = ffmpeg.probe(video_file_path, select_streams="v:0")
+    except ffmpeg.Error as e:
+        try_print("STDOUT:", e.stdout.decode("utf8"))
+        try_print("STDERR:", e.stderr.decode("utf8"))
+        raise e
+
+    stream = probed["streams"][0]
+    width, height = int(stream["width"]), int(stream["height"])
+
+    # FFMpeg autorotates phone videos when decoding, but the probed size is before rotating.
+    rotation = stream.get("tags", {}).get("rotate", 0)
+    for side_data in stream.get("side_data_list", []):
+        rotation = side_data.get("rotation", rotation)
+
+    if abs(int(float(rotation))) % 180 == 90:
+        width, height = height, width
+
+    return width, height
+
+def generate_images(video_file_path: str, every_secs: float, start_index=0, n_frames=None):
+    """
+    Yields a VideoFrame for every sampled frame (1 frame every N secs), decoded as they come.
+
+    FFMpeg pipes raw RGB frames straight to us - nothing is written to disk, and only a frame or so (plus the pipe buffer) is in memory at a time.
+
+    start_index and n_frames are used to only decode a chunk of the video (see chunked_frames.py). None = until the end.
+    """
+    width, height = get_frame_size(video_file_path)
+    frame_size = width * height * 3
+
+    if start_index > 0:
+        # Input seeking - FFMpeg jumps to the nearest keyframe and then decodes up to the exact timestamp.
+        stream = ffmpeg.input(video_file_path, ss=start_index * every_secs)
+    else:
+        stream = ffmpeg.input(video_file_path)
     stream = ffmpeg.filter(
         stream, "fps", fps=f"1/{every_secs}"
     )  # 1 frame every N secs. Works on decimal e.g: 0.5
 
-    if with_id:
-        out_path = f"{out_dir}/video_{uuid4().hex}__%d.png"
-    else:
-        out_path = f"{out_dir}/video_%d.png"
+    output_kwargs = {}
+    if n_frames is not None:
+        output_kwargs["vframes"] = n_frames
+    stream = ffmpeg.output(stream, "pipe:", format="rawvideo", pix_fmt="rgb24", **output_kwargs)
+
+    process = ffmpeg.run_async(stream, pipe_stdout=True)
+
+    idx = 0
+    finished = False
+    try:
+        while True:
+            data = process.stdout.read(frame_size)
+            if len(data) < frame_size:
+                break # Done (or a truncated last frame).
+
+            frame = np.frombuffer(data, dtype=np.uint8).reshape(height, width, 3)
+            yield VideoFrame(index=start_index + idx, seconds=(start_index + idx) * every_secs, image=Image.fromarray(frame))
 
-    # Do NOT use JPEG! FFMpeg's JPEG encoder is awful!
-    stream = ffmpeg.output(stream, out_path, start_number=0)
-    ffmpeg.run(stream)
+            idx += 1
+        finished = True
+    finally:
+        # If the consumer stopped early (or failed), don't leave FFMpeg hanging on a full pipe.
+        if not finished and process.poll() is None:
+            process.kill()
+        process.stdout.close()
+        process.wait()
 
-    sorted_files = sorted(glob(f"{out_dir}/*.png"), key=os.path.getmtime)
-    return sorted_files
+    if process.returncode != 0 and idx == 0:
+        raise RuntimeError(f"FFMpeg failed to decode any frames from: {video_file_path}")
@@ -1,36 +1,29 @@
 from PIL import Image
-from typing import List
+import numpy as np
 import imagehash
 from gandy.utils.fancy_logger import logger
+from gandy.utils.hash_index import HashIndex
 
 
 # NOTE: dhash almost never works for full-sized images (even if grayscale). Maybe better luck with text region crops?
 def image_is_similar(
-    image: Image.Image, others: List, log_message, threshold=3, mode="image"
+    image: Image.Image, others: HashIndex, log_message, threshold=3, mode="image", confirm=None
 ):
     with logger.begin_event(log_message, cached_images=len(others)) as ctx:
-        # Returns None if no image is similar to the one given, or the first index otherwise.
+        # Returns (None, packed hash) if no image is similar to the one given, or (the value stored with the closest one, packed hash) otherwise.
+        # confirm (optional) can reject a stored value that's only similar by hash - see HashIndex.find.
         if mode == "image":
             transformed_image = imagehash.average_hash(image, hash_size=256)
         else:
             transformed_image = imagehash.dhash(image)
 
-        closest_distance = 999999
+        packed_hash = np.packbits(transformed_image.hash.ravel())
 
-        hamming_distance = None
+        value, hamming_distance = others.find(packed_hash, max_distance=threshold, confirm=confirm)
 
-        for idx, o in enumerate(others):
-            if o is None:
-                continue
-
-            hamming_distance = transformed_image - o
-
-            if hamming_distance <= closest_distance:
-                closest_distance = hamming_distance
-
-            if hamming_distance <= threshold:
-                ctx.log("Done finding similar images", distance=hamming_distance)
-                return idx, transformed_image
+        if value is not None:
+            ctx.log("Done finding similar images", distance=hamming_distance)
+            return value, packed_hash
 
         ctx.log("Done finding similar images", closest_distance=hamming_distance)
-        return None, transformed_image
+        return None, packed_hash
@@ -0,0 +1,20 @@
+import cv2
+import numpy as np
+from PIL import Image
+
+# The 64 bit dhash of a text region is too coarse to tell lines of text apart on its own - with thousands of regions cached, unrelated lines
+# end up within a few bits of each other (and some even share the exact same hash).
+# So a hash match is only trusted if a small grayscale thumbnail of both regions is (almost) the same too.
+#
+# Compression noise barely moves any thumbnail pixel, but a different character (or a different line) changes at least a few of them a lot.
+# A region cropped a bit differently than before won't match either - it's just OCR'd again.
+
+THUMBNAIL_SIZE = (128, 32) # (width, height). 4KB each.
+MAX_PIXEL_DIFF = 48
+
+def region_thumbnail(image: Image.Image):
+    gray = np.asarray(image.convert("L"))
+    return cv2.resize(gray, THUMBNAIL_SIZE, interpolation=cv2.INTER_AREA)
+
+def thumbnails_match(thumbnail_a: np.ndarray, thumbnail_b: np.ndarray):
+    return int(np.abs(thumbnail_a.astype(np.int16) - thumbnail_b).max()) <= MAX_PIXEL_DIFF
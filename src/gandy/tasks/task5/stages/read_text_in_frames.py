@@ -1,12 +1,14 @@
 from gandy.tasks.task5.subtitle_maker import TranslatedSegment
-from gandy.state.video_state import make_image_cache, BasicCache
+from gandy.state.video_state import make_image_cache, ImageCache
 from gandy.utils.fancy_logger import logger
 from datetime import timedelta
-from typing import List
+from typing import List, Iterable
 from gandy.full_pipelines.advanced_pipeline import AdvancedPipeline
 from PIL import Image
 from gandy.tasks.task5.image_is_similar import image_is_similar
+from gandy.tasks.task5.region_thumbnail import region_thumbnail, thumbnails_match
 from gandy.tasks.task5.filter_dominant_bbox import filter_dominant_bbox
+from gandy.tasks.task5.generate_images import VideoFrame
 from gandy.utils.text_processing import merge_texts
 from gandy.utils.clean_text_v2 import clean_text_vq
 
@@ -15,23 +17,24 @@ from gandy.utils.clean_text_v2 import clean_text_vq
 ONLY_DOMINANT_BOX = False
 
 def _get_source_text_from_frame(
-    app_container: AdvancedPipeline, image: Image.Image, cache: BasicCache, ctx, seconds_state
+    app_container: AdvancedPipeline, image: Image.Image, cache: ImageCache, ctx, seconds_state
 ):
-    existing_index, transformed_image = image_is_similar(
+    existing, transformed_image = image_is_similar(
         image,
-        cache.iterate("images"),
+        cache.images,
         log_message="Checking if similar frame exists in cache",
         threshold=0,
     )
     transformed_cropped_image = None
+    cropped_thumbnail = None
 
-    if existing_index is not None:
+    if existing is not None:
         # Same entire image as before. Return it.
-        t_text = cache.index("source_texts", existing_index)
+        t_text, existing_seconds = existing
         ctx.log(
             "Found similar frame image in cache",
             source_text=t_text,
-            seconds=cache.index("seconds", existing_index),
+            seconds=existing_seconds,
         )
         return t_text
 
@@ -48,19 +51,21 @@ def _get_source_text_from_frame(
         cropped_image = rgb_image.crop(speech_bboxes[0])
 
         if app_container.text_detection_app.get_sel_app_name() != "none":
-            existing_index, transformed_cropped_image = image_is_similar(
+            cropped_thumbnail = region_thumbnail(cropped_image)
+            existing, transformed_cropped_image = image_is_similar(
                 cropped_image,
-                cache.iterate("cropped_images"),
+                cache.cropped_images,
                 log_message="Checking if similar text region exists in cache",
                 mode="text_region",
+                confirm=lambda value: thumbnails_match(value[2], cropped_thumbnail),
             )
-            if existing_index is not None:
-                t_text = cache.index("source_texts", existing_index)
+            if existing is not None:
+                t_text, existing_seconds, _ = existing
                 # Same text region image as before. Return it.
                 ctx.log(
                     "Found similar text region image in cache",
                     source_text=t_text,
-                    seconds=cache.index("seconds", existing_index),
+                    seconds=existing_seconds,
                 )
                 return t_text
         else:
@@ -85,27 +90,32 @@ def _get_source_text_from_frame(
     context_input = [] # Context joining is done in set_neighboring_similar_source_texts.
     source_texts = merge_texts(source_texts, context_input)
 
-    cache.push("images", transformed_image)
-    cache.push("source_texts", source_texts)
-    cache.push("cropped_images", transformed_cropped_image)
-    cache.push("seconds", seconds_state)  # For logging.
+    # Seconds are just for logging.
+    cache.images.add(transformed_image, (source_texts, seconds_state))
+    if transformed_cropped_image is not None:
+        cache.cropped_images.add(transformed_cropped_image, (source_texts, seconds_state, cropped_thumbnail))
 
     return source_texts  # str
 
-def read_text_in_frames(app_container: AdvancedPipeline, frame_image_paths: List[str], every_secs: float, fps: float, total_frames: float, mt_progress_callback):
+def read_text_in_frames(app_container: AdvancedPipeline, frames: Iterable[VideoFrame], every_secs: float, fps: float, total_frames: float, mt_progress_callback, normalize=True):
+    """
+    Returns the source text of each frame, and the timestamp (in seconds) of each frame.
+    """
+    # Frames are consumed as they're decoded (see generate_images).
     frame_source_texts: List[str] = []
+    frame_seconds: List[float] = []
 
     image_cache = make_image_cache()
 
-    for idx, frame_path in enumerate(frame_image_paths):
-        seconds_state = idx * every_secs
+    for frame in frames:
+        seconds_state = frame.seconds
         at_frame = (seconds_state) * fps
         timestamp = str(timedelta(seconds=seconds_state))
 
         with logger.begin_event(
             "Finding source text in frame", seconds=seconds_state, hms=timestamp
         ) as ctx:
-            image = Image.open(frame_path)
+            image = frame.image
             if image.mode != "RGB":
                 image = image.convert("RGB")
 
@@ -116,10 +126,13 @@ def read_text_in_frames(app_container: AdvancedPipeline, frame_image_paths: List
             # All MT models use clean_text_vq. There's no harm in normalizing twice (once here, once in MT).
             # But it is somewhat inefficient to normalize twice...
             # Why do we need this? Because the OCR model sometimes makes mistakes.
-            source_text = app_container.normalize(source_text)
+            # (Worker processes skip this - the main process normalizes their texts, since it has the MT model.)
+            if normalize:
+                source_text = app_container.normalize(source_text)
 
             frame_source_texts.append(source_text)
+            frame_seconds.append(seconds_state)
 
         mt_progress_callback((at_frame / total_frames) / 3)
 
-    return frame_source_texts
+    return frame_source_texts, frame_seconds
@@ -1,85 +1,93 @@
 from gandy.tasks.task5.subtitle_maker import TranslatedSegment
-from gandy.state.video_state import make_translation_cache, BasicCache
+from gandy.state.video_state import make_translation_cache, TranslationCache
 from gandy.utils.fancy_logger import logger
 from datetime import timedelta
 from typing import List
 from gandy.full_pipelines.advanced_pipeline import AdvancedPipeline
 
-def _get_n_from_list(l, n=10):
-    if len(l) <= n:
-        return l
-    return l[-n:]
+# Unique texts are translated this many at a time - get_target_texts_from_str batches them (or spreads them over the server slots).
+# Smaller = more progress updates.
+TRANSLATE_BATCH_SIZE = 32
 
-def _translate_text_from_frame(
-    app_container: AdvancedPipeline, fst: str, ctx, cache: BasicCache, seconds_state
+def _translate_unique_texts(
+    app_container: AdvancedPipeline, source_texts: List[str], cache: TranslationCache, frame_seconds, mt_progress_callback
 ):
-    existing_index = next(
-        (idx for (idx, other) in cache.enumerate("source_texts") if fst == other), None
-    )
-
-    # We only translate if a similar text was not already translated.
-    if existing_index is not None:
-        # Same text as in a previous frame (actually, it might be due to the "next" frame - see STAGE 2 with the reverse loop). Return it.
-        t_text = cache.index("target_texts", existing_index)
-        ctx.log(
-            "Found similar source text in cache",
-            source_text=fst,
-            target_text=t_text,
-            similar_source_text=cache.index("source_texts", existing_index),
-        )
-        return t_text
-    ctx.log(
-        "Could not find similar source text in cache",
-        source_text=fst,
-        last_cached=_get_n_from_list(cache.data["source_texts"]),
-    )
-
-    if len(fst) > 0:
-        target_texts = app_container.get_target_texts_from_str(
-            [fst],
-            use_stream=None,
-        )
-    else:
-        target_texts = [""]
-
-    if len(target_texts) > 0:
-        translated_text = target_texts[0]
-    else:
-        translated_text = None
-
-    cache.push("source_texts", fst)
-    cache.push("target_texts", translated_text)
-    cache.push("seconds", seconds_state)  # For logging.
-
-    ctx.log("Adding to translation cache", source_text=fst, target_text=translated_text)
-
-    return translated_text
-
-def translate_text_in_frames(app_container: AdvancedPipeline, frame_source_texts: List[str], every_secs: float, fps: float, total_frames: float, mt_progress_callback):
+    """
+    Translates every text not in the cache yet. Returns a dict of source text -> target text for all the given texts.
+    """
+    translations = {}
+    to_translate: List[str] = []
+    first_seconds = {} # For logging.
+
+    # Most frames share their text with the frames around them (especially after STAGE 2), so each text is only translated once.
+    for fst, seconds_state in zip(source_texts, frame_seconds):
+        if fst in translations:
+            continue
+
+        cached = cache.get(fst)
+        if cached is not None:
+            translations[fst] = cached[0]
+        elif len(fst) == 0:
+            translations[fst] = ""
+        else:
+            translations[fst] = None # Filled in below.
+            to_translate.append(fst)
+            first_seconds[fst] = seconds_state
+
+    with logger.begin_event(
+        "Translating unique source texts in frames", n_frames=len(source_texts), n_unique=len(translations), n_to_translate=len(to_translate)
+    ) as ctx:
+        for start_idx in range(0, len(to_translate), TRANSLATE_BATCH_SIZE):
+            batch = to_translate[start_idx:start_idx + TRANSLATE_BATCH_SIZE]
+
+            target_texts = app_container.get_target_texts_from_str(
+                batch,
+                use_stream=None,
+            )
+
+            for fst, translated_text in zip(batch, target_texts):
+                translations[fst] = translated_text
+                cache.put(fst, translated_text, first_seconds[fst])
+
+            ctx.log("Translated batch", source_texts=batch, target_texts=target_texts)
+
+            mt_progress_callback((2 / 3) + (((start_idx + len(batch)) / len(to_translate)) / 3))
+
+    return translations
+
+def translate_text_in_frames(app_container: AdvancedPipeline, frame_source_texts: List[str], every_secs: float, fps: float, total_frames: float, mt_progress_callback, start_index=0, translation_cache: TranslationCache = None, frame_seconds: List[float] = None):
+    """
+    start_index and translation_cache are used when translating the frames a few at a time (see chunked_frames.py).
+
+    frame_seconds is the timestamp of each frame (frames may not be evenly spaced - see adaptive_sampling.py). If not given, frames are assumed to be every_secs apart.
+    Each subtitle lasts until the next frame.
+    """
     segments: List[TranslatedSegment] = []
 
-    translation_cache = make_translation_cache()
+    if translation_cache is None:
+        translation_cache = make_translation_cache()
 
-    for idx, fst in enumerate(frame_source_texts):
-        seconds_state = idx * every_secs
-        at_frame = (seconds_state) * fps
+    if frame_seconds is None:
+        frame_seconds = [(start_index + i) * every_secs for i in range(len(frame_source_texts))]
 
-        timestamp = str(timedelta(seconds=seconds_state))
+    translations = _translate_unique_texts(app_container, frame_source_texts, translation_cache, frame_seconds, mt_progress_callback)
 
-        with logger.begin_event(
-            "Translating source text in frame", seconds=seconds_state, hms=timestamp
-        ) as ctx:
-            translated_text = _translate_text_from_frame(
-                app_container, fst, ctx, translation_cache, seconds_state
-            )
+    for idx, fst in enumerate(frame_source_texts, start=start_index):
+        seconds_state = frame_seconds[idx - start_index]
+        at_frame = (seconds_state) * fps
+
+        if idx - start_index + 1 < len(frame_seconds):
+            end_frame = frame_seconds[idx - start_index + 1] * fps
+        else:
+            end_frame = (seconds_state + every_secs) * fps
 
-            if translated_text is not None and len(translated_text) > 0:
-                segments.append(
-                    TranslatedSegment(text=translated_text, at_frame=at_frame)
-                )
+        translated_text = translations[fst]
 
-            ctx.log("Final outcome", text=translated_text)
+        if translated_text is not None and len(translated_text) > 0:
+            segments.append(
+                TranslatedSegment(text=translated_text, at_frame=at_frame, end_frame=end_frame)
+            )
 
-        mt_progress_callback((2 / 3) + ((at_frame / total_frames) / 3))
+        logger.log_message("Translated source text in frame", seconds=seconds_state, hms=str(timedelta(seconds=seconds_state)), source_text=fst, text=translated_text)
 
-    return segments
\ No newline at end of file
+    return segments
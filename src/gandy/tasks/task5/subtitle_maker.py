@@ -6,9 +6,10 @@ def _postprocess_translated_text(t: str):
     return t.replace("<", "[").replace(">", "]")
 
 class TranslatedSegment:
-    def __init__(self, text: str, at_frame: int) -> None:
+    def __init__(self, text: str, at_frame: int, end_frame: int = None) -> None:
         self.text = _postprocess_translated_text(text)
         self.at_frame = at_frame
+        self.end_frame = end_frame # If None, the subtitle lasts for sub_duration frames.
 
 
 class SubtitleMaker:
@@ -17,15 +18,13 @@ class SubtitleMaker:
         self.sub_duration = sub_duration
 
     def get_timestamp(self, frame) -> str:
-        seconds = frame // self.video_fps
+        ms = int(round(frame * 1000 / self.video_fps))
 
-        m, s = divmod(seconds, 60)
+        s, ms = divmod(ms, 1000)
+        m, s = divmod(s, 60)
         h, m = divmod(m, 60)
-        s = int(s)
-        m = int(m)
-        h = int(h)
 
-        return f"{h:02d}:{m:02d}:{s:02d},000"
+        return f"{h:02d}:{m:02d}:{s:02d},{ms:03d}"
 
     def create_srt_content(self, segments: List[TranslatedSegment]):
         srt_content = ""
@@ -33,7 +32,8 @@ class SubtitleMaker:
         for i in range(len(segments)):
             s = segments[i]
             srt_content += f"{i + 1}\n"  # Iteration
-            srt_content += f"{self.get_timestamp(s.at_frame)} --> {self.get_timestamp(s.at_frame + self.sub_duration)}\n"  # Timestamp
+            end_frame = s.end_frame if s.end_frame is not None else s.at_frame + self.sub_duration
+            srt_content += f"{self.get_timestamp(s.at_frame)} --> {self.get_timestamp(end_frame)}\n"  # Timestamp
             srt_content += f"{s.text}\n\n"  # Translation
 
         return srt_content.strip()
@@ -1,19 +1,21 @@
 import os
 from gandy.full_pipelines.advanced_pipeline import AdvancedPipeline
 from gandy.full_pipelines.base_pipeline import replace_terms_source_side
-from gandy.tasks.task5.subtitle_maker import SubtitleMaker
+from gandy.tasks.task5.subtitle_maker import SubtitleMaker, TranslatedSegment
 from gandy.tasks.task5.video_burner import burn_subs
-from gandy.tasks.task5.generate_images import generate_images
+from gandy.tasks.task5.adaptive_sampling import read_frames
 from gandy.tasks.task5.get_fps import get_fps
-import tempfile
 import regex as re
 from gandy.tasks.task5.stages.read_text_in_frames import read_text_in_frames
 from gandy.tasks.task5.stages.set_neighboring_similar_texts import set_neighboring_similar_texts
 from gandy.tasks.task5.stages.translate_text_in_frames import translate_text_in_frames
+from gandy.tasks.task5.chunked_frames import read_text_in_chunks, can_read_in_chunks
+from gandy.state.video_state import make_translation_cache
 from gandy.state.debug_state import debug_state
 from gandy.state.config_state import config_state
-from gandy.utils.text_processing import pack_context, pack_context_dedupe
+from gandy.utils.text_processing import pack_context, pack_context_dedupe, pack_context_dedupe_from
 from uuid import uuid4
+from typing import List
 from gc import collect
 
 """
@@ -99,6 +101,51 @@ def save_srt(srt_content: str, out_path: str):
     with open(out_path, "w", encoding="utf-8") as f:
         f.write(srt_content)
 
+def translate_chunks_as_ready(
+    app_container: AdvancedPipeline,
+    video_file_path: str,
+    every_secs: float,
+    fps: float,
+    total_frames: float,
+    video_duration_seconds: float,
+    mt_progress_callback,
+):
+    progress = {"read": 0.0, "translated": 0.0}
+
+    def _emit_progress():
+        mt_progress_callback((progress["read"] * 2 + progress["translated"]) / 3)
+
+    def _on_read(read_fraction: float):
+        progress["read"] = read_fraction
+        _emit_progress()
+
+    frame_source_texts: List[str] = []
+    segments: List[TranslatedSegment] = []
+    translation_cache = make_translation_cache()
+
+    for start_index, final_texts, final_seconds in read_text_in_chunks(
+        app_container, video_file_path, every_secs, fps, total_frames, video_duration_seconds, _on_read,
+        n_workers=config_state.task5_workers, chunk_secs=config_state.task5_chunk_secs,
+    ):
+        frame_source_texts.extend(final_texts)
+
+        # Context packing only looks at previous frames - the already translated frames don't need to be packed again.
+        packed_texts = pack_context_dedupe_from(frame_source_texts, start_index, config_state.n_context)
+        packed_texts = replace_terms_source_side(packed_texts, config_state.source_terms)
+
+        segments.extend(translate_text_in_frames(
+            app_container, packed_texts, every_secs, fps, total_frames, lambda p: None, start_index=start_index, translation_cache=translation_cache, frame_seconds=final_seconds,
+        ))
+
+        progress["translated"] = min(final_seconds[-1] / max(video_duration_seconds, 1), 1.0)
+        _emit_progress()
+
+    if debug_state.debug or debug_state.debug_dump_task5:
+        # NOTE: Unlike the sequential path, these texts have already gone through STAGE 2.
+        dump_before_translation_debug_data(frame_source_texts)
+
+    return segments
+
 def process_task5(
     app_container: AdvancedPipeline,
     video_file_path: str,
@@ -119,43 +166,54 @@ def process_task5(
 
     total_frames = fps * video_duration_seconds
 
-    if config_state.memory_efficient_tasks:
-        # Unload unnecessary models.
-        app_container.translation_app.unload_all()
+    if frame_source_texts is None and config_state.task5_workers > 1 and can_read_in_chunks(app_container):
+        if config_state.memory_efficient_tasks:
+            # The workers have their own models - the main process only needs the MT model. Same as the unloading after STAGE 2 below.
+            app_container.text_detection_app.unload_all(do_collect=False)
+            app_container.text_recognition_app.unload_all(do_collect=False)
+            app_container.text_line_app.unload_all(do_collect=False)
+            collect()
+
+        ## STAGES 1-3 overlapped: worker processes read the video in chunks, and frames are translated as soon as their texts are final.
+        segments = translate_chunks_as_ready(app_container, video_file_path, every_secs, fps, total_frames, video_duration_seconds, mt_progress_callback)
+    else:
+        if config_state.memory_efficient_tasks:
+            # Unload unnecessary models.
+            app_container.translation_app.unload_all()
 
-    if frame_source_texts is None:
-        with tempfile.TemporaryDirectory() as tmp_dir:
-            frame_image_paths = generate_images(
-                video_file_path, tmp_dir, every_secs=every_secs
-            )
+        frame_seconds = None # Only known when the frames are read here. Otherwise frames are assumed to be every_secs apart.
+
+        if frame_source_texts is None:
+            # Frames are streamed straight from FFMpeg - no temporary images on disk.
+            frames = read_frames(video_file_path, every_secs=every_secs)
 
             ## STAGE 1: Detect and OCR regions.
-            frame_source_texts = read_text_in_frames(app_container, frame_image_paths, every_secs, fps, total_frames, mt_progress_callback)
+            frame_source_texts, frame_seconds = read_text_in_frames(app_container, frames, every_secs, fps, total_frames, mt_progress_callback)
 
-        if debug_state.debug or debug_state.debug_dump_task5:
-            dump_before_translation_debug_data(frame_source_texts)
+            if debug_state.debug or debug_state.debug_dump_task5:
+                dump_before_translation_debug_data(frame_source_texts)
 
-        ## STAGE 2: Reverse loop to find neighboring frames with similar texts.
-        # This mutates in-place.
-        set_neighboring_similar_texts(app_container, frame_source_texts, every_secs, fps, total_frames, mt_progress_callback)
+            ## STAGE 2: Reverse loop to find neighboring frames with similar texts.
+            # This mutates in-place.
+            set_neighboring_similar_texts(app_container, frame_source_texts, every_secs, fps, total_frames, mt_progress_callback)
 
-    # Add context as needed.
-    frame_source_texts = pack_context_dedupe(frame_source_texts, config_state.n_context)
+        # Add context as needed.
+        frame_source_texts = pack_context_dedupe(frame_source_texts, config_state.n_context)
 
-    # Replace source-terms.
-    frame_source_texts = replace_terms_source_side(frame_source_texts, config_state.source_terms)
+        # Replace source-terms.
+        frame_source_texts = replace_terms_source_side(frame_source_texts, config_state.source_terms)
 
-    if config_state.memory_efficient_tasks:
-        # Unload unnecessary models.
-        app_container.text_detection_app.unload_all(do_collect=False)
-        app_container.text_recognition_app.unload_all(do_collect=False)
-        app_container.text_line_app.unload_all(do_collect=False)
-        collect()
+        if config_state.memory_efficient_tasks:
+            # Unload unnecessary models.
+            app_container.text_detection_app.unload_all(do_collect=False)
+            app_container.text_recognition_app.unload_all(do_collect=False)
+            app_container.text_line_app.unload_all(do_collect=False)
+            collect()
 
-    ## STAGE 3: Translate each frame.
-    segments = translate_text_in_frames(
-        app_container, frame_source_texts, every_secs, fps, total_frames, mt_progress_callback
-    )
+        ## STAGE 3: Translate each frame.
+        segments = translate_text_in_frames(
+            app_container, frame_source_texts, every_secs, fps, total_frames, mt_progress_callback, frame_seconds=frame_seconds
+        )
 
     if len(segments) == 0:
         raise RuntimeError("No text detected in video.")
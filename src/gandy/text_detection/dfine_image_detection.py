@@ -39,6 +39,24 @@ class DFineImageDetectionApp(YOLOTDImageDetectionApp):
 
         # [1, 1] refers to padded_hw. It's unused here but we still need to return some dummy value.
         return self.model.full_pipe(image), [1, 1]
+
+    def can_batch(self):
+        # Other ONNX classes (e.g: PpONNX for pp_line) have no batched path.
+        return hasattr(self.model, "forward_batch") and self.model.supports_batching()
+
+    def prepare_batch_image(self, image):
+        if image.mode != "RGB":
+            image = image.convert("RGB")  # Needs 3 channels.
+
+        return image
+
+    def detect_bboxes_batch(self, images):
+        logger.log_message(
+            "Passing images into DFINE object detection model...", n_images=len(images)
+        )
+
+        images = [self.prepare_batch_image(image) for image in images]
+        return self.model.forward_batch(images), [1, 1]
     
     def map_bboxes_data(self, bboxes_data, padded_hw):
         bboxes_data = np.transpose(bboxes_data)  # [N, 5]
@@ -96,6 +114,10 @@ class DFineLineImageDetectionApp(DFineImageDetectionApp, ExpandedLineMixin):
 
         # [1, 1] refers to padded_hw. It's unused here but we still need to return some dummy value.
         return self.model.full_pipe(image), [1, 1]
+
+    def prepare_batch_image(self, image):
+        image = super().prepare_batch_image(image)
+        return Image.fromarray(self.transform(image=np.array(image))['image'])
     
     def process_before_tnms(self, bboxes_scores, bboxes_pos, image_width, image_height):
         return bboxes_pos, bboxes_scores
@@ -6,7 +6,7 @@ from gandy.state.config_state import config_state
 from gandy.onnx_models.yolo import YOLOONNX
 from gandy.text_detection.base_image_detection import BaseImageDetection
 from gandy.text_detection.line_mixin import LineMixin, ExpandedLineMixinWithMargin
-from gandy.utils.tnms import tnms
+from gandy.utils.box_ops import nms
 from gandy.utils.fancy_logger import logger
 from gandy.utils.filter_out_overlapping_bboxes import filter_out_overlapping_bboxes
 
@@ -221,9 +221,16 @@ class YOLOImageDetectionApp(BaseImageDetection):
         # For D-FINE.
         bboxes_pos, bboxes_scores = self.process_before_tnms(bboxes_scores, bboxes_pos, image_width, image_height)
 
+        if self.confidence_threshold is not None:
+            # Low confidence boxes are dropped after NMS anyway - and they can only suppress boxes with even lower scores, so dropping them first keeps the same boxes.
+            # Saves a lot of NMS work: YOLO gives 8400 candidates, most of them near 0.
+            confident_mask = bboxes_scores >= self.confidence_threshold
+            bboxes_pos = bboxes_pos[confident_mask]
+            bboxes_scores = bboxes_scores[confident_mask]
+
         # NMS
         if self.iou_thr is not None:
-            keep = tnms(
+            keep = nms(
                 bboxes_pos,
                 bboxes_scores,
                 thresh=self.iou_thr,
@@ -238,21 +245,14 @@ class YOLOImageDetectionApp(BaseImageDetection):
             logger.log_message('Filtering for bottom text regions in image.')
         height_thr = image_height * 0.79 # on the bottom 21% of the image.
 
-        if self.confidence_threshold is not None: # TODO: full numpy for speed.
-            boxes = []
-            for i in range(len(scores)):
-                if config_state.bottom_text_only:
-                    ymid = (processed_boxes[i][3] + processed_boxes[i][1]) / 2
-                    if ymid < height_thr:
-                        continue
-
-                if scores[i] >= self.confidence_threshold:
-                    boxes.append(processed_boxes[i])
-
-            if len(boxes) > 0:
-                boxes = np.stack(boxes, axis=0)
-            else:
-                boxes = np.empty((0, 4))
+        if self.confidence_threshold is not None:
+            keep_mask = scores >= self.confidence_threshold
+
+            if config_state.bottom_text_only:
+                ymid = (processed_boxes[:, 3] + processed_boxes[:, 1]) / 2
+                keep_mask &= ymid >= height_thr
+
+            boxes = processed_boxes[keep_mask]
         else:
             boxes = processed_boxes
 
@@ -306,12 +306,50 @@ class YOLOImageDetectionApp(BaseImageDetection):
 
         return self.model.full_pipe(t_x), t_x.shape[2:]
 
-    def process(self, image, do_sort=True, return_list=True):
-        image_width, image_height = image.size
+    def letterbox_batch(self, images):
+        """
+        Transforms and letterboxes every image straight into one preallocated [B, 3, S, S] array.
 
-        logger.log_message("Detecting boxes...")
-        dict_output, padded_hw = self.detect_bboxes(image)
+        Same output as resize_np_img + normalize + transpose per image.
+        """
+        batch = np.full((len(images), 3, self.image_size, self.image_size), 114, dtype=np.float32) # 114 = Border color.
+
+        for i, image in enumerate(images):
+            if image.mode != "RGB":
+                image = image.convert("RGB")  # Needs 3 channels
+
+            t_x = self.transform(image=np.array(image))["image"]
+
+            shape = t_x.shape[:2]
+            r = min(self.image_size / shape[0], self.image_size / shape[1])
+            new_unpad = int(round(shape[1] * r)), int(round(shape[0] * r))
+
+            if shape[::-1] != new_unpad:
+                t_x = cv2.resize(t_x, new_unpad, interpolation=cv2.INTER_LINEAR)
+
+            top = int(round(((self.image_size - new_unpad[1]) / 2) - 0.1))
+            left = int(round(((self.image_size - new_unpad[0]) / 2) - 0.1))
+
+            batch[i, :, top:top + new_unpad[1], left:left + new_unpad[0]] = t_x.transpose(2, 0, 1)
+
+        batch /= 255.0  # Normalize.
+
+        return batch
+
+    def can_batch(self):
+        return self.model.supports_batching()
+
+    def detect_bboxes_batch(self, images):
+        logger.log_message(
+            "Transforming images before passing them into object detection model...", n_images=len(images)
+        )
 
+        t_x = self.letterbox_batch(images)
+        outputs = self.model.full_pipe(t_x)
+
+        return [outputs[i:i + 1] for i in range(len(images))], t_x.shape[2:]
+
+    def postprocess_bboxes(self, dict_output, padded_hw, image_width, image_height, do_sort=True, return_list=True):
         logger.log_message("Fusing boxes...")
         bboxes = self.fuse_boxes(dict_output, padded_hw, image_width, image_height)
 
@@ -338,6 +376,43 @@ class YOLOImageDetectionApp(BaseImageDetection):
 
             return bboxes
 
+    def process(self, image, do_sort=True, return_list=True):
+        image_width, image_height = image.size
+
+        logger.log_message("Detecting boxes...")
+        dict_output, padded_hw = self.detect_bboxes(image)
+
+        return self.postprocess_bboxes(dict_output, padded_hw, image_width, image_height, do_sort=do_sort, return_list=return_list)
+
+    def process_batch(self, images, do_sort=True, return_list=True):
+        """
+        Detects boxes for a list of images (e.g: tiles of a tall page) - batched into one model call if the model allows it.
+
+        Returns a list with the output of process() for each image.
+        """
+        if not self.can_batch():
+            return [self.process(image, do_sort=do_sort, return_list=return_list) for image in images]
+
+        outputs = []
+        max_batch_size = max(1, config_state.detection_max_batch_size)
+
+        for batch_start in range(0, len(images), max_batch_size):
+            batch_images = images[batch_start:batch_start + max_batch_size]
+
+            logger.log_message("Detecting boxes in a batch...", n_images=len(batch_images))
+            dict_outputs, padded_hw = self.detect_bboxes_batch(batch_images)
+
+            for image, dict_output in zip(batch_images, dict_outputs):
+                outputs.append(self.postprocess_bboxes(dict_output, padded_hw, image.width, image.height, do_sort=do_sort, return_list=return_list))
+
+        return outputs
+
+    def begin_process_batch(self, *args, **kwargs):
+        if not self.loaded:
+            self.load_model()
+
+        return self.process_batch(*args, **kwargs)
+
 
 class YOLOTDImageDetectionApp(YOLOImageDetectionApp):
     def __init__(self, confidence_threshold=0.5, iou_thr=0.25, model_name="yolo_td", image_size = 640, filter_out_overlapping_bboxes = False):
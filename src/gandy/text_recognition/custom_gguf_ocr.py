@@ -3,8 +3,6 @@ from gandy.translation.llama_server_wrapper import LlamaCppExecutableOpenAIClien
 from gandy.utils.fancy_logger import logger
 from gandy.state.config_state import config_state
 from gandy.text_recognition.jamo_override import JamoOverride
-from io import BytesIO
-import base64
 import os
 from PIL import Image
 import json
@@ -13,6 +11,10 @@ import numpy as np
 from gandy.utils.find_free_port import find_tcp_port
 from gandy.utils.pseudo_smart_image_resize import create_pseudo_smart_resize
 import unicodedata
+import time
+import threading
+from gandy.utils.fast_image_encoding import image_to_data_url
+from gandy.text_recognition.ocr_cache import hash_image
 
 """
 The config file here only has these fields:
@@ -41,20 +43,19 @@ def remove_emojis(s: str):
                 
     return "".join(result)
 
-# TODO: Redundant code.
-def image_to_base64(new_image, format="PNG"):
-    buffer = BytesIO()
-    new_image.save(buffer, format="PNG")
-    new_image_base64 = base64.b64encode(buffer.getvalue()).decode("utf-8")
-
-    return f"data:image/{format.lower()};base64,{new_image_base64}"
-
 class CustomGgufOcrApp(TrOCRTextRecognitionApp):
     def __init__(self, model_sub_path="/", config_sub_path="/", join_lines_with="", transform=None):
         super().__init__(model_sub_path, join_lines_with=join_lines_with, transform=transform)
 
         self.config_sub_path = config_sub_path
 
+        self.encode_stats = {
+            "n_images": 0,
+            "encode_ms": 0.0,
+        }
+        # OCR calls can come from a few threads at once (e.g: the task1 pipeline stages).
+        self.encode_stats_lock = threading.Lock()
+
     def load_mango_config(self):
         with logger.begin_event("Loading Mango config") as ctx:
             with open(self.get_mango_config_path(), 'r', encoding='utf-8') as f:
@@ -95,6 +96,9 @@ class CustomGgufOcrApp(TrOCRTextRecognitionApp):
     
     def get_mango_config_path(self):
         return f"{self.config_sub_path}.json"
+
+    def get_cache_name(self):
+        return self.config_sub_path
     
     def locate_in_folder(self, file_name: str):
         return os.path.join(os.path.dirname(self.config_sub_path), file_name)
@@ -167,9 +171,26 @@ class CustomGgufOcrApp(TrOCRTextRecognitionApp):
 
         return super(TrOCRTextRecognitionApp, self).unload_model()
     
-    def image_to_llm_messages(self, image):
-        image = Image.fromarray(image) # To PIL and then to base64. TODO: Optimize?
+    def encode_image(self, image: np.ndarray):
+        start_time = time.perf_counter()
+        data_url = image_to_data_url(image, encoding=config_state.ocr_image_encoding)
+
+        encode_ms = (time.perf_counter() - start_time) * 1000
+        with self.encode_stats_lock:
+            self.encode_stats["n_images"] += 1
+            self.encode_stats["encode_ms"] += encode_ms
 
+        return data_url
+
+    def get_encode_stats(self):
+        with self.encode_stats_lock:
+            stats = dict(self.encode_stats)
+        stats["mean_encode_ms"] = (stats["encode_ms"] / stats["n_images"]) if stats["n_images"] > 0 else 0.0
+        stats["encoding"] = config_state.ocr_image_encoding
+
+        return stats
+
+    def image_to_llm_messages(self, image):
         messages = [
             {
                 'role': 'user',
@@ -177,7 +198,7 @@ class CustomGgufOcrApp(TrOCRTextRecognitionApp):
                     {
                         'type': 'image_url',
                         'image_url': {
-                            'url': image_to_base64(image),
+                            'url': self.encode_image(image),
                         }
                     },
                     { 
@@ -191,11 +212,31 @@ class CustomGgufOcrApp(TrOCRTextRecognitionApp):
         return messages
 
     def ocr_images(self, images):
-        with logger.begin_event('Preparing inputs'):
-            batch_inputs = [self.image_to_llm_messages(image) for image in images]
+        # Identical crops (common when polling the same box over and over) are only encoded and sent once.
+        unique_indices = {}
+        image_to_unique = []
+        for image in images:
+            image_hash = hash_image(image)
+
+            if image_hash not in unique_indices:
+                unique_indices[image_hash] = len(unique_indices)
+            image_to_unique.append(unique_indices[image_hash])
+
+        unique_images = [None for _ in unique_indices]
+        for image, unique_idx in zip(images, image_to_unique):
+            unique_images[unique_idx] = image
+
+        with logger.begin_event('Preparing inputs', n_images=len(images), n_unique_images=len(unique_images)) as ctx:
+            # Timed here rather than from the shared stats - another thread may be encoding at the same time.
+            start_time = time.perf_counter()
+            batch_inputs = [self.image_to_llm_messages(image) for image in unique_images]
+
+            ctx.log('Encoded images', encoding=config_state.ocr_image_encoding, encode_ms=(time.perf_counter() - start_time) * 1000)
         with logger.begin_event('Calling OCR LLM'):
             prediction = self.llm.call_llm_with_batch(batch_inputs)
 
+        prediction = [prediction[unique_idx] for unique_idx in image_to_unique]
+
         # For my Korean OCR variant.
         overrides = self.mango_config.get("overrides", {})
 
@@ -0,0 +1,57 @@
+import atexit
+import hashlib
+import numpy as np
+from gandy.database.exact_match_cache import ExactMatchCache
+from gandy.state.config_state import config_state
+
+# Task3 live boxes, the background activity watcher and task5 keep OCR'ing the exact same line crops.
+# Results are keyed by a hash of the transformed crop (what the OCR model actually sees) and the OCR app, so a repeat skips the model entirely.
+
+def hash_image(image: np.ndarray):
+    h = hashlib.blake2b(digest_size=16)
+    h.update(str(image.shape).encode("ascii"))
+    h.update(np.ascontiguousarray(image).data)
+
+    return h.hexdigest()
+
+class OcrResultCache():
+    def __init__(self, file_path = 'models/database/cache_ocr.json', save_interval = 100):
+        self.file_path = file_path
+
+        # Only read from / written to disk while persist_ocr_cache is on (see set_persist).
+        self.cache = ExactMatchCache(
+            file_path=(file_path if config_state.persist_ocr_cache else None), max_size=4000, save_interval=save_interval,
+        )
+        atexit.register(self.cache.flush)
+
+    def make_key(self, app_name: str, image: np.ndarray):
+        return f"{app_name}:{hash_image(image)}"
+
+    def get(self, key: str):
+        if not config_state.cache_ocr:
+            return None
+        return self.cache.get(key)
+
+    def put(self, key: str, text: str):
+        if not config_state.cache_ocr:
+            return
+
+        self.cache.put(key, text)
+
+    def set_persist(self, persist: bool):
+        # persist_ocr_cache can be toggled from the app at any time. Saved entries are loaded the first time it's turned on.
+        file_path = self.file_path if persist else None
+        if file_path != self.cache.file_path:
+            self.cache.set_file_path(file_path)
+
+    def set_ocr_model(self, app_name: str):
+        # A different OCR model can read the same crop differently.
+        return self.cache.set_scope(app_name)
+
+    def clear(self):
+        self.cache.clear()
+
+    def get_stats(self):
+        return self.cache.get_stats()
+
+ocr_cache = OcrResultCache()
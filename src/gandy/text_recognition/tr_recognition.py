@@ -13,6 +13,7 @@ import os
 import cv2
 import regex as re
 from gandy.utils.is_string_only_name import name_checker
+from gandy.text_recognition.ocr_cache import ocr_cache
 
 def convert_line_text_to_speaker_line_text(line_text: str):
     return f'[{line_text}]: '
@@ -55,19 +56,44 @@ class TrOCRTextRecognitionApp(BaseTextRecognition):
         cropped_image = augmented["image"]
         return cropped_image
 
+    def get_cache_name(self):
+        # Identifies this OCR model in the OCR result cache.
+        return f"{type(self).__name__}:{self.model_sub_path}"
+
     def process_one_image(self, cropped_image):
         logger.log_message(f"Scanning a text region...", h=cropped_image.shape[0], w=cropped_image.shape[1])
 
         cropped_image = self.transform_image(cropped_image)
 
-        output = self.do_generate(cropped_image)
+        cache_key = ocr_cache.make_key(self.get_cache_name(), cropped_image)
+        output = ocr_cache.get(cache_key)
+
+        if output is None:
+            output = self.do_generate(cropped_image)
+            ocr_cache.put(cache_key, output)
+        else:
+            logger.log_message(f"Found text region in OCR cache", text=output)
 
         logger.log_message(f"Done scanning a text region!")
         return output
     
     def process_multiple_images(self, cropped_images):
         cropped_images = [self.transform_image(c) for c in cropped_images]
-        outputs = self.do_generate(cropped_images, batched=True)
+
+        cache_keys = [ocr_cache.make_key(self.get_cache_name(), c) for c in cropped_images]
+        outputs = [ocr_cache.get(k) for k in cache_keys]
+
+        missing_indices = [idx for idx, o in enumerate(outputs) if o is None]
+        if len(missing_indices) > 0:
+            missing_outputs = self.do_generate([cropped_images[idx] for idx in missing_indices], batched=True)
+
+            for idx, o in zip(missing_indices, missing_outputs):
+                outputs[idx] = o
+                ocr_cache.put(cache_keys[idx], o)
+
+        if len(missing_indices) < len(outputs):
+            logger.log_message(f"Found text lines in OCR cache", n_found=len(outputs) - len(missing_indices), n_lines=len(outputs))
+
         return outputs # list of strings.
     
     def save_debug(self, cropped: np.ndarray, msg: str, text: str):
@@ -85,6 +111,140 @@ class TrOCRTextRecognitionApp(BaseTextRecognition):
         else:
             logger.log_message(msg, text=text)
 
+    def postprocess_line_texts(self, line_texts, detect_speaker_name=False):
+        # Modifies line_texts in place.
+        do_detect_speaker_name = config_state.detect_speaker_name or detect_speaker_name
+
+        with logger.begin_event("Postprocessing lines.", detect_speaker_name=do_detect_speaker_name) as ctx:
+            if self.join_lines_with is not None and len(line_texts) > 1:
+                for lt_idx in range(len(line_texts[:-1])):
+                    line_texts[lt_idx] = str(line_texts[lt_idx]) + self.join_lines_with
+
+            if do_detect_speaker_name and len(line_texts) > 1:
+                detected_name_data = name_checker.is_string_only_name(line_texts[0])
+
+                if detected_name_data["is_name"]:
+                    line_texts[0] = convert_line_text_to_speaker_line_text(detected_name_data["cleaned"])
+
+                ctx.log(
+                    "Done checking if line was a speaker name.",
+                    is_name=detected_name_data["is_name"],
+                    cleaned_if_was_name=detected_name_data["cleaned"],
+                )
+
+        return line_texts
+
+    def process_page(self, image: Image.Image, bboxes, text_line_app, forced_image=None, text_line_app_scan_image_if_fails = True, on_box_done=None, detect_speaker_name=False):
+        """
+        Page-level batching: Detects the lines in every text region first, then OCRs all the line crops of the page together in batches.
+
+        Returns the same outputs (in the same order) as process() does with batch_ocr.
+        """
+        grouped_line_bboxes = []
+        all_crops = [] # Each item = (region index, numpy crop).
+        region_images = []
+
+        with logger.begin_event('Detecting lines for all text regions', n_regions=len(bboxes)):
+            for bbox in bboxes:
+                text_region_image = (
+                    forced_image if forced_image is not None else image.crop(bbox)
+                )
+                region_images.append(text_region_image)
+
+                line_bboxes = text_line_app.get_images(text_region_image, return_image_if_fails=text_line_app_scan_image_if_fails)
+                grouped_line_bboxes.append(line_bboxes)
+
+                for bb in line_bboxes:
+                    all_crops.append((len(region_images) - 1, np.array(text_region_image.crop(bb)))) # Further cropped to a text line.
+
+        all_line_texts = [[] for _ in bboxes]
+        crop_outputs = [None for _ in all_crops]
+
+        # Regions are reported done in order - a region is done once all of its lines (and all the lines of the regions before it) are.
+        n_lines_left = [len(lb) for lb in grouped_line_bboxes]
+        n_regions_reported = 0
+
+        def report_finished_regions():
+            nonlocal n_regions_reported
+
+            while n_regions_reported < len(bboxes) and n_lines_left[n_regions_reported] == 0:
+                if on_box_done is not None:
+                    on_box_done(n_regions_reported)
+                n_regions_reported += 1
+
+        report_finished_regions() # Regions with no lines at all.
+
+        max_batch_size = max(1, config_state.ocr_max_batch_size)
+
+        # Similar sized crops are batched together so one huge crop doesn't slow down a batch of tiny ones.
+        # Within a size bucket the page order is kept, so earlier regions still tend to finish first.
+        crop_order = sorted(range(len(all_crops)), key=lambda i: all_crops[i][1].shape[0] * all_crops[i][1].shape[1])
+
+        with logger.begin_event('Actually OCR\'ing page', n_lines=len(all_crops), max_batch_size=max_batch_size):
+            for batch_start in range(0, len(crop_order), max_batch_size):
+                crop_indices = crop_order[batch_start:batch_start + max_batch_size]
+
+                outp = self.process_multiple_images([all_crops[i][1] for i in crop_indices])
+                logger.log_message(f'Processed image lines in a page-level batch', n_lines=len(crop_indices), outp=outp)
+
+                for crop_idx, text in zip(crop_indices, outp):
+                    crop_outputs[crop_idx] = text
+                    n_lines_left[all_crops[crop_idx][0]] -= 1
+
+                report_finished_regions()
+
+        for (region_idx, _), text in zip(all_crops, crop_outputs):
+            all_line_texts[region_idx].append(text)
+
+        source_texts = []
+        for region_idx, line_texts in enumerate(all_line_texts):
+            self.postprocess_line_texts(line_texts, detect_speaker_name)
+
+            text = "".join(line_texts)
+            self.log_text(np.array(region_images[region_idx]), f"Found complete text", text=text)
+            source_texts.append(text)
+
+        # Same as process(): line_bboxes and line_texts are from the last text region.
+        line_bboxes = grouped_line_bboxes[-1] if len(grouped_line_bboxes) > 0 else None
+        line_texts = all_line_texts[-1] if len(all_line_texts) > 0 else None
+
+        return source_texts, line_bboxes, line_texts, grouped_line_bboxes
+
+    def process_lines(self, image: Image.Image, line_bboxes, known_texts=None, detect_speaker_name=False):
+        """
+        OCRs already detected text lines as one text region. Lines with a known text (known_texts[idx] is not None) are not OCR'd again.
+
+        Returns the full text, and the raw text of each line (before postprocessing - to be reused later).
+        """
+        line_texts = list(known_texts) if known_texts is not None else [None for _ in line_bboxes]
+        missing_indices = [idx for idx, t in enumerate(line_texts) if t is None]
+
+        with logger.begin_event('Actually OCR\'ing lines', n_lines=len(line_texts), n_missing=len(missing_indices)):
+            crops = [np.array(image.crop(line_bboxes[idx])) for idx in missing_indices]
+
+            if config_state.batch_ocr:
+                max_batch_size = max(1, config_state.ocr_max_batch_size)
+
+                outputs = []
+                for batch_start in range(0, len(crops), max_batch_size):
+                    outputs.extend(self.process_multiple_images(crops[batch_start:batch_start + max_batch_size]))
+            else:
+                outputs = [self.process_one_image(c) for c in crops]
+
+            for idx, text in zip(missing_indices, outputs):
+                line_texts[idx] = text
+
+        text = "".join(self.postprocess_line_texts(list(line_texts), detect_speaker_name))
+        self.log_text(None, f"Found complete text", text=text)
+
+        return text, line_texts
+
+    def begin_process_lines(self, *args, **kwargs):
+        if not self.loaded:
+            self.load_model()
+
+        return self.process_lines(*args, **kwargs)
+
     def process(self, image: Image.Image, bboxes, text_line_app, forced_image=None, text_line_app_scan_image_if_fails = True, on_box_done=None, detect_speaker_name=False):
         source_texts = []
         if len(bboxes) > 1 and forced_image is not None:
@@ -94,6 +254,12 @@ class TrOCRTextRecognitionApp(BaseTextRecognition):
         if forced_image is not None:
             logger.log_message("Using forced image for OCR")
 
+        if config_state.batch_ocr and config_state.page_level_ocr and text_line_app is not None:
+            return self.process_page(
+                image, bboxes, text_line_app, forced_image=forced_image, text_line_app_scan_image_if_fails=text_line_app_scan_image_if_fails,
+                on_box_done=on_box_done, detect_speaker_name=detect_speaker_name,
+            )
+
         line_bboxes = None
         line_texts = None
         grouped_line_bboxes = []
@@ -158,24 +324,7 @@ class TrOCRTextRecognitionApp(BaseTextRecognition):
 
                             line_texts.append(outp)
 
-                do_detect_speaker_name = config_state.detect_speaker_name or detect_speaker_name
-
-                with logger.begin_event("Postprocessing lines.", detect_speaker_name=do_detect_speaker_name) as ctx:
-                    if self.join_lines_with is not None and len(line_texts) > 1:
-                        for lt_idx in range(len(line_texts[:-1])):
-                            line_texts[lt_idx] = str(line_texts[lt_idx]) + self.join_lines_with
-
-                    if do_detect_speaker_name and len(line_texts) > 1:
-                        detected_name_data = name_checker.is_string_only_name(line_texts[0])
-
-                        if detected_name_data["is_name"]:
-                            line_texts[0] = convert_line_text_to_speaker_line_text(detected_name_data["cleaned"])
-
-                        ctx.log(
-                            "Done checking if line was a speaker name.",
-                            is_name=detected_name_data["is_name"],
-                            cleaned_if_was_name=detected_name_data["cleaned"],
-                        )
+                self.postprocess_line_texts(line_texts, detect_speaker_name)
 
                 text = "".join(line_texts)
             else:
@@ -12,6 +12,9 @@ import win32api
 import win32con
 import win32job
 import asyncio
+import threading
+import concurrent.futures
+import httpx
 
 import ctypes
 
@@ -21,9 +24,37 @@ from gandy.translation.subprocess_pyinstaller_patch import subprocess_args
 # "Um akshually you shouldn't do <seemingly legitimate behavior>" - THEN WHY DON'T YOU DOCUMENT IT FOOL?! 
 loop = asyncio.new_event_loop()
 
+# The loop runs forever in its own thread. Every app (translation, OCR, embeddings, name agent, shortener...) submits coroutines to it from whatever thread it's on.
+# Unlike run_until_complete, this lets requests from different threads (socketio background tasks, the activity watcher, task1's staged pipeline...) be in flight at the same time.
+loop_thread = None
+loop_thread_lock = threading.Lock()
+
+def _ensure_loop_thread():
+    global loop_thread
+
+    with loop_thread_lock:
+        if loop_thread is None or not loop_thread.is_alive():
+            loop_thread = threading.Thread(target=loop.run_forever, daemon=True, name="LlamaServerEventLoop")
+            loop_thread.start()
+
+def submit(coro) -> concurrent.futures.Future:
+    """
+    Schedules the coroutine on the shared event loop thread. Thread-safe. Returns a concurrent.futures.Future with the result.
+    """
+    _ensure_loop_thread()
+    return asyncio.run_coroutine_threadsafe(coro, loop)
+
+def run_in_loop(coro):
+    if threading.current_thread() is loop_thread:
+        # Would wait forever on itself.
+        coro.close()
+        raise RuntimeError("Blocking LLM calls can not be made from the event loop thread - await the coroutine or use a worker thread instead.")
+
+    return submit(coro).result()
+
 class LlamaCppExecutableOpenAIClient:
     def __init__(self, model_path, num_gpu_layers, can_cuda,
-                 llama_cpp_server_path, host="127.0.0.1", port=8000, prepend_phrase = None, verbose = False, n_context=750, embedding=False, stop = None, mmproj = None, extra_commands = [], extra_body = {}, high_cost_embedding = False):
+                 llama_cpp_server_path, host="127.0.0.1", port=8000, prepend_phrase = None, verbose = False, n_context=750, embedding=False, stop = None, mmproj = None, extra_commands = [], extra_body = {}, high_cost_embedding = False, max_connections = 8, n_parallel = 1):
 
         self.model_path = model_path
 
@@ -43,6 +74,9 @@ class LlamaCppExecutableOpenAIClient:
 
         self.n_context = n_context
 
+        # Number of server slots that can decode at the same time. Each slot gets its own n_context worth of KV cache.
+        self.n_parallel = max(1, n_parallel)
+
         self.mmproj = mmproj
 
         self.extra_commands = extra_commands
@@ -53,11 +87,18 @@ class LlamaCppExecutableOpenAIClient:
             # Yeah None might work instead of NOT_GIVEN but you never know with these fudging developers, so let's keep things by the book.
             self.stop = NOT_GIVEN
 
+        self.max_connections = max(max_connections, self.n_parallel)
+
+        self.prompt_stats = {
+            "n_requests": 0,
+            "prompt_tokens_evaluated": 0,
+            "prompt_tokens_reused": 0,
+        }
+
         # Initialize the OpenAI client pointing to the llama.cpp server
-        self.client = AsyncOpenAI(
-            base_url=self.server_url,
-            api_key="sk-no-key-required" # A dummy key, as llama.cpp server doesn't require one
-        )
+        self.http_client = None
+        self.client = None
+        self._make_client()
 
         # Ensure the model path exists
         if not os.path.exists(self.model_path):
@@ -68,6 +109,44 @@ class LlamaCppExecutableOpenAIClient:
 
         atexit.register(self.stop_server)
 
+    def _make_client(self):
+        # Each server gets its own connection pool. Connections are kept alive between calls, so a request doesn't pay for a new TCP handshake -
+        # and a few can be in flight at once (one per slot is all the server can work on anyways).
+        self.http_client = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=self.max_connections,
+                max_keepalive_connections=self.max_connections,
+                keepalive_expiry=120,
+            ),
+            timeout=httpx.Timeout(3600, connect=10), # Same as the server's --timeout.
+        )
+
+        self.client = AsyncOpenAI(
+            base_url=self.server_url,
+            api_key="sk-no-key-required", # A dummy key, as llama.cpp server doesn't require one
+            http_client=self.http_client,
+        )
+
+    def _close_client(self):
+        # Pooled connections point to a server that's gone now - drop them.
+        if self.http_client is None:
+            return
+
+        if threading.current_thread() is loop_thread:
+            # Can't wait on the loop from the loop - just let it close in the background.
+            loop.create_task(self.http_client.aclose())
+            self.http_client = None
+            self.client = None
+            return
+
+        try:
+            submit(self.http_client.aclose()).result(timeout=5)
+        except Exception:
+            pass
+
+        self.http_client = None
+        self.client = None
+
     def __del__(self):
         with logger.begin_event("Deleting Llama CPP server...") as ctx:
             self.stop_server()
@@ -85,6 +164,9 @@ class LlamaCppExecutableOpenAIClient:
                 ctx.log("Server already exists - reusing server instance.")
                 return
 
+            if self.client is None:
+                self._make_client()
+
             # Weird escaping because of shell=True (do we even need that?).
             # Partly vibe coded because let's be real nobody wants to figure out this Python-CMD escaping business.
             dry_n_breaker = "\\n"
@@ -99,8 +181,8 @@ class LlamaCppExecutableOpenAIClient:
                 self.host,
                 "--port",
                 str(self.port),
-                "-c", # Context size (equivalent to n_ctx)
-                str(self.n_context),
+                "-c", # Context size (equivalent to n_ctx) - shared by all slots.
+                str(self.n_context * self.n_parallel),
                 # "--mmap",
                 "--mlock", # Lock model in memory
                 # --- Sampling Parameters (replicating your llama-cpp-python settings) ---
@@ -143,8 +225,11 @@ class LlamaCppExecutableOpenAIClient:
                 command.append("--mmproj")
                 command.append(self.mmproj)
 
-            # To ensure only 1 slot is used with new llama-cpp server versions.
-            command.append("-kvu")
+            # To ensure only 1 slot is used with new llama-cpp server versions (unless parallel decoding was asked for).
+            # With more slots, the KV cache is NOT unified - so "-c" is split evenly and each slot is guaranteed its own n_context.
+            if self.n_parallel == 1:
+                command.append("-kvu")
+            command.extend(["-np", str(self.n_parallel)])
 
             if self.embedding:
                 command = [
@@ -286,6 +371,8 @@ class LlamaCppExecutableOpenAIClient:
             else:
                 ctx.log("Server is not running - doing nothing.")
 
+            self._close_client()
+
             if self.hJob:
                 try_print(f"Closing Job Object handle {self.hJob}.")
                 win32api.CloseHandle(self.hJob)
@@ -294,11 +381,46 @@ class LlamaCppExecutableOpenAIClient:
     def get_model_name(self):
         return self.model_path.split(os.sep)[-1] # Just the model name (e.g., "my_model.gguf")
 
-    async def single_async_call(self, messages, use_stream = None, max_completion_tokens = NOT_GIVEN, return_source_on_error = False):
+    def _get_extra_body(self, id_slot = None):
+        body = dict(self.extra_body)
+
+        if id_slot is not None:
+            # Pin the request to a slot, and let it reuse whatever prompt that slot processed last.
+            body["id_slot"] = id_slot
+            body["cache_prompt"] = True
+
+        return body if len(body) > 0 else None
+
+    def _record_prompt_usage(self, response, id_slot = None):
+        # llama-server adds its own "timings" to the response: prompt_n = prompt tokens evaluated, cache_n = prompt tokens reused from the KV cache.
+        timings = getattr(response, "timings", None)
+        if not isinstance(timings, dict):
+            return
+
+        evaluated = timings.get("prompt_n", 0) or 0
+        reused = timings.get("cache_n", 0) or 0
+
+        self.prompt_stats["n_requests"] += 1
+        self.prompt_stats["prompt_tokens_evaluated"] += evaluated
+        self.prompt_stats["prompt_tokens_reused"] += reused
+
+        logger.log_message("Prompt tokens evaluated vs reused", id_slot=id_slot, prompt_tokens_evaluated=evaluated, prompt_tokens_reused=reused)
+
+    def get_prompt_stats(self):
+        stats = dict(self.prompt_stats)
+
+        n_prompt_tokens = stats["prompt_tokens_evaluated"] + stats["prompt_tokens_reused"]
+        stats["reused_ratio"] = (stats["prompt_tokens_reused"] / n_prompt_tokens) if n_prompt_tokens > 0 else 0.0
+
+        return stats
+
+    async def single_async_call(self, messages, use_stream = None, max_completion_tokens = NOT_GIVEN, return_source_on_error = False, id_slot = None):
         """
         Calls the llama.cpp server using the OpenAI client for chat completion.
         Messages should be in OpenAI chat format:
         [{"role": "user", "content": "Hello!"}]
+
+        id_slot: If given, the request is pinned to that server slot (with prompt caching on).
         """
 
         try:
@@ -308,6 +430,7 @@ class LlamaCppExecutableOpenAIClient:
                 messages = messages + [{"role": "assistant", "content": self.prepend_phrase}]
 
             model_name = self.get_model_name()
+            extra_body = self._get_extra_body(id_slot)
 
             prediction = ""
             if use_stream is not None:
@@ -319,14 +442,17 @@ class LlamaCppExecutableOpenAIClient:
                     temperature=0.02,
                     stop=self.stop,
                     max_completion_tokens=max_completion_tokens,
-                    extra_body=self.extra_body if len(self.extra_body) > 0 else None,
+                    extra_body=extra_body,
                 )
 
                 async for chunk in stream_response:
+                    self._record_prompt_usage(chunk, id_slot) # Only the last chunk has timings.
+
                     try:
                         new_word = chunk.choices[0].delta.content or ""
                         if new_word:
-                            use_stream.put(new_word, already_detokenized=True)
+                            # put() can run postprocessing (like the shortener) that makes blocking LLM calls of its own - so it can't run on the loop thread.
+                            await loop.run_in_executor(None, lambda: use_stream.put(new_word, already_detokenized=True))
                             prediction += new_word
                     except Exception as e:
                         # First entry has nothing, as does last (usually).
@@ -340,10 +466,12 @@ class LlamaCppExecutableOpenAIClient:
                     stream=False,
                     temperature=0.02,
                     stop=self.stop,
-                    extra_body=self.extra_body if len(self.extra_body) > 0 else None,
+                    extra_body=extra_body,
                     max_completion_tokens=max_completion_tokens,
                 )
                 prediction = completion.choices[0].message.content
+
+                self._record_prompt_usage(completion, id_slot)
         except Exception as err:
             logger.info("An error happened while translating/OCR'ing!")
             logger.error(err)
@@ -362,8 +490,31 @@ class LlamaCppExecutableOpenAIClient:
 
         return predictions
 
+    async def slot_chain_async(self, id_slot: int, chain_inputs, return_source_on_error = False):
+        # One after another on the same slot - so each request can reuse the prompt of the one before it.
+        predictions = []
+        for messages in chain_inputs:
+            predictions.append(await self.single_async_call(messages, return_source_on_error=return_source_on_error, id_slot=id_slot))
+
+        return predictions
+
+    async def slots_async(self, slot_inputs, return_source_on_error = False):
+        tasks = [self.slot_chain_async(id_slot, chain_inputs, return_source_on_error) for id_slot, chain_inputs in enumerate(slot_inputs)]
+        return await asyncio.gather(*tasks)
+
+    def call_llm_on_slots(self, slot_inputs, return_source_on_error = False):
+        """
+        slot_inputs = a list with (at most) one item per server slot. Each item is a list of messages to run on that slot, in order.
+
+        Returns the predictions in the same shape.
+        """
+        if len(slot_inputs) > self.n_parallel:
+            raise ValueError(f"Got {len(slot_inputs)} slot inputs but the server only has {self.n_parallel} slots.")
+
+        return run_in_loop(self.slots_async(slot_inputs, return_source_on_error))
+
     def call_llm(self, batch_inputs, use_stream = None, max_completion_tokens = NOT_GIVEN, return_source_on_error = False):
-        predictions = loop.run_until_complete(self.batch_async(batch_inputs, use_stream, max_completion_tokens, return_source_on_error))
+        predictions = run_in_loop(self.batch_async(batch_inputs, use_stream, max_completion_tokens, return_source_on_error))
         return predictions
 
     def call_llm_no_batch(self, messages, use_stream = None):
@@ -381,7 +532,7 @@ class LlamaCppExecutableOpenAIClient:
         return response.data[0].embedding
     
     def call_embed_no_batch(self, msg: str):
-        emb = loop.run_until_complete(self.embed_async(msg))
+        emb = run_in_loop(self.embed_async(msg))
         return emb
     
     async def embed_batch_async(self, msgs):
@@ -391,5 +542,5 @@ class LlamaCppExecutableOpenAIClient:
         return [data.embedding for data in response.data]
 
     def call_embed_with_batch(self, msg: str):
-        emb = loop.run_until_complete(self.embed_batch_async(msg))
+        emb = run_in_loop(self.embed_batch_async(msg))
         return emb
\ No newline at end of file
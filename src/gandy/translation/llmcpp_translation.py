@@ -10,6 +10,7 @@ from typing import List
 import os
 from gandy.utils.clean_text_v2 import clean_text_vq
 from gandy.utils.find_free_port import find_tcp_port
+from gandy.translation.prefix_scheduler import schedule_by_prefix
 
 class LlmCppTranslationApp(BaseTranslation):
     def __init__(
@@ -37,6 +38,9 @@ class LlmCppTranslationApp(BaseTranslation):
     
     def get_server_port(self):
         return find_tcp_port()
+
+    def get_n_parallel(self):
+        return max(1, config_state.translation_parallel_slots)
     
     def get_can_cuda(self):
         can_cuda = config_state.use_cuda and not config_state.force_translation_cpu
@@ -74,6 +78,7 @@ class LlmCppTranslationApp(BaseTranslation):
             stop=self.get_stop_words(),
             extra_commands=extra_commands,
             extra_body=extra_body,
+            n_parallel=self.get_n_parallel(),
         )
 
         self.llm.start_server()
@@ -164,7 +169,10 @@ class LlmCppTranslationApp(BaseTranslation):
         batch_inputs = [self.create_messages(inp) for inp in inputs]
 
         with logger.begin_event("Feeding to LLM") as ctx:
-            predictions = self.llm.call_llm_with_batch(batch_inputs, return_source_on_error=True)
+            if config_state.prefix_aware_scheduling:
+                predictions = self.batch_translate_on_slots(inputs, batch_inputs, ctx)
+            else:
+                predictions = self.llm.call_llm_with_batch(batch_inputs, return_source_on_error=True)
 
         ctx.log(
             f"Translated batch",
@@ -174,6 +182,30 @@ class LlmCppTranslationApp(BaseTranslation):
 
         return predictions
     
+    def batch_translate_on_slots(self, inputs: List[str], batch_inputs, ctx):
+        # Context-chained texts go to the same slot in order, so they can reuse each other's prompt.
+        slot_indices = [indices for indices in schedule_by_prefix(inputs, self.llm.n_parallel, self.remap_input_with_contexts) if len(indices) > 0]
+
+        stats_before = self.llm.get_prompt_stats()
+        slot_predictions = self.llm.call_llm_on_slots(
+            [[batch_inputs[idx] for idx in indices] for indices in slot_indices], return_source_on_error=True,
+        )
+        stats_after = self.llm.get_prompt_stats()
+
+        predictions = ["" for _ in inputs]
+        for indices, preds in zip(slot_indices, slot_predictions):
+            for idx, pred in zip(indices, preds):
+                predictions[idx] = pred
+
+        ctx.log(
+            "Translated batch on pinned slots",
+            slot_indices=slot_indices,
+            prompt_tokens_evaluated=stats_after["prompt_tokens_evaluated"] - stats_before["prompt_tokens_evaluated"],
+            prompt_tokens_reused=stats_after["prompt_tokens_reused"] - stats_before["prompt_tokens_reused"],
+        )
+
+        return predictions
+
     def misc_postprocess(self, output: str):
         output = output.replace("\\'", "'")
 
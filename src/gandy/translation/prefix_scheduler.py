@@ -0,0 +1,53 @@
+from typing import List
+
+# With packed context, each text on a page is "<previous texts> <TSOS> <current text>" - so consecutive texts share most of their prompt.
+# llama-server can only reuse that shared prompt (KV cache) if the next request lands on the same slot as the previous one.
+# This groups context-chained texts and pins each group to one slot, keeping the order within the group.
+
+def find_context_chains(inputs: List[str], split_input):
+    """
+    Returns a list of chains - each chain is a list of input indices, in order.
+
+    split_input: Given an input, returns (current text, contexts) - e.g: LlmCppTranslationApp.remap_input_with_contexts.
+    An input continues the chain of the previous input if its last context is the previous input's text.
+    """
+    chains = []
+    prev_text = None
+
+    for idx, inp in enumerate(inputs):
+        cur_text, contexts = split_input(inp)
+
+        if len(chains) > 0 and len(contexts) > 0 and contexts[-1] == prev_text:
+            chains[-1].append(idx)
+        else:
+            chains.append([idx])
+
+        prev_text = cur_text.strip()
+
+    return chains
+
+def schedule_by_prefix(inputs: List[str], n_slots: int, split_input):
+    """
+    Returns a list with n_slots items - each is the list of input indices that slot should process, in order.
+    """
+    n_slots = max(1, n_slots)
+    chains = find_context_chains(inputs, split_input)
+
+    # One long chain would leave the other slots idle - split the longest chains until every slot can get one.
+    # The first item of a split-off piece has to prefill its prompt from scratch, but that's still much cheaper than waiting.
+    while len(chains) < n_slots:
+        longest_idx = max(range(len(chains)), key=lambda i: len(chains[i])) if len(chains) > 0 else None
+        if longest_idx is None or len(chains[longest_idx]) < 2:
+            break
+
+        longest = chains[longest_idx]
+        half = len(longest) // 2
+        chains[longest_idx:longest_idx + 1] = [longest[:half], longest[half:]]
+
+    # Longest chains first, each to the least busy slot. Chains on the same slot run one after another.
+    slots = [[] for _ in range(n_slots)]
+    for chain in sorted(chains, key=lambda c: -len(c)):
+        least_busy = min(range(n_slots), key=lambda i: len(slots[i]))
+        slots[least_busy].extend(chain)
+
+    return slots
@@ -0,0 +1,129 @@
+import numpy as np
+from gandy.utils.tnms import tnms as nms # Greedy NMS - vectorized per step, and never builds the pair matrix (YOLO gives 8400 candidates).
+
+# Shared NumPy box utilities for detection postprocessing. Boxes are always (x1, y1, x2, y2).
+# Line models (e.g: dfine_line_emassive) can give hundreds of boxes per page - the old pure-Python pair loops got slow there.
+
+def as_boxes(boxes):
+    """
+    Returns the boxes as a new float64 array of shape [N, 4]. Extra items (e.g: tmp data after the coords) are dropped.
+    """
+    if isinstance(boxes, np.ndarray):
+        return np.array(boxes[:, :4], dtype=np.float64) if boxes.size > 0 else np.empty((0, 4))
+
+    if len(boxes) == 0:
+        return np.empty((0, 4))
+
+    return np.array([b[:4] for b in boxes], dtype=np.float64)
+
+def box_areas(boxes: np.ndarray):
+    return (boxes[:, 2] - boxes[:, 0]) * (boxes[:, 3] - boxes[:, 1])
+
+def intersection_matrix(boxes_a: np.ndarray, boxes_b: np.ndarray):
+    """
+    [Na, Nb] matrix of intersection areas.
+    """
+    x1 = np.maximum(boxes_a[:, None, 0], boxes_b[None, :, 0])
+    y1 = np.maximum(boxes_a[:, None, 1], boxes_b[None, :, 1])
+    x2 = np.minimum(boxes_a[:, None, 2], boxes_b[None, :, 2])
+    y2 = np.minimum(boxes_a[:, None, 3], boxes_b[None, :, 3])
+
+    return np.clip(x2 - x1, 0, None) * np.clip(y2 - y1, 0, None)
+
+def _safe_divide(num: np.ndarray, denom: np.ndarray):
+    out = np.zeros(np.broadcast(num, denom).shape, dtype=np.float64)
+    np.divide(num, denom, out=out, where=denom != 0)
+    return out
+
+def iou_matrix(boxes_a: np.ndarray, boxes_b: np.ndarray):
+    """
+    [Na, Nb] matrix of IoUs.
+    """
+    inter = intersection_matrix(boxes_a, boxes_b)
+    union = box_areas(boxes_a)[:, None] + box_areas(boxes_b)[None, :] - inter
+
+    return _safe_divide(inter, union)
+
+def paired_iou(boxes_a: np.ndarray, boxes_b: np.ndarray):
+    """
+    [N] IoU of each box in boxes_a with the box at the same index in boxes_b.
+    """
+    w = np.clip(np.minimum(boxes_a[:, 2], boxes_b[:, 2]) - np.maximum(boxes_a[:, 0], boxes_b[:, 0]), 0, None)
+    h = np.clip(np.minimum(boxes_a[:, 3], boxes_b[:, 3]) - np.maximum(boxes_a[:, 1], boxes_b[:, 1]), 0, None)
+    inter = w * h
+
+    return _safe_divide(inter, box_areas(boxes_a) + box_areas(boxes_b) - inter)
+
+def containment_matrix(boxes_a: np.ndarray, boxes_b: np.ndarray):
+    """
+    [Na, Nb] matrix where [i, j] = How much of boxes_b[j] is inside boxes_a[i] (intersection / area of b).
+    """
+    inter = intersection_matrix(boxes_a, boxes_b)
+    return _safe_divide(inter, np.abs(box_areas(boxes_b))[None, :])
+
+def touching_matrix(boxes_a: np.ndarray, boxes_b: np.ndarray):
+    """
+    [Na, Nb] bool matrix - True if the boxes overlap or touch (edges included).
+    """
+    return (
+        (boxes_a[:, None, 2] >= boxes_b[None, :, 0]) & (boxes_b[None, :, 2] >= boxes_a[:, None, 0])
+        & (boxes_a[:, None, 3] >= boxes_b[None, :, 1]) & (boxes_b[None, :, 3] >= boxes_a[:, None, 1])
+    )
+
+def filter_contained(boxes: np.ndarray, thr: float):
+    """
+    Returns the indices of the boxes that are NOT at least thr inside some other box.
+    """
+    contained = containment_matrix(boxes, boxes) >= thr # [i, j] = j is in i
+    np.fill_diagonal(contained, False)
+
+    return np.flatnonzero(~contained.any(axis=0))
+
+def _find(parents: np.ndarray, i: int):
+    while parents[i] != i:
+        parents[i] = parents[parents[i]]
+        i = parents[i]
+    return i
+
+def connected_groups(adjacency: np.ndarray):
+    """
+    Union-find over a symmetric bool [N, N] matrix. Returns a list of index groups (each sorted, groups ordered by their first index).
+    """
+    n = adjacency.shape[0]
+    parents = np.arange(n)
+
+    for i, j in zip(*np.nonzero(np.triu(adjacency, k=1))):
+        root_i, root_j = _find(parents, i), _find(parents, j)
+        if root_i != root_j:
+            parents[max(root_i, root_j)] = min(root_i, root_j)
+
+    groups = {}
+    for i in range(n):
+        groups.setdefault(_find(parents, i), []).append(i)
+
+    return list(groups.values())
+
+def merge_boxes(boxes: np.ndarray, should_merge, max_rounds=100):
+    """
+    Repeatedly merges groups of connected boxes into their union box until nothing changes.
+
+    should_merge: Given the boxes [N, 4], returns a bool [N, N] matrix of pairs to merge.
+    A merged box can grow into new boxes, hence the rounds.
+    """
+    for _ in range(max_rounds):
+        if boxes.shape[0] < 2:
+            break
+
+        adjacency = should_merge(boxes)
+        adjacency = adjacency | adjacency.T
+        np.fill_diagonal(adjacency, False)
+
+        if not adjacency.any():
+            break
+
+        groups = connected_groups(adjacency)
+        boxes = np.array([
+            [boxes[g, 0].min(), boxes[g, 1].min(), boxes[g, 2].max(), boxes[g, 3].max()] for g in groups
+        ], dtype=np.float64)
+
+    return boxes
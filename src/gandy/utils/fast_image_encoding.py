@@ -0,0 +1,85 @@
+import base64
+import struct
+import threading
+import numpy as np
+import cv2
+from io import BytesIO
+from PIL import Image
+
+# Encoding many small line crops as default PNGs (zlib level 6 + base64) was a big part of OCR latency on CPU.
+# The server decodes anything stb_image can read - so a raw BMP (no compression at all) or a fast PNG works just as well.
+#
+# "png" = Same as before (PIL, default compression).
+# "png_fast" = PNG with the fastest zlib level.
+# "bmp" = Uncompressed 24-bit BMP, written straight into a reused buffer. Biggest payload but almost no CPU.
+
+ENCODING_FORMATS = ["png", "png_fast", "bmp"]
+
+_BMP_HEADER_SIZE = 14 + 40 # File header + BITMAPINFOHEADER.
+
+_thread_buffers = threading.local()
+
+def _to_rgb(image: np.ndarray):
+    if image.ndim == 2:
+        return np.stack([image, image, image], axis=-1)
+    if image.shape[2] == 4:
+        return image[:, :, :3]
+    return image
+
+def _get_buffer(size: int):
+    # One buffer per thread, only ever grown - OCR calls can come from a few threads at once.
+    buf = getattr(_thread_buffers, "buf", None)
+    if buf is None or len(buf) < size:
+        buf = bytearray(max(size, 1 << 16))
+        _thread_buffers.buf = buf
+
+    return buf
+
+def encode_bmp(image: np.ndarray):
+    """
+    Returns a memoryview of the BMP bytes. It points to a reused buffer, so it's only valid until the next call on this thread.
+    """
+    image = _to_rgb(image)
+    h, w = image.shape[:2]
+
+    row_stride = ((w * 3) + 3) & ~3 # Rows are padded to 4 bytes.
+    pixel_size = row_stride * h
+    file_size = _BMP_HEADER_SIZE + pixel_size
+
+    buf = _get_buffer(file_size)
+
+    struct.pack_into('<2sIHHI', buf, 0, b'BM', file_size, 0, 0, _BMP_HEADER_SIZE)
+    # Negative height = rows are stored top to bottom, so no flip is needed.
+    struct.pack_into('<IiiHHIIiiII', buf, 14, 40, w, -h, 1, 24, 0, pixel_size, 2835, 2835, 0, 0)
+
+    pixels = np.frombuffer(buf, dtype=np.uint8, count=pixel_size, offset=_BMP_HEADER_SIZE).reshape(h, row_stride)
+    pixels[:, :w * 3].reshape(h, w, 3)[:] = image[:, :, ::-1] # RGB to BGR.
+    if row_stride != w * 3:
+        pixels[:, w * 3:] = 0
+
+    return memoryview(buf)[:file_size]
+
+def encode_png_fast(image: np.ndarray):
+    image = _to_rgb(image)
+
+    ok, encoded = cv2.imencode('.png', np.ascontiguousarray(image[:, :, ::-1]), [cv2.IMWRITE_PNG_COMPRESSION, 1])
+    if not ok:
+        raise RuntimeError("Failed to encode image as PNG.")
+
+    return encoded.data
+
+def encode_png(image: np.ndarray):
+    buffer = BytesIO()
+    Image.fromarray(image).save(buffer, format="PNG")
+
+    return buffer.getbuffer()
+
+def image_to_data_url(image: np.ndarray, encoding: str = "png"):
+    if encoding == "bmp":
+        data, mime = encode_bmp(image), "bmp"
+    elif encoding == "png_fast":
+        data, mime = encode_png_fast(image), "png"
+    else:
+        data, mime = encode_png(image), "png"
+
+    return f"data:image/{mime};base64,{base64.b64encode(data).decode('ascii')}"
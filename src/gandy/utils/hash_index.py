@@ -0,0 +1,95 @@
+import numpy as np
+
+# Bit-packed perceptual hashes (np.packbits) and a searchable store of them.
+
+# Number of set bits in every byte value - indexing this with the XOR of two packed hashes counts their differing bits without unpacking them.
+POPCOUNT_TABLE = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+# Max bytes of hashes compared at once in HashIndex.find - keeps the temporary XOR arrays small for big hashes.
+BLOCK_BYTES = 1 << 20
+
+def hamming_distances(packed_hashes: np.ndarray, packed_hash: np.ndarray):
+    """
+    [N, B] packed hashes vs one [B] packed hash -> [N] number of differing bits.
+    """
+    return POPCOUNT_TABLE[np.bitwise_xor(packed_hashes, packed_hash[None, :])].sum(axis=1, dtype=np.int64)
+
+class HashIndex():
+    """
+    The last max_size packed hashes (all the same length) and a value for each, searchable by Hamming distance.
+
+    Exact matches are a dict lookup. Otherwise every stored hash is compared at once (in blocks) with a popcount table.
+    """
+    def __init__(self, max_size: int = 2048):
+        self.max_size = max_size
+
+        self.hashes: np.ndarray = None # [max_size, B] - allocated on the first add, once the hash length is known.
+        self.values = [None] * max_size
+        self.exact = {} # Hash bytes -> row.
+
+        self.size = 0
+        self.next_row = 0 # Rows are reused oldest first once full.
+
+    def __len__(self):
+        return self.size
+
+    def add(self, packed_hash: np.ndarray, value):
+        if self.hashes is None:
+            self.hashes = np.zeros((self.max_size, packed_hash.shape[0]), dtype=np.uint8)
+
+        row = self.next_row
+
+        if self.size == self.max_size:
+            old_key = self.hashes[row].tobytes()
+            if self.exact.get(old_key) == row:
+                del self.exact[old_key]
+
+        self.hashes[row] = packed_hash
+        self.values[row] = value
+        self.exact[packed_hash.tobytes()] = row
+
+        self.next_row = (row + 1) % self.max_size
+        self.size = min(self.size + 1, self.max_size)
+
+    def find(self, packed_hash: np.ndarray, max_distance: int = 0, confirm=None):
+        """
+        Returns (value, distance) for the closest stored hash within max_distance bits, else (None, closest distance or None if empty).
+
+        confirm (optional): Given a stored value, returns False if it's not actually a match (e.g: a hash collision). Matches are then tried closest first.
+        """
+        if self.size == 0:
+            return None, None
+
+        row = self.exact.get(packed_hash.tobytes())
+        if row is not None and (confirm is None or confirm(self.values[row])):
+            return self.values[row], 0
+
+        if max_distance <= 0:
+            return None, None # Not worth scanning just for logging.
+
+        block_rows = max(1, BLOCK_BYTES // self.hashes.shape[1])
+
+        best_distance = None
+        candidates = [] # (distance, row)
+        for start in range(0, self.size, block_rows):
+            distances = hamming_distances(self.hashes[start:min(start + block_rows, self.size)], packed_hash)
+
+            block_best = int(distances.min())
+            if best_distance is None or block_best < best_distance:
+                best_distance = block_best
+
+            close = np.flatnonzero(distances <= max_distance)
+            candidates.extend(zip(distances[close].tolist(), (close + start).tolist()))
+
+        # Ties go to the lowest row, same as argmin.
+        for distance, row in sorted(candidates):
+            if confirm is None or confirm(self.values[row]):
+                return self.values[row], distance
+
+        return None, best_distance
+
+    def clear(self):
+        self.values = [None] * self.max_size
+        self.exact.clear()
+        self.size = 0
+        self.next_row = 0
@@ -1,5 +1,5 @@
 from PIL import Image
-from gandy.utils.filter_out_overlapping_bboxes import box_b_in_box_a_thr
+from gandy.utils.box_ops import as_boxes, containment_matrix, merge_boxes
 from gandy.utils.speech_bubble import SpeechBubble
 from gandy.state.debug_state import debug_state
 from typing import List
@@ -56,10 +56,11 @@ def merge_and_validate(speech_bboxes: List[SpeechBubble], idx: int, condition):
     
   return speech_bboxes, False
 
-def detect_image_chunks(img: Image.Image, tile_width: int, tile_height: int, detect_in_chunk):
+def detect_image_chunks(img: Image.Image, tile_width: int, tile_height: int, detect_in_chunk, detect_in_chunks=None):
   # tile_width/tile_height = int from [0, 100]. 50 would mean 50%.
   # Returns a list of split image chunks.
   # NOTE: Ensure this does NOT run on tile width 100 and height 100.
+  # detect_in_chunks (optional) = Given a list of tiles, returns a list of boxes for each - so all the tiles can go through the model together.
 
   chunk_x = ceil(img.width * (tile_width / 100))
   chunk_y = ceil(img.height * (tile_height / 100))
@@ -70,6 +71,9 @@ def detect_image_chunks(img: Image.Image, tile_width: int, tile_height: int, det
 
   speech_bboxes: List[SpeechBubble] = []
 
+  img_tiles: List[Image.Image] = []
+  tile_offsets = []
+
   if debug_state.debug:
     os.makedirs('./debugdumps/tiles', exist_ok=True)
     debug_id = uuid4().hex
@@ -99,14 +103,20 @@ def detect_image_chunks(img: Image.Image, tile_width: int, tile_height: int, det
       if debug_state.debug:
         img_tile.save(f'./debugdumps/tiles/{debug_id}__{x}_{y}.png')
 
-      chunked_speech_bboxes: List[SpeechBubble] = detect_in_chunk(img_tile)
+      img_tiles.append(img_tile)
+      tile_offsets.append((crop_x1, crop_y1))
 
-      # Offset.
-      # chunked_speech_bboxes = [[s[0] + start_x, s[1] + start_y, s[2] + start_x, s[3] + start_y] for s in chunked_speech_bboxes]
-      chunked_speech_bboxes = [[s[0] + crop_x1, s[1] + crop_y1, s[2] + crop_x1, s[3] + crop_y1] for s in chunked_speech_bboxes]
-      speech_bboxes.extend(chunked_speech_bboxes)
+  # Process each img; get speech_bboxes.
+  if detect_in_chunks is not None:
+    all_chunked_speech_bboxes = detect_in_chunks(img_tiles)
+  else:
+    all_chunked_speech_bboxes = [detect_in_chunk(img_tile) for img_tile in img_tiles]
 
-      # Process each img; get speech_bboxes.
+  for chunked_speech_bboxes, (crop_x1, crop_y1) in zip(all_chunked_speech_bboxes, tile_offsets):
+    # Offset.
+    # chunked_speech_bboxes = [[s[0] + start_x, s[1] + start_y, s[2] + start_x, s[3] + start_y] for s in chunked_speech_bboxes]
+    chunked_speech_bboxes = [[s[0] + crop_x1, s[1] + crop_y1, s[2] + crop_x1, s[3] + crop_y1] for s in chunked_speech_bboxes]
+    speech_bboxes.extend(chunked_speech_bboxes)
 
 
   # Iterate over every box.
@@ -156,24 +166,8 @@ def detect_image_chunks(img: Image.Image, tile_width: int, tile_height: int, det
     if can_break:
       break
 
-  # iterate over every box.
-  # if box overlaps another, merge it, removing it from the list before repeating.
-  failsafe_max_n = 0
-  while failsafe_max_n < 4000:
-    failsafe_max_n += 1
-    can_break = True
-
-    for idx in range(len(speech_bboxes)):
-      speech_bboxes, did_merge = merge_and_validate(speech_bboxes, idx, condition=lambda b, o: box_b_in_box_a_thr(box_a=b, box_b=o) >= 0.3)
-      if did_merge:
-        can_break = False
-        break
-
-    if can_break:
-      break
-
-
-  speech_bboxes = [s[:-1] for s in speech_bboxes] # Remove tmp_data.
+  # If a box overlaps another (at least 30% of one inside the other), merge them - until no boxes overlap.
+  merged_bboxes = merge_boxes(as_boxes(speech_bboxes), should_merge=lambda boxes: containment_matrix(boxes, boxes) >= 0.3)
 
-  return speech_bboxes
+  return merged_bboxes.tolist()
   
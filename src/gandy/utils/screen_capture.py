@@ -0,0 +1,322 @@
+import threading
+import time
+import cv2
+import numpy as np
+from PIL import Image
+from gandy.utils.fancy_logger import logger
+
+# Screen capture for the task3 background watchers (and one-off grabs like the lens scan).
+# Each watched box used to grab its own region (+ convert to gray + blur, all freshly allocated full size arrays) every tick - so watching N boxes cost N grabs.
+# Now one capture thread per monitor grabs its watched boxes once per tick - boxes close together share one grab of the area covering them (see group_regions).
+# Each box's subscription converts its part into preallocated buffers.
+# Change detection only needs a rough picture, so subscriptions also keep a downsampled (and blurred) copy.
+
+class MssFrameSource():
+    """
+    Grabs from the actual screen. An mss instance can't be shared between threads - create one source per thread.
+    """
+    def __init__(self):
+        import mss # Not needed for the synthetic source.
+
+        self.sct = mss.mss()
+
+    def get_monitors(self):
+        # monitors[0] is every monitor combined.
+        return [dict(m) for m in self.sct.monitors[1:]]
+
+    def grab(self, region):
+        """
+        region = mss style dict (left, top, width, height). Returns a BGRA [H, W, 4] view over the grabbed data - only valid until the next grab.
+        """
+        shot = self.sct.grab(region)
+        return np.frombuffer(shot.raw, dtype=np.uint8).reshape(shot.height, shot.width, 4)
+
+    def close(self):
+        self.sct.close()
+
+class SyntheticFrameSource():
+    """
+    A fake screen, for testing without a display (e.g: on Linux).
+
+    draw_fn(n_grabs, canvas): Called before each grab to draw into the BGRA canvas [H, W, 4].
+    """
+    def __init__(self, width=1920, height=1080, draw_fn=None):
+        self.canvas = np.zeros((height, width, 4), dtype=np.uint8)
+        self.canvas[:, :, 3] = 255
+        self.draw_fn = draw_fn
+
+        self.n_grabs = 0
+
+    def get_monitors(self):
+        return [{ "left": 0, "top": 0, "width": self.canvas.shape[1], "height": self.canvas.shape[0], }]
+
+    def grab(self, region):
+        if self.draw_fn is not None:
+            self.draw_fn(self.n_grabs, self.canvas)
+        self.n_grabs += 1
+
+        # Copied like a real grab - so the cost grows with the grabbed area.
+        x1, y1 = max(0, region["left"]), max(0, region["top"])
+        return self.canvas[y1:(region["top"] + region["height"]), x1:(region["left"] + region["width"])].copy()
+
+    def close(self):
+        pass
+
+def grab_rgb_image(region, source_factory=MssFrameSource):
+    """
+    One-off grab of a region as a PIL RGB image.
+    """
+    source = source_factory()
+    try:
+        bgra = source.grab(region)
+        return Image.fromarray(cv2.cvtColor(bgra, cv2.COLOR_BGRA2RGB))
+    finally:
+        source.close()
+
+def get_monitors(source_factory=MssFrameSource):
+    source = source_factory()
+    try:
+        return source.get_monitors()
+    finally:
+        source.close()
+
+class CaptureSubscription():
+    def __init__(self, region, downsample=2):
+        """
+        region = mss style dict (left, top, width, height) of a watched box.
+        """
+        self.region = region
+
+        w, h = region["width"], region["height"]
+        self.small_size = (max(1, w // downsample), max(1, h // downsample)) # (W, H) for cv2.
+
+        # Written by the capture thread only - readers get copies.
+        self.gray = np.zeros((h, w), dtype=np.uint8)
+        self._resized = np.zeros((self.small_size[1], self.small_size[0]), dtype=np.uint8)
+        self.small = np.zeros_like(self._resized)
+
+        self.monitor_idx = None
+        self.seq = 0 # Number of frames captured so far.
+        self.closed = False
+        self.cond = threading.Condition()
+
+    def _update(self, bgra: np.ndarray):
+        with self.cond:
+            cv2.cvtColor(bgra, cv2.COLOR_BGRA2GRAY, dst=self.gray)
+            cv2.resize(self.gray, self.small_size, dst=self._resized, interpolation=cv2.INTER_AREA)
+            cv2.GaussianBlur(self._resized, (3, 3), 0, dst=self.small)
+
+            self.seq += 1
+            self.cond.notify_all()
+
+    def read_small(self, out: np.ndarray = None, after_seq=0, timeout=1.0):
+        """
+        Copies the newest downsampled & blurred gray frame into out (allocated if None). Waits (up to timeout) for a frame newer than after_seq.
+
+        Returns (frame, seq).
+        """
+        with self.cond:
+            self.cond.wait_for(lambda: self.seq > after_seq or self.closed, timeout=timeout)
+
+            if out is None:
+                out = np.empty_like(self.small)
+            np.copyto(out, self.small)
+
+            return out, self.seq
+
+    def read_gray(self):
+        """
+        Copy of the newest full size gray frame.
+        """
+        with self.cond:
+            return self.gray.copy()
+
+    def close(self):
+        with self.cond:
+            self.closed = True
+            self.cond.notify_all()
+
+def covering_region(regions):
+    left = min(r["left"] for r in regions)
+    top = min(r["top"] for r in regions)
+    right = max(r["left"] + r["width"] for r in regions)
+    bottom = max(r["top"] + r["height"] for r in regions)
+
+    return { "left": left, "top": top, "width": right - left, "height": bottom - top, }
+
+def _region_area(region):
+    return region["width"] * region["height"]
+
+# Regions are only grabbed together if the covering area is at most this much bigger than the regions themselves.
+# Otherwise two small boxes in opposite corners would cost a grab of (almost) the whole monitor every tick.
+MAX_COVERING_AREA_RATIO = 1.5
+
+def group_regions(regions, max_area_ratio=MAX_COVERING_AREA_RATIO):
+    """
+    Returns a list of (covering region, indices of the regions it covers). Each region is in exactly one group.
+    """
+    groups = [(r, [idx], _region_area(r)) for idx, r in enumerate(regions)] # (covering region, indices, summed area)
+
+    merged = True
+    while merged and len(groups) > 1:
+        merged = False
+
+        # Merge the pair that wastes the least area, as long as it's within the ratio.
+        best = None
+        for i in range(len(groups)):
+            for j in range(i + 1, len(groups)):
+                covering = covering_region([groups[i][0], groups[j][0]])
+                ratio = _region_area(covering) / max(1, groups[i][2] + groups[j][2])
+
+                if ratio <= max_area_ratio and (best is None or ratio < best[0]):
+                    best = (ratio, i, j, covering)
+
+        if best is not None:
+            _, i, j, covering = best
+            groups[i] = (covering, groups[i][1] + groups[j][1], groups[i][2] + groups[j][2])
+            del groups[j]
+            merged = True
+
+    return [(covering, sorted(indices)) for covering, indices, _ in groups]
+
+def capture_tick(source, subs):
+    """
+    Grabs every subscription's region (shared grabs for close regions) and updates them. Returns the number of grabs made.
+    """
+    groups = group_regions([s.region for s in subs])
+
+    for region, indices in groups:
+        bgra = source.grab(region)
+
+        for idx in indices:
+            s = subs[idx]
+            x1 = s.region["left"] - region["left"]
+            y1 = s.region["top"] - region["top"]
+            s._update(bgra[y1:(y1 + s.region["height"]), x1:(x1 + s.region["width"])])
+
+    return len(groups)
+
+class MonitorCapture():
+    def __init__(self, monitor_idx: int, source_factory, interval: float):
+        self.monitor_idx = monitor_idx
+        self.source_factory = source_factory
+        self.interval = interval
+
+        self.subscriptions = []
+        self.lock = threading.Lock()
+
+        self.n_ticks = 0
+        self.n_grabs = 0
+        self.grab_time = 0.0 # Summed over all ticks.
+
+        self._stop_event = threading.Event()
+        self._thread = threading.Thread(target=self._capture_loop, daemon=True)
+        self._thread.start()
+
+    def add(self, sub: CaptureSubscription):
+        with self.lock:
+            self.subscriptions.append(sub)
+
+    def remove(self, sub: CaptureSubscription):
+        # Returns True if no subscriptions are left.
+        with self.lock:
+            if sub in self.subscriptions:
+                self.subscriptions.remove(sub)
+            return len(self.subscriptions) == 0
+
+    def _capture_loop(self):
+        source = self.source_factory()
+
+        try:
+            while not self._stop_event.is_set():
+                start = time.perf_counter()
+
+                with self.lock:
+                    subs = list(self.subscriptions)
+
+                if len(subs) > 0:
+                    try:
+                        self.n_grabs += capture_tick(source, subs)
+                        self.n_ticks += 1
+                        self.grab_time += time.perf_counter() - start
+                    except Exception as e:
+                        logger.log_message("Screen capture failed", monitor_idx=self.monitor_idx, error=str(e))
+
+                self._stop_event.wait(max(0.0, self.interval - (time.perf_counter() - start)))
+        finally:
+            source.close()
+
+    def stop(self):
+        self._stop_event.set()
+        self._thread.join()
+
+class CaptureHub():
+    def __init__(self, source_factory=MssFrameSource, interval=0.15, downsample=2):
+        """
+        source_factory: Creates a frame source (MssFrameSource or SyntheticFrameSource). Called in the capture thread.
+        interval: Seconds between grabs.
+        downsample: Factor for the frames used in change detection.
+        """
+        self.source_factory = source_factory
+        self.interval = interval
+        self.downsample = downsample
+
+        self.captures = {} # monitor index -> MonitorCapture
+        self.lock = threading.Lock()
+
+    def find_monitor(self, region):
+        # The monitor with the most overlap. A box spanning monitors is still grabbed whole (grabs use virtual screen coords).
+        monitors = get_monitors(self.source_factory)
+
+        def overlap(m):
+            w = min(m["left"] + m["width"], region["left"] + region["width"]) - max(m["left"], region["left"])
+            h = min(m["top"] + m["height"], region["top"] + region["height"]) - max(m["top"], region["top"])
+            return max(0, w) * max(0, h)
+
+        return max(range(len(monitors)), key=lambda idx: overlap(monitors[idx])) if len(monitors) > 0 else 0
+
+    def subscribe(self, coords):
+        """
+        coords = [x, y, width, height] of a watched box.
+        """
+        region = { "left": coords[0], "top": coords[1], "width": coords[2], "height": coords[3], }
+        sub = CaptureSubscription(region, downsample=self.downsample)
+
+        monitor_idx = self.find_monitor(region)
+        with self.lock:
+            if monitor_idx not in self.captures:
+                logger.log_message("Starting screen capture thread", monitor_idx=monitor_idx)
+                self.captures[monitor_idx] = MonitorCapture(monitor_idx, self.source_factory, self.interval)
+
+            self.captures[monitor_idx].add(sub)
+            sub.monitor_idx = monitor_idx
+
+        return sub
+
+    def unsubscribe(self, sub: CaptureSubscription):
+        sub.close()
+
+        capture_to_stop = None
+        with self.lock:
+            capture = self.captures.get(sub.monitor_idx)
+            if capture is not None and capture.remove(sub):
+                capture_to_stop = self.captures.pop(sub.monitor_idx)
+
+        if capture_to_stop is not None:
+            logger.log_message("Stopping screen capture thread", monitor_idx=sub.monitor_idx)
+            capture_to_stop.stop()
+
+    def get_stats(self):
+        with self.lock:
+            return [
+                {
+                    "monitor_idx": c.monitor_idx,
+                    "n_subscriptions": len(c.subscriptions),
+                    "n_ticks": c.n_ticks,
+                    "n_grabs": c.n_grabs,
+                    "mean_tick_ms": (c.grab_time / c.n_ticks * 1000) if c.n_ticks > 0 else 0.0,
+                }
+                for c in self.captures.values()
+            ]
+
+capture_hub = CaptureHub()
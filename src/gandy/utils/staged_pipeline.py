@@ -0,0 +1,143 @@
+import threading
+import queue
+from gandy.utils.fancy_logger import logger
+
+# A tiny thread-per-stage pipeline. Each stage has one worker, so items always leave a stage in the same order they entered it.
+# Stages are connected with bounded queues - a fast stage can only run a few items ahead of a slow one, which caps memory usage.
+
+_END_OF_ITEMS = object()
+
+class _StageFailure():
+    def __init__(self, err: Exception):
+        self.err = err
+
+class StagedPipeline():
+    def __init__(self, stages, max_queue_size = 2):
+        """
+        stages = list of (stage name STR, stage fn). Each stage fn receives the output of the previous stage and returns the input for the next one.
+        """
+        if len(stages) == 0:
+            raise ValueError("stages must have at least one item.")
+
+        self.stages = stages
+        self.max_queue_size = max(1, max_queue_size)
+
+        self._stop_event = threading.Event()
+
+    def _put(self, q: queue.Queue, item):
+        # Blocks until there's room in the queue - unless the pipeline was stopped (the consumer gave up), in which case the item is dropped.
+        while not self._stop_event.is_set():
+            try:
+                q.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+
+        return False
+
+    def _get(self, q: queue.Queue):
+        while not self._stop_event.is_set():
+            try:
+                return q.get(timeout=0.1)
+            except queue.Empty:
+                continue
+
+        return _END_OF_ITEMS
+
+    def _feed(self, items, out_q: queue.Queue):
+        try:
+            for item in items:
+                if not self._put(out_q, item):
+                    return
+        except Exception as e:
+            self._put(out_q, _StageFailure(e))
+            return
+
+        self._put(out_q, _END_OF_ITEMS)
+
+    def _run_stage(self, stage_name: str, stage_fn, in_q: queue.Queue, out_q: queue.Queue):
+        while True:
+            item = self._get(in_q)
+
+            if item is _END_OF_ITEMS or isinstance(item, _StageFailure):
+                # Pass it along so the consumer knows that it's done (or that something upstream exploded).
+                self._put(out_q, item)
+                return
+
+            try:
+                output = stage_fn(item)
+            except Exception as e:
+                logger.log_message("Pipeline stage failed", stage_name=stage_name)
+                self._put(out_q, _StageFailure(e))
+                return
+
+            if not self._put(out_q, output):
+                return
+
+    def run(self, items):
+        """
+        Yields the output of the final stage for each item, in the same order as the given items.
+
+        If any stage raises an error, the remaining work is abandoned and the error is re-raised here.
+        """
+        self._stop_event.clear()
+
+        queues = [queue.Queue(maxsize=self.max_queue_size) for _ in range(len(self.stages) + 1)]
+
+        threads = [threading.Thread(target=self._feed, args=(items, queues[0]), daemon=True)]
+        for stage_idx, (stage_name, stage_fn) in enumerate(self.stages):
+            threads.append(
+                threading.Thread(
+                    target=self._run_stage,
+                    args=(stage_name, stage_fn, queues[stage_idx], queues[stage_idx + 1]),
+                    daemon=True,
+                    name=f"StagedPipeline-{stage_name}",
+                )
+            )
+
+        for t in threads:
+            t.start()
+
+        try:
+            while True:
+                output = self._get(queues[-1])
+
+                if output is _END_OF_ITEMS:
+                    break
+                if isinstance(output, _StageFailure):
+                    raise output.err
+
+                yield output
+        finally:
+            self._stop_event.set()
+
+            for t in threads:
+                t.join()
+
+
+class OrderedEventRelay():
+    def __init__(self):
+        """
+        Callbacks (progress updates, emitted texts...) are tagged with the index of the item that made them.
+
+        A callback only runs once every earlier item has finished; until then it's buffered.
+        This way a pipelined run emits the exact same sequence of events as a sequential run.
+        """
+        self.cur_idx = 0
+        self.pending = {} # key = item index. value = list of (fn, args, kwargs)
+
+        self.lock = threading.Lock()
+
+    def emit(self, item_idx: int, fn, *args, **kwargs):
+        with self.lock:
+            if item_idx == self.cur_idx:
+                fn(*args, **kwargs)
+            else:
+                self.pending.setdefault(item_idx, []).append((fn, args, kwargs))
+
+    def finish(self, item_idx: int):
+        with self.lock:
+            self.cur_idx = item_idx + 1
+
+            for fn, args, kwargs in self.pending.pop(self.cur_idx, []):
+                fn(*args, **kwargs)
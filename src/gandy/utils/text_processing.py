@@ -71,6 +71,20 @@ def pack_context_dedupe(source_texts: List[str], n_context: int, ignore_single_w
 
     return new_sources
 
+def pack_context_dedupe_from(source_texts: List[str], start: int, n_context: int):
+    # Same as pack_context_dedupe(source_texts, n_context)[start:] - for packing the frames of a video a few at a time, as they come in.
+    # A frame only depends on the frames before it through the run of equal texts it continues and the (n_context - 1) runs before that one,
+    # so packing can begin at the start of the earliest of those runs rather than at the first frame.
+    lookback = start
+    n_runs = 0
+    while lookback > 0 and n_runs < max(1, n_context):
+        lookback -= 1
+        while lookback > 0 and source_texts[lookback - 1] == source_texts[lookback]:
+            lookback -= 1
+        n_runs += 1
+
+    return pack_context_dedupe(source_texts[lookback:], n_context)[(start - lookback):]
+
 
 def add_seps(texts: List[str]):
     # pack_context but assumes that the right amount of contextual sentences is already given, and the last sentence
@@ -43,6 +43,13 @@ os.environ['PATH'] = os.pathsep.join(new_path_parts + filtered_path)
 # monkey.patch_thread()
 # monkey.patch_queue()
 
+import multiprocessing
+
+# Task5 can read videos with worker processes (see chunked_frames.py). A frozen app re-runs itself for each worker - freeze_support takes over right here,
+# before the heavy imports below. Spawned workers re-import this file too, but skip everything under __main__ - they only import what the worker code needs.
+if __name__ == "__main__":
+    multiprocessing.freeze_support()
+
 import tqdm
 from time import strftime
 import logging
@@ -59,8 +66,9 @@ from unidic_lite import unidic
 
 import pillow_avif
 
-from gandy.app import run_server
+if __name__ == "__main__":
+    from gandy.app import run_server
 
-run_server()
+    run_server()
 
 # TODO: Better importing.
\ No newline at end of file
@@ -0,0 +1,78 @@
+import numpy as np
+from gandy.utils.box_ops import as_boxes, containment_matrix, connected_groups, merge_boxes, filter_contained
+from gandy.utils.filter_out_overlapping_bboxes import filter_out_overlapping_bboxes
+
+# Same condition detect_image_chunks merges with.
+def _merge_overlapping(boxes):
+    return merge_boxes(as_boxes(boxes), should_merge=lambda b: containment_matrix(b, b) >= 0.3).tolist()
+
+def _sorted(boxes):
+    return sorted([list(map(float, b)) for b in boxes])
+
+def test_connected_groups_is_transitive():
+    # 0-1 and 1-2 are connected, 0-2 aren't - still one group. 3 is alone.
+    adjacency = np.zeros((4, 4), dtype=bool)
+    adjacency[0, 1] = adjacency[1, 0] = True
+    adjacency[1, 2] = adjacency[2, 1] = True
+
+    assert connected_groups(adjacency) == [[0, 1, 2], [3]]
+
+def test_connected_groups_merges_roots():
+    # 3 links two groups that were built separately.
+    adjacency = np.zeros((5, 5), dtype=bool)
+    for i, j in [(0, 1), (2, 4), (1, 3), (3, 4)]:
+        adjacency[i, j] = adjacency[j, i] = True
+
+    assert connected_groups(adjacency) == [[0, 1, 2, 3, 4]]
+
+def test_merge_chained_overlaps():
+    # A overlaps B, B overlaps C, but A doesn't touch C.
+    boxes = [
+        [0, 0, 10, 10],
+        [6, 0, 16, 10],
+        [12, 0, 22, 10],
+        [100, 100, 110, 110], # Not touching anything.
+    ]
+
+    assert _sorted(_merge_overlapping(boxes)) == _sorted([[0, 0, 22, 10], [100, 100, 110, 110]])
+
+def test_merge_grows_into_new_boxes():
+    # A and B merge. Their union then covers C (in the corner), which touches neither of them on its own.
+    boxes = [
+        [0, 0, 10, 10],
+        [4, 4, 14, 14],
+        [10, 0, 14, 4],
+    ]
+
+    assert _sorted(_merge_overlapping(boxes)) == _sorted([[0, 0, 14, 14]])
+
+def test_merge_contained_box():
+    # A box fully inside another is merged into it, no matter the order.
+    outer = [0, 0, 100, 100]
+    inner = [40, 40, 50, 50]
+
+    assert _merge_overlapping([outer, inner]) == [outer]
+    assert _merge_overlapping([inner, outer]) == [outer]
+
+def test_merge_below_threshold():
+    # Only 20% of each box overlaps the other.
+    boxes = [[0, 0, 10, 10], [8, 0, 18, 10]]
+
+    assert _sorted(_merge_overlapping(boxes)) == _sorted(boxes)
+
+def test_containment_is_one_sided():
+    outer = as_boxes([[0, 0, 100, 100]])
+    inner = as_boxes([[40, 40, 50, 50]])
+
+    assert containment_matrix(outer, inner)[0, 0] == 1.0
+    assert containment_matrix(inner, outer)[0, 0] == 0.01
+
+def test_filter_contained():
+    boxes = [
+        [0, 0, 100, 100],
+        [10, 10, 20, 20], # Fully inside the first.
+        [90, 90, 110, 110], # Only 25% inside.
+    ]
+
+    assert filter_contained(as_boxes(boxes), thr=0.8).tolist() == [0, 2]
+    assert filter_out_overlapping_bboxes(boxes) == [boxes[0], boxes[2]]
@@ -0,0 +1,138 @@
+import os
+import time
+from gandy.database.exact_match_cache import ExactMatchCache
+
+def _wait_for(condition, timeout=5.0):
+    # Interval saves happen in a background thread.
+    end = time.time() + timeout
+    while time.time() < end:
+        if condition():
+            return True
+        time.sleep(0.01)
+    return condition()
+
+def test_lru_eviction():
+    cache = ExactMatchCache(max_size=3)
+
+    cache.put("a", "A")
+    cache.put("b", "B")
+    cache.put("c", "C")
+
+    # "a" is now the most recently used - so "b" goes first.
+    assert cache.get("a") == "A"
+    cache.put("d", "D")
+
+    assert cache.get("b") is None
+    assert [cache.get(k) for k in ["a", "c", "d"]] == ["A", "C", "D"]
+    assert cache.get_stats()["size"] == 3
+
+def test_put_existing_key_refreshes():
+    cache = ExactMatchCache(max_size=2)
+
+    cache.put("a", "A")
+    cache.put("b", "B")
+    cache.put("a", "A2")
+    cache.put("c", "C")
+
+    assert cache.get("a") == "A2"
+    assert cache.get("b") is None
+
+def test_scope_reset():
+    cache = ExactMatchCache(max_size=10)
+
+    assert cache.set_scope("model-1")
+    cache.put("a", "A")
+
+    # Same scope - entries are kept.
+    assert not cache.set_scope("model-1")
+    assert cache.get("a") == "A"
+
+    assert cache.set_scope("model-2")
+    assert cache.get("a") is None
+    assert cache.get_stats()["size"] == 0
+
+def test_stats():
+    cache = ExactMatchCache(max_size=10)
+    cache.put("a", "A")
+
+    cache.get("a")
+    cache.get("a")
+    cache.get("b")
+
+    stats = cache.get_stats()
+    assert (stats["hits"], stats["misses"]) == (2, 1)
+    assert abs(stats["hit_rate"] - (2 / 3)) < 1e-9
+
+def test_save_load_round_trip(tmp_path):
+    file_path = str(tmp_path / "sub" / "cache.json")
+
+    cache = ExactMatchCache(file_path=file_path, max_size=10)
+    cache.set_scope("model-1")
+    cache.put("a", "A")
+    cache.put("日本語", "Japanese")
+    cache.put("b", "B")
+    cache.get("a") # LRU order is kept too: b, 日本語, a (oldest first).
+    cache.save()
+
+    loaded = ExactMatchCache(file_path=file_path, max_size=10)
+    assert loaded.scope == "model-1"
+    assert list(loaded.entries.items()) == [("日本語", "Japanese"), ("b", "B"), ("a", "A")]
+
+    # Loading into a smaller cache keeps the most recently used.
+    smaller = ExactMatchCache(file_path=file_path, max_size=2)
+    assert list(smaller.entries.keys()) == ["b", "a"]
+
+def test_load_corrupt_file(tmp_path):
+    file_path = str(tmp_path / "cache.json")
+    with open(file_path, "w", encoding="utf-8") as f:
+        f.write("{ not json")
+
+    cache = ExactMatchCache(file_path=file_path, max_size=10)
+    assert cache.get_stats()["size"] == 0
+    assert cache.scope is None
+
+def test_save_interval(tmp_path):
+    file_path = str(tmp_path / "cache.json")
+    cache = ExactMatchCache(file_path=file_path, max_size=10, save_interval=3)
+
+    cache.put("a", "A")
+    cache.put("b", "B")
+    assert not os.path.exists(file_path)
+
+    cache.put("c", "C")
+    assert _wait_for(lambda: os.path.exists(file_path) and len(ExactMatchCache(file_path=file_path).entries) == 3)
+
+def test_flush_only_saves_changes(tmp_path):
+    file_path = str(tmp_path / "cache.json")
+    cache = ExactMatchCache(file_path=file_path, max_size=10)
+
+    cache.flush()
+    assert not os.path.exists(file_path)
+
+    cache.put("a", "A")
+    cache.flush()
+    assert list(ExactMatchCache(file_path=file_path).entries.items()) == [("a", "A")]
+
+    # Nothing changed since - no rewrite.
+    os.remove(file_path)
+    cache.flush()
+    assert not os.path.exists(file_path)
+
+def test_set_file_path(tmp_path):
+    file_path = str(tmp_path / "cache.json")
+
+    saved = ExactMatchCache(file_path=file_path, max_size=10)
+    saved.set_scope("model-1")
+    saved.put("a", "A")
+    saved.save()
+
+    # Memory only until a file path is set - then the saved entries are loaded.
+    cache = ExactMatchCache(max_size=10, save_interval=2)
+    cache.set_file_path(file_path)
+    assert cache.scope == "model-1" and cache.get("a") == "A"
+
+    cache.set_file_path(None)
+    cache.put("b", "B")
+    cache.put("c", "C")
+    cache.flush()
+    assert list(ExactMatchCache(file_path=file_path).entries.keys()) == ["a"]
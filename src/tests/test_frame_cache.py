@@ -0,0 +1,62 @@
+import cv2
+import numpy as np
+from PIL import Image
+from gandy.full_pipelines.frame_cache import FrameCache, dhash
+from gandy.utils.hash_index import hamming_distances
+
+def _capture(lines, flat_background=False):
+    # Like a visual novel text box capture.
+    h, w = 300, 1280
+    if flat_background:
+        image = np.full((h, w, 3), 30, dtype=np.uint8)
+    else:
+        image = np.tile(np.linspace(40, 120, w, dtype=np.float32)[None, :, None], (h, 1, 3))
+        image += np.linspace(0, 30, h, dtype=np.float32)[:, None, None]
+        image = image.astype(np.uint8)
+
+    for line_idx, line in enumerate(lines):
+        cv2.putText(image, line, (40, 90 + line_idx * 70), cv2.FONT_HERSHEY_SIMPLEX, 1.6, (250, 250, 250), 3)
+
+    return Image.fromarray(image)
+
+def _recompress(image: Image.Image, quality=90):
+    _, encoded = cv2.imencode(".jpg", np.array(image), [cv2.IMWRITE_JPEG_QUALITY, quality])
+    return Image.fromarray(cv2.imdecode(encoded, cv2.IMREAD_COLOR))
+
+def _distance(image_a: Image.Image, image_b: Image.Image):
+    return int(hamming_distances(dhash(image_a)[None, :], dhash(image_b))[0])
+
+def test_one_character_changes_hash():
+    for flat_background in [False, True]:
+        base = _capture(["Where are you going tonight?", "I thought we had plans."], flat_background)
+
+        for changed in ["Where are you going tonight!", "Where are you going tonighT?", "Where are yov going tonight?"]:
+            other = _capture([changed, "I thought we had plans."], flat_background)
+
+            # Can be as little as 1 bit (out of 1024) - so only the default tolerance of 0 tells these apart.
+            assert _distance(base, other) >= 1
+
+def test_recompressed_capture_same_hash():
+    base = _capture(["Where are you going tonight?", "I thought we had plans."])
+
+    assert _distance(base, _recompress(base)) == 0
+
+def test_cache_one_character_miss():
+    cache = FrameCache(max_size=4)
+    scope = ("apps", "options")
+
+    base = _capture(["Where are you going tonight?", "I thought we had plans."])
+    cache.put(scope, base, cache.hash_frame(base), [[0, 0, 10, 10]], ["text"])
+
+    again = _recompress(base)
+    hit = cache.get(scope, again, cache.hash_frame(again), tolerance=0)
+    assert hit is not None and hit[2] == ["text"]
+
+    changed = _capture(["Where are you going tonight!", "I thought we had plans."])
+    assert cache.get(scope, changed, cache.hash_frame(changed), tolerance=0) is None
+
+    # Different scope (e.g: another OCR app) never matches.
+    assert cache.get(("other apps", "options"), base, cache.hash_frame(base), tolerance=0) is None
+
+    stats = cache.get_stats()
+    assert (stats["hits"], stats["misses"]) == (1, 2)
@@ -0,0 +1,121 @@
+import cv2
+import numpy as np
+from PIL import Image
+from gandy.full_pipelines.frame_cache import dhash
+from gandy.utils.hash_index import HashIndex, hamming_distances
+from gandy.tasks.task5.region_thumbnail import region_thumbnail, thumbnails_match
+
+ALPHABET = list("abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789 ")
+
+def _make_lines(n, seed=0):
+    rng = np.random.default_rng(seed)
+
+    lines = []
+    seen = set()
+    while len(lines) < n:
+        line = "".join(rng.choice(ALPHABET, int(rng.integers(8, 30))))
+        if line not in seen:
+            seen.add(line)
+            lines.append(line)
+    return lines
+
+def _draw_line(line: str):
+    # Like a subtitle text region crop.
+    image = np.full((48, 640, 3), 16, dtype=np.uint8)
+    cv2.putText(image, line, (8, 34), cv2.FONT_HERSHEY_SIMPLEX, 1, (240, 240, 240), 2)
+    return image
+
+def _compress(image: np.ndarray, quality=60):
+    _, encoded = cv2.imencode(".jpg", image, [cv2.IMWRITE_JPEG_QUALITY, quality])
+    return cv2.imdecode(encoded, cv2.IMREAD_COLOR)
+
+def _find_region(index: HashIndex, image: Image.Image):
+    # Same as read_text_in_frames: a 64 bit dhash (8x8, like imagehash.dhash) within 3 bits, confirmed with the thumbnail.
+    thumbnail = region_thumbnail(image)
+    packed_hash = dhash(image, hash_size=8)
+
+    value, _ = index.find(packed_hash, max_distance=3, confirm=lambda v: thumbnails_match(v[1], thumbnail))
+    return value, packed_hash, thumbnail
+
+def test_find_matches_brute_force():
+    rng = np.random.default_rng(0)
+    index = HashIndex(max_size=64)
+
+    hashes = rng.integers(0, 256, (100, 8), dtype=np.uint8)
+    for i, h in enumerate(hashes):
+        index.add(h, i)
+
+    # Only the last 64 are kept.
+    kept = hashes[-64:]
+    for _ in range(50):
+        query = rng.integers(0, 256, 8, dtype=np.uint8)
+        distances = hamming_distances(kept, query)
+
+        value, distance = index.find(query, max_distance=64)
+        assert distance == distances.min()
+        assert hamming_distances(hashes[value][None, :], query)[0] == distance
+
+    value, distance = index.find(hashes[-1], max_distance=0)
+    assert (value, distance) == (99, 0)
+
+    value, _ = index.find(hashes[0], max_distance=0)
+    assert value is None
+
+def test_find_confirm_tries_next_closest():
+    index = HashIndex(max_size=8)
+
+    base = np.zeros(8, dtype=np.uint8)
+    near = base.copy()
+    near[0] = 1
+
+    index.add(base, "collision")
+    index.add(near, "real")
+
+    assert index.find(base, max_distance=3) == ("collision", 0)
+    assert index.find(base, max_distance=3, confirm=lambda v: v == "real") == ("real", 1)
+    assert index.find(base, max_distance=0, confirm=lambda v: v == "real") == (None, None)
+    assert index.find(base, max_distance=3, confirm=lambda v: False)[0] is None
+
+def test_no_false_region_hits():
+    # Thousands of distinct text lines through one big region cache - none should be mistaken for another.
+    # The dhash alone gets hundreds of these wrong.
+    lines = _make_lines(2000)
+    index = HashIndex(max_size=8192)
+
+    false_hits = []
+    for line in lines:
+        image = Image.fromarray(_draw_line(line))
+        value, packed_hash, thumbnail = _find_region(index, image)
+
+        if value is not None:
+            false_hits.append((line, value[0]))
+
+        index.add(packed_hash, (line, thumbnail))
+
+    assert false_hits == []
+
+def test_repeated_region_hits():
+    # The same line again (re-compressed) is still found - even from far back.
+    lines = _make_lines(500, seed=1)
+    index = HashIndex(max_size=8192)
+
+    for line in lines:
+        image = Image.fromarray(_draw_line(line))
+        _, packed_hash, thumbnail = _find_region(index, image)
+        index.add(packed_hash, (line, thumbnail))
+
+    for line in lines[:50]:
+        image = Image.fromarray(_compress(_draw_line(line)))
+        value, _, _ = _find_region(index, image)
+
+        assert value is not None and value[0] == line
+
+def test_one_character_difference_misses():
+    index = HashIndex(max_size=8)
+
+    image = Image.fromarray(_draw_line("where are you going?"))
+    _, packed_hash, thumbnail = _find_region(index, image)
+    index.add(packed_hash, ("where are you going?", thumbnail))
+
+    value, _, _ = _find_region(index, Image.fromarray(_draw_line("where are you going!")))
+    assert value is None
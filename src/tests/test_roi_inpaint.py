@@ -0,0 +1,66 @@
+import cv2
+import numpy as np
+import pytest
+from gandy.image_cleaning.roi_inpaint import inpaint_roi, mask_windows
+
+def _make_page(h, w, seed=0):
+    # Smooth-ish background with some detail, so inpainting actually has something to spread.
+    rng = np.random.default_rng(seed)
+    image = rng.integers(0, 255, (h, w, 3), dtype=np.uint8)
+    return cv2.GaussianBlur(image, (9, 9), 0)
+
+def _make_mask(h, w, seed=0, n_bubbles=4):
+    # A few text-like blobs - some near each other (so their windows merge), some on the page edges.
+    rng = np.random.default_rng(seed)
+    mask = np.zeros((h, w), dtype=np.uint8)
+
+    for _ in range(n_bubbles):
+        x, y = int(rng.integers(0, w - 40)), int(rng.integers(0, h - 60))
+        for line in range(int(rng.integers(1, 4))):
+            cv2.rectangle(mask, (x + line * 12, y), (x + line * 12 + 6, y + int(rng.integers(20, 60))), 255, -1)
+
+    mask[:6, 10:30] = 255 # Top edge.
+    mask[h - 20:, w - 5:] = 255 # Bottom right corner.
+    return mask
+
+@pytest.mark.parametrize("flags", [cv2.INPAINT_TELEA, cv2.INPAINT_NS])
+@pytest.mark.parametrize("inpaint_radius", [1, 4, 9])
+@pytest.mark.parametrize("seed", [0, 1, 2])
+def test_same_as_full_inpaint(flags, inpaint_radius, seed):
+    h, w = 700, 500
+    image = _make_page(h, w, seed=seed)
+    mask = _make_mask(h, w, seed=seed)
+
+    expected = cv2.inpaint(image, mask, inpaintRadius=inpaint_radius, flags=flags)
+    actual = inpaint_roi(image, mask, inpaint_radius=inpaint_radius, flags=flags)
+
+    assert np.array_equal(actual, expected)
+
+def test_same_as_full_inpaint_3d_mask():
+    # The TNet cleaners pass an (H, W, 1) mask.
+    image = _make_page(300, 400, seed=3)
+    mask = _make_mask(300, 400, seed=3)[:, :, None]
+
+    expected = cv2.inpaint(image, mask, inpaintRadius=4, flags=cv2.INPAINT_TELEA)
+    actual = inpaint_roi(image, mask, inpaint_radius=4)
+
+    assert np.array_equal(actual, expected)
+
+def test_empty_mask():
+    image = _make_page(100, 100)
+    mask = np.zeros((100, 100), dtype=np.uint8)
+
+    assert mask_windows(mask, margin=8).shape == (0, 4)
+    assert np.array_equal(inpaint_roi(image, mask, inpaint_radius=4), image)
+
+def test_windows_cover_mask():
+    mask = _make_mask(700, 500, seed=5)
+    windows = mask_windows(mask, margin=8)
+
+    covered = np.zeros(mask.shape, dtype=bool)
+    for x1, y1, x2, y2 in windows.tolist():
+        covered[y1:y2, x1:x2] = True
+
+    assert covered[mask > 0].all()
+    # And they're not just the whole page.
+    assert covered.mean() < 1.0
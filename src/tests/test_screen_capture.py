@@ -0,0 +1,72 @@
+import cv2
+import numpy as np
+from gandy.utils.screen_capture import SyntheticFrameSource, CaptureHub, CaptureSubscription, group_regions, capture_tick
+
+def _draw_noise(n_grabs, canvas):
+    rng = np.random.default_rng(n_grabs)
+    canvas[:, :, :3] = rng.integers(0, 255, canvas[:, :, :3].shape, dtype=np.uint8)
+
+def _region(left, top, width, height):
+    return { "left": left, "top": top, "width": width, "height": height, }
+
+def _crop(canvas, region):
+    return canvas[region["top"]:(region["top"] + region["height"]), region["left"]:(region["left"] + region["width"])]
+
+def test_far_apart_regions_not_merged():
+    # Small boxes in opposite corners - one covering grab would be (almost) the whole screen.
+    regions = [_region(0, 0, 300, 80), _region(1620, 1000, 300, 80)]
+
+    groups = group_regions(regions)
+    assert sorted(indices for _, indices in groups) == [[0], [1]]
+
+def test_close_regions_merged():
+    # Stacked subtitle lines.
+    regions = [_region(100, 800, 900, 60), _region(100, 870, 900, 60), _region(1500, 0, 200, 50)]
+
+    groups = group_regions(regions)
+    assert sorted(indices for _, indices in groups) == [[0, 1], [2]]
+
+    covering = [region for region, indices in groups if indices == [0, 1]][0]
+    assert covering == _region(100, 800, 900, 130)
+
+def test_capture_tick_crops():
+    source = SyntheticFrameSource()
+    _draw_noise(0, source.canvas)
+    regions = [_region(0, 0, 300, 80), _region(1620, 1000, 300, 80), _region(10, 100, 300, 80)]
+    subs = [CaptureSubscription(r) for r in regions]
+
+    n_grabs = capture_tick(source, subs)
+    assert n_grabs == source.n_grabs == 2
+
+    for s in subs:
+        assert np.array_equal(s.read_gray(), cv2.cvtColor(_crop(source.canvas, s.region), cv2.COLOR_BGRA2GRAY))
+
+def test_hub_subscribe_unsubscribe():
+    source = SyntheticFrameSource()
+    _draw_noise(0, source.canvas)
+
+    hub = CaptureHub(source_factory=lambda: source, interval=0.01)
+    sub_a = hub.subscribe([100, 800, 900, 60])
+    sub_b = hub.subscribe([100, 870, 900, 60])
+
+    # Both boxes share the one capture thread for the monitor.
+    stats = hub.get_stats()
+    assert len(stats) == 1 and stats[0]["n_subscriptions"] == 2
+
+    for sub in [sub_a, sub_b]:
+        small, seq = sub.read_small(after_seq=0, timeout=5.0)
+        assert seq > 0
+        assert small.shape == (sub.small_size[1], sub.small_size[0])
+        assert np.array_equal(sub.read_gray(), cv2.cvtColor(_crop(source.canvas, sub.region), cv2.COLOR_BGRA2GRAY))
+
+        # Newer frames keep coming.
+        _, next_seq = sub.read_small(after_seq=seq, timeout=5.0)
+        assert next_seq > seq
+
+    hub.unsubscribe(sub_a)
+    assert hub.get_stats()[0]["n_subscriptions"] == 1
+
+    # Last one gone - the capture thread stops.
+    hub.unsubscribe(sub_b)
+    assert hub.get_stats() == []
+    assert sub_b.closed
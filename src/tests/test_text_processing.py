@@ -0,0 +1,36 @@
+import numpy as np
+from gandy.utils.text_processing import pack_context_dedupe, pack_context_dedupe_from
+
+def _make_frame_texts(rng, n_frames):
+    # Subtitles stay on screen for a few frames, with some gaps (empty frames) and repeated lines.
+    lines = ["", "a", "b", "c", "d"]
+
+    texts = []
+    while len(texts) < n_frames:
+        texts.extend([lines[int(rng.integers(0, len(lines)))]] * int(rng.integers(1, 6)))
+    return texts[:n_frames]
+
+def test_pack_context_dedupe():
+    texts = ["a", "a", "b", "", "b", "c"]
+
+    assert pack_context_dedupe(texts, n_context=2) == [
+        "a", "a", "a<TSOS>b", "b<TSOS>", "<TSOS>b", "b<TSOS>c",
+    ]
+
+def test_pack_from_same_as_full():
+    rng = np.random.default_rng(0)
+
+    for _ in range(300):
+        texts = _make_frame_texts(rng, int(rng.integers(1, 60)))
+        n_context = int(rng.integers(0, 5))
+        expected = pack_context_dedupe(texts, n_context)
+
+        # Packed chunk by chunk, like translate_chunks_as_ready.
+        packed = []
+        start = 0
+        while start < len(texts):
+            end = min(len(texts), start + int(rng.integers(1, 10)))
+            packed.extend(pack_context_dedupe_from(texts[:end], start, n_context))
+            start = end
+
+        assert packed == expected